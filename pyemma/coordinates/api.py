@@ -219,7 +219,7 @@ def load(trajfiles, features=None, top=None, stride=1, chunk_size=None, **kw):
         raise ValueError('unsupported type (%s) of input' % type(trajfiles))
 
 
-def source(inp, features=None, top=None, chunk_size=None, **kw):
+def source(inp, features=None, top=None, chunk_size=None, n_jobs=1, **kw):
     r""" Defines trajectory data source
 
     This function defines input trajectories without loading them. You can pass
@@ -275,7 +275,14 @@ def source(inp, features=None, top=None, chunk_size=None, **kw):
 
     chunk_size: int, optional, default = 100 for file readers and 5000 for
         already loaded data The chunk size at which the input file is being
-        processed.
+        processed. If 'auto', the chunk size is chosen such that a chunk takes
+        about config.auto_chunk_size MB and is adapted to the measured time
+        needed per chunk.
+
+    n_jobs : int or None, optional, default = 1
+        number of worker processes, which read (and featurize) the chunks of
+        molecular dynamics trajectories or tabulated ASCII files in parallel.
+        If None, all available CPUs will be used. Has no effect for other inputs.
 
     Returns
     -------
@@ -345,7 +352,8 @@ def source(inp, features=None, top=None, chunk_size=None, **kw):
     if isinstance(inp, _string_types) or (
             isinstance(inp, (list, tuple))
             and (any(isinstance(item, (list, tuple, _string_types)) for item in inp) or len(inp) is 0)):
-        reader = create_file_reader(inp, top, features, chunk_size=chunk_size if chunk_size is not None else 100, **kw)
+        reader = create_file_reader(inp, top, features, chunk_size=chunk_size if chunk_size is not None else 100,
+                                    n_jobs=n_jobs, **kw)
 
     elif isinstance(inp, _np.ndarray) or (isinstance(inp, (list, tuple))
                                           and (any(isinstance(item, _np.ndarray) for item in inp) or len(inp) is 0)):
@@ -555,7 +563,8 @@ def discretizer(reader,
     return disc
 
 
-def save_traj(traj_inp, indexes, outfile, top=None, stride = 1, chunksize=1000, image_molecules=False, verbose=True):
+def save_traj(traj_inp, indexes, outfile, top=None, stride = 1, chunksize=1000, image_molecules=False, verbose=True,
+              n_jobs=None):
     r""" Saves a sequence of frames as a single trajectory.
 
     Extracts the specified sequence of time/trajectory indexes from traj_inp
@@ -615,6 +624,10 @@ def save_traj(traj_inp, indexes, outfile, top=None, stride = 1, chunksize=1000,
     verbose : boolean, default is True
         Inform about created filenames
 
+    n_jobs : int or None, default is None
+        Number of threads reading the frames of different input trajectories concurrently.
+        If None, one thread per trajectory, but at most the number of CPUs, is used.
+
     Returns
     -------
     traj : :py:obj:`mdtraj.Trajectory` object
@@ -665,7 +678,7 @@ def save_traj(traj_inp, indexes, outfile, top=None, stride = 1, chunksize=1000,
                          "but indexes will ask for file nr. %u"
                          % (len(trajfiles), indexes[:,0].max()))
 
-    traj = frames_from_files(trajfiles, top, indexes, chunksize, stride, reader=reader)
+    traj = frames_from_files(trajfiles, top, indexes, chunksize, stride, reader=reader, n_jobs=n_jobs)
 
     # Avoid broken molecules
     if image_molecules:
@@ -682,7 +695,7 @@ def save_traj(traj_inp, indexes, outfile, top=None, stride = 1, chunksize=1000,
 
 
 def save_trajs(traj_inp, indexes, prefix='set_', fmt=None, outfiles=None,
-               inmemory=False, stride=1, verbose=False):
+               inmemory=False, stride=1, verbose=False, n_jobs=None):
     r""" Saves sequences of frames as multiple trajectories.
 
     Extracts a number of specified sequences of time/trajectory indexes from the
@@ -719,13 +732,11 @@ def save_trajs(traj_inp, indexes, prefix='set_', fmt=None, outfiles=None,
         of prefix and fmt, and output will be written to these files.
 
     inmemory : Boolean, default = False (untested for large files)
-        Instead of internally calling traj_save for every (T_i,2) array in
-        "indexes", only one call is made. Internally, this generates a
-        potentially large molecular trajectory object in memory that is
-        subsequently sliced into the files of "outfiles". Should be faster for
-        large "indexes" arrays and  large files, though it is quite memory
-        intensive. The optimal situation is to avoid streaming two times
-        through a huge file for "indexes" of type: indexes = [[1 4000000],[1 4000001]]
+        By default, the input is streamed once and every needed frame is routed to
+        temporary memory maps of the output trajectories, which are written chunk-wise
+        afterwards. If True, only one call to save_traj is made instead. Internally,
+        this generates a potentially large molecular trajectory object in memory that
+        is subsequently sliced into the files of "outfiles".
 
     stride  : integer, default is 1
         This parameter informs :py:func:`save_trajs` about the stride used in
@@ -739,6 +750,10 @@ def save_trajs(traj_inp, indexes, prefix='set_', fmt=None, outfiles=None,
     verbose : boolean, default is False
         Verbose output while looking for "indexes" in the "traj_inp.trajfiles"
 
+    n_jobs : int or None, default is None
+        Number of threads reading the frames of different input trajectories concurrently.
+        If None, one thread per trajectory, but at most the number of CPUs, is used.
+
     Returns
     -------
     outfiles : list of str
@@ -778,16 +793,18 @@ def save_trajs(traj_inp, indexes, prefix='set_', fmt=None, outfiles=None,
     if len(indexes) != len(outfiles):
         raise Exception('len(indexes) (%s) does not match len(outfiles) (%s)' % (len(indexes), len(outfiles)))
 
-    # This implementation looks for "i_indexes" separately, and thus one traj_inp.trajfile 
-    # might be accessed more than once (less memory intensive)
+    # This implementation streams once over traj_inp and writes all outfiles chunk-wise
+    # from temporary memory maps (less memory intensive)
     if not inmemory:
-        for i_indexes, outfile in zip(indexes, outfiles):
-            # TODO: use **kwargs to parse to save_traj
-            save_traj(traj_inp, i_indexes, outfile, stride=stride, verbose=verbose)
+        from pyemma.coordinates.data.util.frames_from_file import frames_to_files
+        frames_to_files(traj_inp, indexes, outfiles, chunksize=traj_inp.chunksize, stride=stride, n_jobs=n_jobs)
+        if verbose:
+            for outfile in outfiles:
+                _logger.info("Created file %s" % outfile)
 
     # This implementation is "one file - one pass" but might temporally create huge memory objects
     else:
-        traj = save_traj(traj_inp, indexes, outfile=None, stride=stride, verbose=verbose)
+        traj = save_traj(traj_inp, indexes, outfile=None, stride=stride, verbose=verbose, n_jobs=n_jobs)
         i_idx = 0
         for i_indexes, outfile in zip(indexes, outfiles):
             # Create indices for slicing the mdtraj trajectory object
@@ -1347,7 +1364,7 @@ def cluster_mini_batch_kmeans(data=None, k=100, max_iter=10, batch_size=0.2, met
 
 def cluster_kmeans(data=None, k=None, max_iter=10, tolerance=1e-5, stride=1,
                    metric='euclidean', init_strategy='kmeans++', fixed_seed=False,
-                   n_jobs=None, chunk_size=5000, skip=0):
+                   n_jobs=None, chunk_size=5000, skip=0, use_bounds=False, oom_strategy='memmap'):
     r"""k-means clustering
 
     If data is given, it performs a k-means clustering and then assigns the
@@ -1391,7 +1408,8 @@ def cluster_kmeans(data=None, k=None, max_iter=10, tolerance=1e-5, stride=1,
 
     init_strategy : str
         determines if the initial cluster centers are chosen according to the kmeans++-algorithm
-        or drawn uniformly distributed from the provided data set
+        ('kmeans++'), its scalable variant kmeans|| ('kmeans||'), which is much faster for many
+        cluster centers, or drawn uniformly distributed from the provided data set ('uniform')
 
     fixed_seed : bool
         if set to true, the random seed gets fixed resulting in deterministic behavior; default is false
@@ -1407,6 +1425,20 @@ def cluster_kmeans(data=None, k=None, max_iter=10, tolerance=1e-5, stride=1,
     skip : int, default=0
         skip the first initial n frames per trajectory.
 
+    use_bounds : bool, default=False
+        keep triangle inequality bounds during the k-means iterations to skip distance
+        computations (euclidean metric only). Speeds up the clustering of low-dimensional
+        data into many clusters at the cost of three additional numbers per frame.
+        The resulting cluster centers are the same.
+
+    oom_strategy : str, default='memmap'
+        how to deal with data sets, which do not fit into memory.
+
+        * 'memmap': the data is written to a memory mapped temporary file.
+        * 'raise': a MemoryError is raised.
+        * 'stream': every iteration performs a pass over the data, so the
+          memory requirements only scale with the number of cluster centers.
+
     Returns
     -------
     kmeans : a :class:`KmeansClustering <pyemma.coordinates.clustering.KmeansClustering>` clustering object
@@ -1460,7 +1492,8 @@ def cluster_kmeans(data=None, k=None, max_iter=10, tolerance=1e-5, stride=1,
     """
     from pyemma.coordinates.clustering.kmeans import KmeansClustering
     res = KmeansClustering(n_clusters=k, max_iter=max_iter, metric=metric, tolerance=tolerance,
-                           init_strategy=init_strategy, fixed_seed=fixed_seed, n_jobs=n_jobs, skip=skip)
+                           init_strategy=init_strategy, fixed_seed=fixed_seed, n_jobs=n_jobs, skip=skip,
+                           use_bounds=use_bounds, oom_strategy=oom_strategy)
     return _param_stage(data, res, stride=stride, chunk_size=chunk_size)
 
 
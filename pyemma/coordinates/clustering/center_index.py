@@ -0,0 +1,206 @@
+# This file is part of PyEMMA.
+#
+# Copyright (c) 2016 Computational Molecular Biology Group, Freie Universitaet Berlin (GER)
+#
+# PyEMMA is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+Exact nearest neighbour lookup of frames in a fixed set of cluster centers.
+
+An index is built once per array of cluster centers and can then be used to assign
+an arbitrary number of chunks. All indices return exactly the same discrete trajectories
+as the brute force search of :func:`regspatial.assign`, including the tie-breaking
+(the smallest center index wins).
+'''
+
+from __future__ import absolute_import
+
+import numpy as np
+import six
+
+from pyemma.coordinates.clustering import regspatial
+
+__all__ = ['CenterIndex',
+           'BruteForceIndex',
+           'KDTreeIndex',
+           'create_center_index',
+           'register_center_index',
+           ]
+
+
+class CenterIndex(object):
+    """ Base class for nearest neighbour indices over cluster centers.
+
+    Parameters
+    ----------
+    centers : ndarray(n_centers, dim)
+        cluster centers, will be converted to C-contiguous float32.
+    metric : str, default='euclidean'
+        metric used to compare frames and centers ('euclidean', 'minRMSD').
+    """
+
+    def __init__(self, centers, metric='euclidean'):
+        self.centers = np.require(centers, dtype=np.float32, requirements='C')
+        if self.centers.ndim != 2:
+            raise ValueError('cluster centers have to be 2d')
+        self.metric = metric
+        # for minRMSD, the centers are centered once here and not again for every assigned chunk.
+        if metric == 'minRMSD':
+            self._precentered, self._traces = regspatial.precenter(self.centers)
+        else:
+            self._precentered, self._traces = self.centers, None
+
+    @staticmethod
+    def supports(centers, metric):
+        """ Whether this index can be used for given centers and metric. """
+        return True
+
+    def assign(self, X, n_jobs=1):
+        """ Assigns every frame of X to its closest cluster center.
+
+        Parameters
+        ----------
+        X : ndarray(T, dim)
+            frames to assign.
+        n_jobs : int, default=1
+            number of threads to use.
+
+        Returns
+        -------
+        dtraj : ndarray(T, dtype=np.int32)
+            index of the closest center for every frame.
+        """
+        raise NotImplementedError()
+
+    def _brute_force(self, X, n_jobs):
+        dtraj = np.empty(X.shape[0], dtype=np.int32)
+        # float32/float64 chunks with strided rows are read without copying them
+        regspatial.assign(X, self._precentered, dtraj, self.metric, n_jobs, self._traces)
+        return dtraj
+
+
+class BruteForceIndex(CenterIndex):
+    """ Compares every frame with every cluster center. Supports all metrics. """
+
+    def assign(self, X, n_jobs=1):
+        return self._brute_force(X, n_jobs)
+
+
+class KDTreeIndex(CenterIndex):
+    """ k-d tree over the cluster centers (Euclidean metric only).
+
+    The tree prunes most distance evaluations in low-dimensional spaces (e.g. a few TICA
+    coordinates). Frames, for which the two closest centers can not be distinguished
+    within single precision, are re-assigned by brute force to reproduce its tie-breaking.
+    """
+    # relative distance difference below which the two nearest centers are considered equally close.
+    _tie_tolerance = 1e-5
+
+    def __init__(self, centers, metric='euclidean'):
+        super(KDTreeIndex, self).__init__(centers, metric)
+        if metric != 'euclidean':
+            raise ValueError('KDTreeIndex only supports the euclidean metric.')
+        from scipy.spatial import cKDTree
+        self._tree = cKDTree(self.centers)
+
+    @staticmethod
+    def supports(centers, metric):
+        return metric == 'euclidean'
+
+    def _query(self, X, k, n_jobs):
+        try:
+            return self._tree.query(X, k=k, workers=n_jobs)
+        except TypeError:  # scipy < 1.6
+            return self._tree.query(X, k=k, n_jobs=n_jobs)
+
+    def assign(self, X, n_jobs=1):
+        X = np.require(X, dtype=np.float32, requirements='C')
+        # the tree can not handle non-finite values, these frames are passed to the brute force search.
+        finite = np.all(np.isfinite(X), axis=1)
+        all_finite = finite.all()
+        dtraj = np.zeros(X.shape[0], dtype=np.int32)
+        ambiguous = ~finite
+        if len(self.centers) > 1:
+            dist, ind = self._query(X if all_finite else X[finite], k=2, n_jobs=n_jobs)
+            dtraj[finite] = ind[:, 0]
+            ambiguous[finite] = dist[:, 1] - dist[:, 0] <= self._tie_tolerance * dist[:, 1]
+        if ambiguous.any():
+            dtraj[ambiguous] = self._brute_force(X[ambiguous], n_jobs)
+        return dtraj
+
+
+_center_indices = {'brute_force': BruteForceIndex,
+                   'kdtree': KDTreeIndex,
+                   }
+
+# the automatic choice uses a k-d tree up to this dimension
+KDTREE_MAX_DIM = 8
+# and for at least this many cluster centers.
+KDTREE_MIN_CENTERS = 1000
+
+
+def register_center_index(name, index_class):
+    """ Makes a custom :class:`CenterIndex` implementation available by name.
+
+    Parameters
+    ----------
+    name : str
+        name of the index, which can be passed as `index_method` to clustering objects.
+    index_class : subclass of CenterIndex
+    """
+    if not (isinstance(index_class, type) and issubclass(index_class, CenterIndex)):
+        raise ValueError('index_class has to be a subclass of CenterIndex')
+    _center_indices[name] = index_class
+
+
+def create_center_index(centers, metric='euclidean', method='auto'):
+    """ Builds a nearest neighbour index over given cluster centers.
+
+    Parameters
+    ----------
+    centers : ndarray(n_centers, dim)
+        cluster centers.
+    metric : str, default='euclidean'
+        metric used to compare frames and centers ('euclidean', 'minRMSD').
+    method : str or subclass of CenterIndex, default='auto'
+        one of the registered index names ('brute_force', 'kdtree') or an index class.
+        If 'auto', a k-d tree is used for the Euclidean metric in low dimensions
+        (at most KDTREE_MAX_DIM) and for many centers (at least KDTREE_MIN_CENTERS),
+        otherwise the brute force search is used.
+
+    Returns
+    -------
+    index : CenterIndex
+    """
+    if isinstance(method, six.string_types):
+        if method == 'auto':
+            centers = np.asarray(centers)
+            if (KDTreeIndex.supports(centers, metric) and centers.ndim == 2
+                    and centers.shape[1] <= KDTREE_MAX_DIM and centers.shape[0] >= KDTREE_MIN_CENTERS):
+                method = 'kdtree'
+            else:
+                method = 'brute_force'
+        try:
+            index_class = _center_indices[method]
+        except KeyError:
+            raise ValueError('unknown index method "%s". Valid methods are %s'
+                             % (method, ['auto'] + sorted(_center_indices.keys())))
+    elif isinstance(method, type) and issubclass(method, CenterIndex):
+        index_class = method
+    else:
+        raise ValueError('index method has to be a string or a subclass of CenterIndex, but was %s' % method)
+
+    if not index_class.supports(centers, metric):
+        raise ValueError('index "%s" does not support metric "%s"' % (index_class.__name__, metric))
+
+    return index_class(centers, metric)
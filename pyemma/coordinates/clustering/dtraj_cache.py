@@ -0,0 +1,270 @@
+
+# This file is part of PyEMMA.
+#
+# Copyright (c) 2016 Computational Molecular Biology Group, Freie Universitaet Berlin (GER)
+#
+# PyEMMA is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+Persistent storage of discrete trajectories.
+
+The discrete trajectories of a clustering are stored under a key, which is built from the
+names, sizes, modification times and leading bytes of the input files, the features and parsing
+options of the reader, the description and parameters of all pipeline stages in between, the cluster
+centers, the metric, stride and skip. Pipelines, which can not be described reliably (e.g. data in
+memory or custom features) are never stored.
+'''
+
+from __future__ import absolute_import
+
+import hashlib
+import itertools
+import os
+import tempfile
+from collections import OrderedDict
+from logging import getLogger
+
+import numpy as np
+
+from pyemma.util import config
+from pyemma.util.numeric import _NotHashable, _update_hash
+
+logger = getLogger(__name__)
+
+__all__ = ('DtrajCache', 'dtraj_key')
+
+
+def _hash_file(hasher, filename):
+    statinfo = os.stat(filename)
+    with open(filename, mode='rb') as fh:
+        data = fh.read(1024)
+    _update_hash(hasher, [os.path.abspath(filename), statinfo.st_size, statinfo.st_mtime])
+    hasher.update(data)
+
+
+def _hash_reader(hasher, reader):
+    from pyemma.coordinates.data.data_in_memory import DataInMemory
+    from pyemma.coordinates.data.util.feature_cache import featurizer_key
+
+    if isinstance(reader, DataInMemory):
+        raise _NotHashable(DataInMemory)
+    # fragmented readers are described by their sub readers
+    sub_readers = getattr(reader, '_readers', None)
+    if sub_readers is not None:
+        for r in itertools.chain.from_iterable(sub_readers):
+            _hash_reader(hasher, r)
+        return
+
+    _update_hash(hasher, reader.__class__.__name__)
+    featurizer = getattr(reader, 'featurizer', None)
+    if featurizer is not None:
+        key = featurizer_key(featurizer)
+        if key is None:
+            raise _NotHashable(featurizer)
+        _update_hash(hasher, key)
+    # parsing options of text files
+    for attr in ('_comments', '_delimiters'):
+        if hasattr(reader, attr):
+            _update_hash(hasher, getattr(reader, attr))
+    filenames = reader.filenames
+    if not filenames:
+        raise _NotHashable('%s has no input files' % reader)
+    _update_hash(hasher, len(filenames))
+    for f in filenames:
+        _hash_file(hasher, f)
+
+
+def _hash_transformer(hasher, transformer):
+    if not getattr(transformer, '_estimated', True):
+        raise _NotHashable('%s is not estimated' % transformer)
+    _update_hash(hasher, transformer.__class__.__name__)
+    _update_hash(hasher, transformer.describe())
+    if hasattr(transformer, 'get_params'):
+        _update_hash(hasher, transformer.get_params(deep=False))
+    model = getattr(transformer, '_model', None)
+    if model is not None and hasattr(model, 'get_model_params'):
+        _update_hash(hasher, model.get_model_params(deep=False))
+
+
+def dtraj_key(clustering, stride=1, skip=0):
+    """ computes the key of the discrete trajectories of given clustering.
+
+    Returns
+    -------
+    key : str or None
+        The key or None, if the input pipeline of the clustering can not be described reliably.
+    """
+    if clustering.clustercenters is None or clustering.data_producer is None:
+        return None
+    hasher = hashlib.md5()
+    try:
+        _update_hash(hasher, [clustering.clustercenters, clustering.metric, stride, skip])
+        stage = clustering.data_producer
+        while not stage.is_reader:
+            _hash_transformer(hasher, stage)
+            stage = stage.data_producer
+            if stage is None:
+                return None
+        _hash_reader(hasher, stage)
+    except Exception as e:
+        # e.g. _NotHashable or input files, which have vanished in the meantime.
+        logger.debug('not caching dtrajs of %s: %s' % (clustering, e))
+        return None
+    return hasher.hexdigest()
+
+
+class DtrajCache(object):
+
+    """ stores discrete trajectories associated to a key (see :func:`dtraj_key`).
+
+    Parameters
+    ----------
+    directory : str (optional)
+        if given, the discrete trajectories are stored as one npz file per key in this
+        directory. Otherwise they are kept in memory and lost after the process has finished.
+
+    Notes
+    -----
+    The cache is bounded by config.dtraj_cache_max_size (MB). If it grows larger, the least recently
+    used entries are removed. Do not instantiate this yourself, but use the instance provided by
+    :meth:`instance`.
+
+    """
+    _instance = None
+
+    @staticmethod
+    def instance():
+        """ :returns the DtrajCache singleton instance"""
+        if DtrajCache._instance is None:
+            # if we do not have a configuration director yet, we do not want to store
+            if not config.cfg_dir:
+                directory = None
+            else:
+                directory = os.path.join(config.cfg_dir, 'dtraj_cache')
+            DtrajCache._instance = DtrajCache(directory)
+
+        return DtrajCache._instance
+
+    def __init__(self, directory=None):
+        self.directory = directory
+        # in memory: key -> list of dtrajs, ordered from least to most recently used
+        self._entries = OrderedDict()
+        # total size in bytes, determined on first write
+        self._size = None
+        if directory is not None:
+            from pyemma.util.files import mkdir_p
+            mkdir_p(directory)
+
+    @property
+    def max_size(self):
+        """ maximum size of the cache in bytes. """
+        return config.dtraj_cache_max_size * 1024**2
+
+    @property
+    def num_entries(self):
+        if self.directory is None:
+            return len(self._entries)
+        return len(self._files())
+
+    def _filename(self, key):
+        return os.path.join(self.directory, key + '.npz')
+
+    def _files(self):
+        return [os.path.join(self.directory, f) for f in os.listdir(self.directory) if f.endswith('.npz')]
+
+    def __getitem__(self, key):
+        if self.directory is None:
+            dtrajs = self._entries.pop(key)
+            self._entries[key] = dtrajs
+            return [d.copy() for d in dtrajs]
+
+        filename = self._filename(key)
+        try:
+            with np.load(filename) as npz:
+                dtrajs = [npz['arr_%i' % i] for i in range(len(npz.files))]
+        except EnvironmentError:
+            raise KeyError(key)
+        except Exception as e:
+            # corrupted entry, eg. by a process killed during writing.
+            logger.warning('could not read cached dtrajs "%s": %s' % (filename, e))
+            self._remove(filename)
+            raise KeyError(key)
+        # the modification time is the time stamp of the last usage
+        try:
+            os.utime(filename, None)
+        except EnvironmentError:
+            pass
+        return dtrajs
+
+    def __setitem__(self, key, dtrajs):
+        dtrajs = [np.asarray(d) for d in dtrajs]
+        size = sum(d.nbytes for d in dtrajs)
+        if size > self.max_size:
+            return
+
+        if self.directory is None:
+            self._entries.pop(key, None)
+            self._entries[key] = [d.copy() for d in dtrajs]
+            self._size = sum(d.nbytes for v in self._entries.values() for d in v)
+            while self._size > self.max_size:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= sum(d.nbytes for d in evicted)
+            return
+
+        if self._size is None:
+            self._size = sum(os.stat(f).st_size for f in self._files())
+        # write to a temporary file first, so concurrent readers never see incomplete entries.
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as fh:
+                np.savez(fh, *dtrajs)
+            getattr(os, 'replace', os.rename)(tmp, self._filename(key))
+        except EnvironmentError:
+            logger.exception('could not store dtrajs in cache "%s"' % self.directory)
+            self._remove(tmp)
+            return
+        self._size += os.stat(self._filename(key)).st_size
+        if self._size > self.max_size:
+            self._clean()
+
+    def _remove(self, filename):
+        try:
+            os.unlink(filename)
+        except EnvironmentError:
+            pass
+
+    def _clean(self):
+        """ removes the least recently used entries, until the cache is smaller than 3/4 of its max size. """
+        entries = []
+        for f in self._files():
+            try:
+                stat = os.stat(f)
+            except EnvironmentError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, f))
+        entries.sort()
+        self._size = sum(e[1] for e in entries)
+        logger.info('Cleaning dtraj cache, because it is too large. Size: %.2fMB. Max_size: %sMB'
+                    % (self._size / 1024.**2, config.dtraj_cache_max_size))
+        for _, size, f in entries:
+            if self._size <= 0.75 * self.max_size:
+                break
+            self._remove(f)
+            self._size -= size
+
+    def clear(self):
+        self._entries.clear()
+        if self.directory is not None:
+            for f in self._files():
+                self._remove(f)
+        self._size = None
@@ -56,13 +56,27 @@ extern "C" {
 #define ASSIGN_ERR_NO_MEMORY 1
 #define ASSIGN_ERR_INVALID_METRIC 2
 
-static char ASSIGN_USAGE[] = "assign(chunk, centers, dtraj, metric)\n"\
+/* number of elements of the (frames x centers) inner product block used during assignment */
+#define ASSIGN_BLOCK_ELEMENTS (1 << 21)
+/* relative safety margin for the triangle inequality bounds used by k-means */
+#define KMEANS_BOUNDS_TOLERANCE 1e-5f
+/* number of coordinates used for the grid over the centers in regular space clustering */
+#define REGSPACE_GRID_DIMS 3
+/* relative enlargement of the grid cells, so that rounding never hides a center within the cutoff */
+#define REGSPACE_GRID_MARGIN 1e-3
+/* number of cluster centers processed at once by the fallback inner product kernel */
+#define ASSIGN_CENTERS_TILE 64
+/* number of frames processed at once against a tile of centers by the fallback kernel */
+#define ASSIGN_FRAMES_TILE 64
+
+static char ASSIGN_USAGE[] = "assign(chunk, centers, dtraj, metric, n_threads, traces=None)\n"\
 "Assigns frames in `chunk` to the closest cluster centers.\n"\
 "\n"\
 "Parameters\n"\
 "----------\n"\
-"chunk : (N,M) C-style contiguous and behaved ndarray of np.float32\n"\
-"    (input) array of N frames, each frame having dimension M\n"\
+"chunk : (N,M) ndarray of np.float32 or np.float64\n"\
+"    (input) array of N frames, each frame having dimension M. The rows may be strided,\n"\
+"    other dtypes or layouts are converted to C-contiguous np.float32.\n"\
 "centers : (M,K) ndarray-like of np.float32\n"\
 "    (input) Non-empty array-like of cluster centers.\n"\
 "dtraj : (N) ndarray of np.int64\n"\
@@ -71,6 +85,11 @@ static char ASSIGN_USAGE[] = "assign(chunk, centers, dtraj, metric)\n"\
 "    where d is the metric that is specified with the argument `metric`.\n"\
 "metric : string\n"\
 "    (input) One of \"euclidean\" or \"minRMSD\" (case sensitive).\n"\
+"n_threads : int\n"\
+"    (input) number of OpenMP threads.\n"\
+"traces : (K) ndarray-like of np.float32, optional\n"\
+"    (input) minRMSD only: traces of the centers as returned by `precenter`. If given,\n"\
+"    `centers` have to be the pre-centered centers returned by `precenter`.\n"\
 "\n"\
 "Returns \n"\
 "-------\n"\
@@ -78,19 +97,79 @@ static char ASSIGN_USAGE[] = "assign(chunk, centers, dtraj, metric)\n"\
 "\n"\
 "Note\n"\
 "----\n"\
+"For the Euclidean metric, frames are processed in blocks and the inner products\n"\
+"between frames and centers are computed with a single precision matrix product\n"\
+"(BLAS sgemm, if available). Candidate centers are re-evaluated exactly, so the\n"\
+"result (including tie-breaking to the smallest center index) is identical to\n"\
+"a brute force search.\n"\
 "This function uses the minRMSD implementation of mdtraj.";
 
+static char PRECENTER_USAGE[] = "precenter(centers)\n"\
+"Centers the cluster centers for the minRMSD metric, so this is not repeated for every assigned chunk.\n"\
+"\n"\
+"Parameters\n"\
+"----------\n"\
+"centers : (K,M) ndarray-like of np.float32\n"\
+"    (input) cluster centers, each consisting of M/3 atoms in atom-major order.\n"\
+"\n"\
+"Returns \n"\
+"-------\n"\
+"(precentered, traces): the centered copy of the centers and their traces, which\n"\
+"can be passed to `assign`.";
+
+/*
+ * A chunk of frames as passed from python. The frames can be float32 or float64 and the rows may be
+ * strided (e.g. a strided memmap or a column slice), only the coordinates of a frame are contiguous.
+ * The kernels read the frames through chunk_row and chunk_rows, which convert them to float32 only
+ * if necessary, so the chunks do not have to be copied as a whole.
+ */
+typedef struct {
+    char *data;
+    Py_ssize_t N_frames;
+    Py_ssize_t dim;
+    Py_ssize_t row_stride;  /* in bytes */
+    int type_num;           /* NPY_FLOAT32 or NPY_FLOAT64 */
+} chunk_view;
+
+// imports a two-dimensional chunk, other dtypes or memory layouts are converted to float32 (returns a new reference)
+PyArrayObject *import_chunk(PyObject *obj, chunk_view *view);
+// describes a C-contiguous float32 array of frames
+void float_chunk_view(float *chunk, Py_ssize_t N_frames, Py_ssize_t dim, chunk_view *view);
+// whether the frames of the chunk can be used without conversion
+int chunk_is_float_contiguous(chunk_view *view);
+// frame i as float32, either pointing into the chunk or converted into buffer (of dim elements)
+float *chunk_row(chunk_view *view, Py_ssize_t i, float *buffer);
+// copies n_rows frames starting at first_row as float32 into the C-contiguous out
+void chunk_rows(chunk_view *view, Py_ssize_t first_row, Py_ssize_t n_rows, float *out);
+
 // euclidean metric
 float euclidean_distance(float *SKP_restrict a, float *SKP_restrict b, size_t n, float *buffer_a, float *buffer_b, float*dummy);
 // minRMSD metric
 float minRMSD_distance(float *SKP_restrict a, float *SKP_restrict b, size_t n, float *SKP_restrict buffer_a, float *SKP_restrict buffer_b,
 float* pre_calc_trace_a);
 
+// looks up BLAS routines (has to be called with the GIL held, before c_assign)
+void init_blas(void);
+
+/*
+ * The functions below (c_assign, c_assign_view, c_precenter, c_assign_precentered) do not touch python objects,
+ * so they can be called without holding the GIL.
+ */
+
 // assignment to cluster centers from python
 PyObject *assign(PyObject *self, PyObject *args);
 // assignment to cluster centers from c
 int c_assign(float *chunk, float *centers, npy_int32 *dtraj, char* metric,
              Py_ssize_t N_frames, Py_ssize_t N_centers, Py_ssize_t dim, int n_threads);
+// centers cluster centers for the minRMSD metric and computes their traces
+PyObject *precenter(PyObject *self, PyObject *args);
+void c_precenter(float *centers, float *centers_precentered, float *traces, Py_ssize_t N_centers, Py_ssize_t dim);
+// assignment of a chunk_view to cluster centers
+int c_assign_view(chunk_view *chunk, float *centers, npy_int32 *dtraj, char* metric,
+                  Py_ssize_t N_centers, int n_threads);
+// minRMSD assignment to pre-centered cluster centers
+int c_assign_precentered(chunk_view *chunk, float *centers_precentered, float *traces, npy_int32 *dtraj,
+                         Py_ssize_t N_centers, int n_threads);
 
 #ifdef __cplusplus
 }
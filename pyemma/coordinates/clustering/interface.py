@@ -30,8 +30,10 @@ import numpy as np
 from pyemma._base.model import Model
 from pyemma._base.parallel import NJobsMixIn
 from pyemma._ext.sklearn.base import ClusterMixin
-from pyemma.coordinates.clustering import regspatial
+from pyemma.coordinates.clustering.center_index import create_center_index
+from pyemma.coordinates.clustering.dtraj_cache import DtrajCache, dtraj_key
 from pyemma.coordinates.data._base.transformer import StreamingEstimationTransformer
+from pyemma.util import config
 from pyemma.util.annotators import fix_docs, aliased, alias
 from pyemma.util.discrete_trajectories import index_states, sample_indexes_by_state
 from pyemma.util.files import mkdir_p
@@ -59,6 +61,9 @@ class AbstractClustering(StreamingEstimationTransformer, Model, ClusterMixin, NJ
         super(AbstractClustering, self).__init__()
         self.metric = metric
         self._clustercenters = None
+        self._center_index = None
+        self._index_method = 'auto'
+        self._assign_workers = 1
         self._previous_stride = -1
         self._dtrajs = []
         self._overwrite_dtrajs = False
@@ -75,6 +80,50 @@ class AbstractClustering(StreamingEstimationTransformer, Model, ClusterMixin, NJ
     def clustercenters(self, val):
         val = np.asarray(val, dtype='float32', order='C')
         self._clustercenters = val
+        self._center_index = None
+
+    @property
+    def index_method(self):
+        """ Nearest neighbour index used to assign data to the cluster centers.
+
+        One of 'auto', 'brute_force', 'kdtree' (or any name registered via
+        :func:`pyemma.coordinates.clustering.center_index.register_center_index`)
+        or a subclass of :class:`CenterIndex <pyemma.coordinates.clustering.center_index.CenterIndex>`.
+        With 'auto', a k-d tree is used for many centers in low-dimensional spaces and the
+        Euclidean metric. All methods yield identical assignments.
+        """
+        return self._index_method
+
+    @index_method.setter
+    def index_method(self, value):
+        self._index_method = value
+        self._center_index = None
+
+    @property
+    def center_index(self):
+        """ The nearest neighbour index built for the current cluster centers (see :attr:`index_method`)."""
+        if self._center_index is None or self._center_index.metric != self.metric:
+            self._center_index = create_center_index(self.clustercenters, self.metric, self.index_method)
+        return self._center_index
+
+    @property
+    def assign_workers(self):
+        """ Number of chunks, which are assigned concurrently by :meth:`assign`.
+
+        With more than one worker, the chunks of the input are read (e.g. decoded and
+        featurized) in the calling thread, while a pool of this many threads assigns the
+        previously read chunks. The assignment releases the GIL, so reading and assigning
+        overlap. The :attr:`n_jobs` threads are distributed among the workers.
+        Default is 1, which assigns the chunks one after another.
+        """
+        return self._assign_workers
+
+    @assign_workers.setter
+    def assign_workers(self, value):
+        value = int(value)
+        if value < 1:
+            raise ValueError('assign_workers has to be positive, but was %s' % value)
+        self._assign_workers = value
 
     @property
     def overwrite_dtrajs(self):
@@ -146,9 +195,7 @@ class AbstractClustering(StreamingEstimationTransformer, Model, ClusterMixin, NJ
 
     def _transform_array(self, X):
         """get closest index of point in :attr:`clustercenters` to x."""
-        dtraj = np.empty(X.shape[0], dtype=self.output_type())
-        regspatial.assign(X.astype(np.float32, order='C', copy=False),
-                          self.clustercenters, dtraj, self.metric, self.n_jobs)
+        dtraj = self.center_index.assign(X, self.n_jobs)
         res = dtraj[:, None]  # always return a column vector in this function
         return res
 
@@ -165,7 +212,9 @@ class AbstractClustering(StreamingEstimationTransformer, Model, ClusterMixin, NJ
         by this clustering method (usually a Voronoi tesselation).
 
         You can assign multiple times with different strides. The last result of assign will be saved and is available
-        as the attribute :func:`dtrajs`.
+        as the attribute :func:`dtrajs`. If config.use_dtraj_cache is set, the discrete trajectories of file based
+        inputs are also stored on disk and re-used, as long as the input files, the pipeline, the cluster centers,
+        stride and skip do not change.
 
         Parameters
         ----------
@@ -196,10 +245,24 @@ class AbstractClustering(StreamingEstimationTransformer, Model, ClusterMixin, NJ
                 return self._dtrajs
             self._previous_stride = stride
             skip = self.skip if hasattr(self, 'skip') else 0
-            # map to column vectors
-            mapped = self.get_output(stride=stride, chunk=self.chunksize, skip=skip)
-            # flatten and save
-            self._dtrajs = [np.transpose(m)[0] for m in mapped]
+            if not self._estimated:
+                self.estimate(self.data_producer, stride=stride)
+            key = self._dtraj_cache_key(stride=stride, skip=skip)
+            if key is not None:
+                try:
+                    self._dtrajs = DtrajCache.instance()[key]
+                    return self._dtrajs
+                except KeyError:
+                    pass
+            if self.assign_workers > 1 and not self.in_memory:
+                self._dtrajs = self._assign_concurrently(stride=stride, skip=skip)
+            else:
+                # map to column vectors
+                mapped = self.get_output(stride=stride, chunk=self.chunksize, skip=skip)
+                # flatten and save
+                self._dtrajs = [np.transpose(m)[0] for m in mapped]
+            if key is not None:
+                DtrajCache.instance()[key] = self._dtrajs
             # return
             return self._dtrajs
         else:
@@ -216,6 +279,57 @@ class AbstractClustering(StreamingEstimationTransformer, Model, ClusterMixin, NJ
             # return
             return mapped
 
+    def _dtraj_cache_key(self, stride=1, skip=0):
+        """ key of the discrete trajectories in the :class:`DtrajCache <pyemma.coordinates.clustering.dtraj_cache.DtrajCache>`
+        or None, if they should not be cached. """
+        if not config.use_dtraj_cache or self.in_memory:
+            return None
+        return dtraj_key(self, stride=stride, skip=skip)
+
+    def _assign_concurrently(self, stride=1, skip=0):
+        """ assigns the chunks of the data producer in a pool of :attr:`assign_workers` threads. """
+        from collections import deque
+        from multiprocessing.pool import ThreadPool
+
+        if not self._estimated:
+            self.estimate(self.data_producer, stride=stride)
+
+        n_workers = self.assign_workers
+        n_jobs = max(1, self.n_jobs // n_workers)
+        # build the index once, before the workers use it
+        index = self.center_index
+        # bounds the number of chunks held in memory
+        max_pending = 2 * n_workers
+
+        it = self.data_producer.iterator(stride=stride, skip=skip, chunk=self.chunksize, return_trajindex=True)
+        pool = ThreadPool(n_workers)
+        pending = deque()
+
+        def finish_oldest():
+            itraj, pos, result = pending.popleft()
+            dtraj = result.get()
+            dtrajs[itraj][pos:pos + len(dtraj)] = dtraj
+            self._progress_update(1, stage=1)
+
+        try:
+            with it:
+                dtrajs = [np.empty(l, dtype=self.output_type()) for l in it.trajectory_lengths()]
+                self._progress_register(it.n_chunks, description='assigning data of %s' % self.__class__.__name__,
+                                        stage=1)
+                for itraj, X in it:
+                    if len(X) > 0:
+                        pending.append((itraj, it.pos, pool.apply_async(index.assign, (X, n_jobs))))
+                    else:
+                        self._progress_update(1, stage=1)
+                    while len(pending) >= max_pending:
+                        finish_oldest()
+                while pending:
+                    finish_oldest()
+        finally:
+            pool.terminate()
+            pool.join()
+        return dtrajs
+
     def save_dtrajs(self, trajfiles=None, prefix='',
                     output_dir='.',
                     output_format='ascii',
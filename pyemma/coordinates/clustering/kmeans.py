@@ -33,7 +33,7 @@ from pyemma.coordinates.clustering.interface import AbstractClustering
 from pyemma.util.annotators import fix_docs
 from pyemma.util.units import bytes_to_string
 
-from pyemma.util.contexts import conditional, random_seed
+from pyemma.util.contexts import conditional, random_seed, numpy_random_seed
 from six.moves import range
 import numpy as np
 
@@ -49,7 +49,7 @@ class KmeansClustering(AbstractClustering, ProgressReporter):
 
     def __init__(self, n_clusters, max_iter=5, metric='euclidean',
                  tolerance=1e-5, init_strategy='kmeans++', fixed_seed=False,
-                 oom_strategy='memmap', stride=1, n_jobs=None, skip=0):
+                 oom_strategy='memmap', stride=1, n_jobs=None, skip=0, use_bounds=False):
         r"""Kmeans clustering
 
         Parameters
@@ -71,8 +71,11 @@ class KmeansClustering(AbstractClustering, ProgressReporter):
             metric to use during clustering ('euclidean', 'minRMSD')
 
         init_strategy : string
-            can be either 'kmeans++' or 'uniform', determining how the initial
-            cluster centers are being chosen
+            can be either 'kmeans++', 'kmeans||' or 'uniform', determining how the initial
+            cluster centers are being chosen. 'kmeans||' is a scalable variant of kmeans++,
+            which oversamples candidates in a few passes over the data and reclusters them.
+            It is considerably faster for many cluster centers and does not need the data
+            in memory.
 
         fixed_seed : bool
             if True, the seed gets set to 42
@@ -84,14 +87,27 @@ class KmeansClustering(AbstractClustering, ProgressReporter):
             * 'memmap': if no memory is available to store all data, a memory
                 mapped file is created and written to
             * 'raise': raise OutOfMemory exception.
+            * 'stream': if no memory is available to store all data, every k-means
+                iteration is performed as a pass over the data, accumulating the
+                new centers chunk by chunk. The initial centers are drawn from a
+                random sample of the data, so memory only scales with the number
+                of cluster centers and not with the number of frames.
 
         stride : int
             stridden data
 
         n_jobs : int or None, default None
-            Number of threads to use during assignment of the data.
+            Number of threads to use during assignment of the data and the k-means iterations.
             If None, all available CPUs will be used.
 
+        use_bounds : bool, default=False
+            if True, the k-means iterations keep triangle inequality bounds (Hamerly) of the
+            distances of every frame to the cluster centers, which allow to skip most distance
+            computations once the centers do not move much anymore. This pays off for
+            low-dimensional data and many cluster centers and yields exactly the same centers.
+            Requires memory for three additional numbers per frame. Only used for the
+            euclidean metric.
+
         """
         super(KmeansClustering, self).__init__(metric=metric, n_jobs=n_jobs)
 
@@ -99,10 +115,18 @@ class KmeansClustering(AbstractClustering, ProgressReporter):
                         init_strategy=init_strategy, oom_strategy=oom_strategy,
                         fixed_seed=fixed_seed, stride=stride, skip=skip
                         )
+        # not passed to set_params, since subclasses (mini-batch) do not expose it.
+        self.use_bounds = use_bounds
 
         self._cluster_centers_iter = None
         self._centers_iter_list = []
 
+    # number of frames per cluster center sampled for the kmeans++ initialization in streaming mode
+    _streaming_init_samples_per_center = 100
+    # number of sampling rounds and candidates drawn per round (times n_clusters) by kmeans||
+    _kmeans_parallel_rounds = 5
+    _kmeans_parallel_oversampling = 2
+
     def _init_in_memory_chunks(self, size):
         available_mem = psutil.virtual_memory().available
         required_mem = self._calculate_required_memory(size)
@@ -116,6 +140,12 @@ class KmeansClustering(AbstractClustering, ProgressReporter):
                                     'with a memmapped temporary file.'
                                     % (bytes_to_string(required_mem), bytes_to_string(available_mem)))
                 raise MemoryError()
+            elif self.oom_strategy == 'stream':
+                self.logger.warning('K-means failed to load all the data (%s required, %s available) into memory '
+                                    'and now performs a pass over the data in every iteration.'
+                                    % (bytes_to_string(required_mem), bytes_to_string(available_mem)))
+                self._in_memory_chunks = None
+                self._init_streaming_sample(size)
             else:
                 self.logger.warning('K-means failed to load all the data (%s required, %s available) into memory '
                                     'and now uses a memmapped temporary file which is comparably slow. '
@@ -125,6 +155,27 @@ class KmeansClustering(AbstractClustering, ProgressReporter):
                                                    shape=(size, self.data_producer.dimension()), order='C',
                                                    dtype=np.float32)
 
+    def _init_streaming_sample(self, size):
+        # the kmeans++ initialization runs on a random sample of the data instead of all frames.
+        self._init_sample = None
+        if self.init_strategy == 'kmeans++':
+            n_samples = min(size, self._streaming_init_samples_per_center * self.n_clusters)
+            with conditional(self.fixed_seed, numpy_random_seed(42)):
+                self._init_sample_indices = self._draw_distinct_indices(size, n_samples)
+            self._init_sample = np.empty(shape=(n_samples, self.data_producer.dimension()),
+                                         order='C', dtype=np.float32)
+
+    @staticmethod
+    def _draw_distinct_indices(size, n):
+        # n sorted, distinct random indices in [0, size), without materializing all size indices.
+        if size <= 4 * n:
+            return np.sort(np.random.choice(size, n, replace=False))
+        indices = np.unique(np.random.randint(0, size, size=n, dtype=np.int64))
+        while len(indices) < n:
+            more = np.random.randint(0, size, size=n - len(indices), dtype=np.int64)
+            indices = np.unique(np.concatenate((indices, more)))
+        return indices
+
     def _calculate_required_memory(self, size):
         empty = np.empty(shape=(1, self.data_producer.dimension()), order='C', dtype=np.float32)
         return empty[0, :].nbytes * size
@@ -138,33 +189,37 @@ class KmeansClustering(AbstractClustering, ProgressReporter):
     def _estimate(self, iterable, **kw):
         self._init_estimate()
 
-        with iterable.iterator(return_trajindex=True, stride=self.stride,
-                               chunk=self.chunksize, skip=self.skip) as iter:
-            # first pass: gather data and run k-means
-            first_chunk = True
-            for itraj, X in iter:
-                # collect data
-                self._collect_data(X, first_chunk)
-                # initialize cluster centers
-                self._initialize_centers(X, itraj, iter.pos, iter.last_chunk)
-                first_chunk = False
+        # when streaming, kmeans|| does not need anything from the first pass
+        if not (self._in_memory_chunks is None and self.init_strategy == 'kmeans||'):
+            with iterable.iterator(return_trajindex=True, stride=self.stride,
+                                   chunk=self.chunksize, skip=self.skip) as iter:
+                # first pass: gather data and run k-means
+                first_chunk = True
+                for itraj, X in iter:
+                    # collect data
+                    self._collect_data(X, first_chunk)
+                    # initialize cluster centers
+                    self._initialize_centers(X, itraj, iter.pos, iter.last_chunk)
+                    first_chunk = False
+        if self.init_strategy == 'kmeans||':
+            self._cluster_centers_iter = self._init_centers_kmeans_parallel(lambda: self._chunks(iterable))
 
         # run k-means with all the data
-        self._logger.debug("Accumulated all data, running kmeans on " + str(self._in_memory_chunks.shape))
+        if self._in_memory_chunks is not None:
+            self._logger.debug("Accumulated all data, running kmeans on " + str(self._in_memory_chunks.shape))
         it = 0
         converged_in_max_iter = False
         prev_cost = 0
+        if self._in_memory_chunks is None:
+            bounds = None
+            steps = self._streaming_lloyd_steps(iterable, self._cluster_centers_iter)
+            lloyd_step = lambda centers: next(steps)
+        else:
+            bounds = self._init_bounds(len(self._in_memory_chunks))
+            lloyd_step = lambda centers: kmeans_clustering.cluster(self._in_memory_chunks, centers,
+                                                                   self.metric, self.n_jobs, bounds)
         while it < self.max_iter:
-            self._cluster_centers_iter = kmeans_clustering.cluster(
-                                                self._in_memory_chunks,
-                                                self._cluster_centers_iter,
-                                                self.metric)
-            self._cluster_centers_iter = [row for row in self._cluster_centers_iter]
-
-            cost = kmeans_clustering.cost_function(self._in_memory_chunks,
-                                                   self._cluster_centers_iter,
-                                                   self.metric,
-                                                   self.n_clusters)
+            self._cluster_centers_iter, cost = lloyd_step(self._cluster_centers_iter)
             rel_change = np.abs(cost - prev_cost) / cost
             prev_cost = cost
 
@@ -181,6 +236,7 @@ class KmeansClustering(AbstractClustering, ProgressReporter):
             self._logger.info("Algorithm did not reach convergence criterion"
                               " of %g in %i iterations. Consider increasing max_iter."
                               % (self.tolerance, self.max_iter))
+        del bounds
         # set centers
         self.clustercenters = np.array(self._cluster_centers_iter)
         del self._cluster_centers_iter
@@ -189,6 +245,154 @@ class KmeansClustering(AbstractClustering, ProgressReporter):
 
         return self
 
+    def _chunks(self, iterable):
+        # one pass over the (strided) data, taken from memory if the data has been collected.
+        # The kernels read float32/float64 chunks directly, so streamed chunks are not converted.
+        if self._in_memory_chunks is not None:
+            chunksize = max(1, self.chunksize if self.chunksize else len(self._in_memory_chunks))
+            for start in range(0, len(self._in_memory_chunks), chunksize):
+                yield self._in_memory_chunks[start:start + chunksize]
+        else:
+            with iterable.iterator(return_trajindex=False, stride=self.stride,
+                                   chunk=self.chunksize, skip=self.skip) as iter:
+                for X in iter:
+                    yield X
+
+    def _streaming_lloyd_steps(self, iterable, centers):
+        # generates the updated centers and costs of successive k-means iterations like kmeans_clustering.cluster,
+        # but every iteration is a pass over the data, which only keeps the sums and counts per center.
+        # The cost of an iteration refers to its updated centers, so it is determined during the next pass.
+        prev_centers = None
+        centers = np.array(centers, dtype=np.float32, order='C')
+        while True:
+            sums = np.zeros(centers.shape, dtype=np.float64)
+            counts = np.zeros(len(centers), dtype=np.int64)
+            cost = 0.0
+            for X in self._chunks(iterable):
+                cost += kmeans_clustering.accumulate(X, centers, self.metric, self.n_jobs, sums, counts,
+                                                     prev_centers)
+            if prev_centers is not None:
+                yield centers, cost
+            # empty clusters keep their center
+            new_centers = centers.copy()
+            non_empty = counts > 0
+            new_centers[non_empty] = sums[non_empty] / counts[non_empty, np.newaxis]
+            prev_centers, centers = centers, new_centers
+
+    def _init_centers_kmeans_parallel(self, passes):
+        r""" kmeans|| initialization [1]_.
+
+        Starting from a uniformly drawn frame, every round draws ``oversampling * n_clusters`` candidates
+        with a probability proportional to their squared distance to the previous candidates. Finally the
+        candidates are weighted by the number of frames closest to them and reclustered by a weighted
+        kmeans++. Every round is a single (parallel) pass over the data.
+
+        Parameters
+        ----------
+        passes : callable
+            returns an iterable over all chunks of the data (as C-contiguous float32 arrays).
+
+        References
+        ----------
+        .. [1] Bahmani, B. et al. (2012). Scalable k-means++. Proc. VLDB Endow. 5, 622-633.
+        """
+        n_candidates = self._kmeans_parallel_oversampling * self.n_clusters
+        # If the data is in memory, we also keep the closest candidate of every frame, so that every round
+        # only has to compare the frames with the candidates drawn in the previous round.
+        if self._in_memory_chunks is not None:
+            closest = (np.full(len(self._in_memory_chunks), -1, dtype=np.int32),
+                       np.full(len(self._in_memory_chunks), np.inf, dtype=np.float32))
+        else:
+            closest = None
+        with conditional(self.fixed_seed, numpy_random_seed(42)):
+            candidates = self._sample_d2(passes(), 1, None)
+            if len(candidates) == 0:
+                raise ValueError('kmeans|| initialization failed, the data does not contain any finite frame.')
+            self._progress_update(1, stage=0)
+            new_candidates = candidates
+            for _ in range(self._kmeans_parallel_rounds):
+                if closest is None:
+                    new_candidates = self._sample_d2(passes(), n_candidates, candidates)
+                else:
+                    new_candidates = self._sample_d2(passes(), n_candidates, new_candidates,
+                                                     closest, len(candidates) - len(new_candidates))
+                candidates = np.vstack((candidates, new_candidates))
+                self._progress_update(1, stage=0)
+
+        # weight the candidates by the number of frames closest to them
+        if closest is None:
+            assignments = (self._closest_centers(X, candidates)[0] for X in passes())
+        else:
+            self._update_closest(closest, 0, self._in_memory_chunks, new_candidates,
+                                 len(candidates) - len(new_candidates))
+            assignments = (closest[0], )
+        weights = np.zeros(len(candidates))
+        for dtraj in assignments:
+            weights += np.bincount(dtraj[dtraj >= 0], minlength=len(candidates))
+        self._progress_update(1, stage=0)
+
+        self._logger.debug("reclustering %i kmeans|| candidates" % len(candidates))
+        kmeans_clustering.set_callback(self.kmeanspp_center_assigned)
+        return kmeans_clustering.init_centers(candidates, self.metric, self.n_clusters,
+                                              not self.fixed_seed, weights.astype(np.float32))
+
+    def _closest_centers(self, X, centers):
+        dtraj, d = kmeans_clustering.closest_centers(X, centers, self.metric, self.n_jobs)
+        # frames with non-finite coordinates can not be assigned
+        d[dtraj < 0] = np.inf
+        return dtraj, d
+
+    def _update_closest(self, closest, offset, X, centers, first_index):
+        # update the closest center (index, distance) of the frames starting at offset by the given new centers
+        dtraj, d = self._closest_centers(X, centers)
+        indices, distances = closest[0][offset:offset + len(X)], closest[1][offset:offset + len(X)]
+        # ties are resolved to the previous (smaller) index
+        closer = d < distances
+        indices[closer] = dtraj[closer] + first_index
+        distances[closer] = d[closer]
+        return distances
+
+    def _sample_d2(self, chunks, n, candidates, closest=None, first_index=0):
+        # Draws n frames in a single pass with probabilities proportional to their squared distance to the
+        # candidates (or uniformly, if candidates is None) by weighted reservoir sampling [Efraimidis 2006].
+        # If closest is given, it holds the closest previous candidates and only the given new candidates
+        # (with indices starting at first_index) are compared to the frames.
+        keys = np.empty(0)
+        sample = np.empty((0, self.data_producer.dimension()), dtype=np.float32)
+        offset = 0
+        for X in chunks:
+            if candidates is None:
+                weights = np.all(np.isfinite(X), axis=1).astype(np.float64)
+            else:
+                if closest is None:
+                    d = self._closest_centers(X, candidates)[1]
+                else:
+                    d = self._update_closest(closest, offset, X, candidates, first_index)
+                d = d.astype(np.float64)
+                # non-finite frames are never drawn
+                d[~np.isfinite(d)] = 0
+                weights = d * d
+            offset += len(X)
+            with np.errstate(divide='ignore'):
+                chunk_keys = np.log(np.random.random_sample(len(X))) / weights
+            # frames of weight zero get a key of -inf and are never drawn
+            drawable = chunk_keys > -np.inf
+            keys = np.concatenate((keys, chunk_keys[drawable]))
+            sample = np.concatenate((sample, X[drawable]))
+            if len(keys) > n:
+                largest = np.argpartition(keys, len(keys) - n)[len(keys) - n:]
+                keys, sample = keys[largest], sample[largest]
+        # order by key, so that the result does not depend on the chunking
+        return np.require(sample[np.argsort(-keys, kind='mergesort')], dtype=np.float32, requirements='C')
+
+    def _init_bounds(self, n_frames):
+        # assignments (-1 = not yet assigned), upper and lower distance bounds for kmeans_clustering.cluster
+        if not self.use_bounds or self.metric != 'euclidean':
+            return None
+        return (np.full(n_frames, -1, dtype=np.int32),
+                np.zeros(n_frames, dtype=np.float32),
+                np.zeros(n_frames, dtype=np.float32))
+
     def _finish_estimate(self):
         fh = None
         if isinstance(self._in_memory_chunks, np.memmap):
@@ -196,10 +400,12 @@ class KmeansClustering(AbstractClustering, ProgressReporter):
         del self._in_memory_chunks
         if fh:
             os.unlink(fh)
+        if hasattr(self, '_init_sample'):
+            del self._init_sample
         if self.init_strategy == 'uniform':
             del self._centers_iter_list
             del self._init_centers_indices
-        if self.init_strategy == 'kmeans++':
+        if self.init_strategy in ('kmeans++', 'kmeans||'):
             self._progress_force_finish(0)
         self._progress_force_finish(1)
 
@@ -219,6 +425,10 @@ class KmeansClustering(AbstractClustering, ProgressReporter):
         if self.init_strategy == 'kmeans++':
             self._progress_register(self.n_clusters,
                                     description="initialize kmeans++ centers", stage=0)
+        elif self.init_strategy == 'kmeans||':
+            # sampling rounds, first candidate and weighting pass plus the reclustering of the candidates
+            self._progress_register(self._kmeans_parallel_rounds + 2 + self.n_clusters,
+                                    description="initialize kmeans|| centers", stage=0)
         self._progress_register(self.max_iter, description="kmeans iterations", stage=1)
         self._init_in_memory_chunks(total_length)
         if self.init_strategy == 'uniform':
@@ -238,9 +448,9 @@ class KmeansClustering(AbstractClustering, ProgressReporter):
                     if len(self._cluster_centers_iter) < self.n_clusters and t + l in self._init_centers_indices[itraj]:
                         self._cluster_centers_iter.append(X[l].astype(np.float32, order='C'))
         elif last_chunk and self.init_strategy == 'kmeans++':
+            data = self._in_memory_chunks if self._in_memory_chunks is not None else self._init_sample
             kmeans_clustering.set_callback(self.kmeanspp_center_assigned)
-            cc = kmeans_clustering.init_centers(self._in_memory_chunks,
-                                                self.metric, self.n_clusters, not self.fixed_seed)
+            cc = kmeans_clustering.init_centers(data, self.metric, self.n_clusters, not self.fixed_seed)
             self._cluster_centers_iter = [c for c in cc]
 
     def _collect_data(self, X, first_chunk):
@@ -248,8 +458,14 @@ class KmeansClustering(AbstractClustering, ProgressReporter):
         if first_chunk:
             self._t_total = 0
 
-        # appends a true copy
-        self._in_memory_chunks[self._t_total:self._t_total + len(X)] = X[:]
+        if self._in_memory_chunks is None:
+            # streaming: only keep the frames drawn for the initialization
+            if self._init_sample is not None:
+                start, stop = np.searchsorted(self._init_sample_indices, (self._t_total, self._t_total + len(X)))
+                self._init_sample[start:stop] = X[self._init_sample_indices[start:stop] - self._t_total]
+        else:
+            # appends a true copy
+            self._in_memory_chunks[self._t_total:self._t_total + len(X)] = X[:]
         self._t_total += len(X)
 
 
@@ -263,6 +479,8 @@ class MiniBatchKmeansClustering(KmeansClustering):
             raise ValueError("stride is a dummy value in MiniBatch Kmeans")
         if batch_size > 1:
             raise ValueError("batch_size should be less or equal to 1, but was %s" % batch_size)
+        if oom_strategy == 'stream':
+            raise ValueError("oom_strategy 'stream' is not supported by MiniBatch Kmeans")
 
         self._cluster_centers_iter = None
         self._centers_iter_list = []
@@ -331,17 +549,13 @@ class MiniBatchKmeansClustering(KmeansClustering):
                     if i_pass == 0:
                         self._initialize_centers(X, iterator.current_trajindex, iterator.pos, iterator.last_chunk)
                     first_chunk = False
+                if i_pass == 0 and self.init_strategy == 'kmeans||':
+                    self._cluster_centers_iter = self._init_centers_kmeans_parallel(lambda: self._chunks(None))
 
-                # one pass over data completed
-                self._cluster_centers_iter = kmeans_clustering.cluster(self._in_memory_chunks,
-                                                                       self._cluster_centers_iter,
-                                                                       self.metric)
-                self._cluster_centers_iter = [row for row in self._cluster_centers_iter]
-
-                cost = kmeans_clustering.cost_function(self._in_memory_chunks,
-                                                       self._cluster_centers_iter,
-                                                       self.metric,
-                                                       self.n_clusters)
+                # one pass over data completed (the sample changes every pass, so bounds can not be kept)
+                self._cluster_centers_iter, cost = kmeans_clustering.cluster(self._in_memory_chunks,
+                                                                             self._cluster_centers_iter,
+                                                                             self.metric, self.n_jobs)
 
                 rel_change = np.abs(cost - prev_cost) / cost
                 prev_cost = cost
@@ -131,33 +131,36 @@ class RegularSpaceClustering(AbstractClustering):
         # 2. for all X: calc distances to all clustercenters
         # 3. add new centroid, if min(distance to all other clustercenters) >= dmin
         ########
-        # temporary list to store cluster centers
-        clustercenters = []
+        # buffer for the cluster centers, which is grown by regspatial.cluster when needed
+        clustercenters = np.empty((min(self.max_centers, 1024), self.data_producer.dimension()),
+                                  dtype=np.float32)
+        n_centers = 0
+        max_reached = False
         used_frames = 0
         it = iterable.iterator(return_trajindex=False, stride=self.stride,
                                chunk=self.chunksize, skip=self.skip)
-        try:
-            with it:
-                for X in it:
-                    used_frames += len(X)
-                    regspatial.cluster(X.astype(np.float32, order='C', copy=False),
-                                       clustercenters, self.dmin,
-                                       self.metric, self.max_centers)
-        except RuntimeError:
+        with it:
+            for X in it:
+                used_frames += len(X)
+                clustercenters, n_centers, max_reached = regspatial.cluster(
+                    X, clustercenters, n_centers, self.dmin, self.metric, self.max_centers, self.n_jobs)
+                if max_reached:
+                    break
+
+        clustercenters = clustercenters[:n_centers].copy()
+        if max_reached:
             msg = 'Maximum number of cluster centers reached.' \
                   ' Consider increasing max_centers or choose' \
                   ' a larger minimum distance, dmin.'
             self._logger.warning(msg)
             warnings.warn(msg)
             # finished anyway, because we have no more space for clusters. Rest of trajectory has no effect
-            clustercenters = np.array(clustercenters)
             self.update_model_params(clustercenters=clustercenters,
                                      n_cluster=len(clustercenters))
             # pass amount of processed data
             used_data = used_frames / float(it.n_frames_total()) * 100.0
             raise NotConvergedWarning("Used data for centers: %.2f%%" % used_data)
 
-        clustercenters = np.array(clustercenters)
         self.update_model_params(clustercenters=clustercenters,
                                  n_clusters=len(clustercenters))
 
@@ -73,159 +73,386 @@ float minRMSD_distance(float *SKP_restrict a, float *SKP_restrict b, size_t n,
     return sqrt(msd);
 }
 
-int c_assign(float *chunk, float *centers, npy_int32 *dtraj, char* metric,
-             Py_ssize_t N_frames, Py_ssize_t N_centers, Py_ssize_t dim, int n_threads) {
-    int ret;
-    int debug;
-    Py_ssize_t i, j;
-    float d, mindist, trace_centers;
-    size_t argmin;
-    float *buffer_a, *buffer_b;
-    float *centers_precentered;
-    float *trace_centers_p;
-    float *dists;
-    // distance function pointer:
-    float (*distance)(float*, float*, size_t, float*, float*, float*);
-    float *SKP_restrict chunk_p;
+PyArrayObject *import_chunk(PyObject *obj, chunk_view *view)
+{
+    PyArrayObject *np_chunk;
+    int type_num;
+
+    if (PyArray_Check(obj)) {
+        np_chunk = (PyArrayObject*) obj;
+        type_num = PyArray_TYPE(np_chunk);
+        /* float32/float64 frames with contiguous coordinates are used as they are */
+        if (PyArray_NDIM(np_chunk) == 2 && (type_num == NPY_FLOAT32 || type_num == NPY_FLOAT64)
+                && PyArray_ISALIGNED(np_chunk) && PyArray_ISNOTSWAPPED(np_chunk)
+                && (PyArray_DIM(np_chunk, 1) <= 1 || PyArray_STRIDE(np_chunk, 1) == PyArray_ITEMSIZE(np_chunk))) {
+            Py_INCREF(np_chunk);
+        } else {
+            np_chunk = (PyArrayObject*) PyArray_FROM_OTF(obj, NPY_FLOAT32, NPY_ARRAY_IN_ARRAY | NPY_ARRAY_FORCECAST); /* ref:new */
+        }
+    } else {
+        np_chunk = (PyArrayObject*) PyArray_FROM_OTF(obj, NPY_FLOAT32, NPY_ARRAY_IN_ARRAY | NPY_ARRAY_FORCECAST); /* ref:new */
+    }
+    if (!np_chunk) return NULL;
+    if (PyArray_NDIM(np_chunk) != 2) {
+        PyErr_SetString(PyExc_ValueError, "Number of dimensions of \"chunk\" isn\'t 2.");
+        Py_DECREF(np_chunk);
+        return NULL;
+    }
+    view->data = PyArray_BYTES(np_chunk);
+    view->N_frames = PyArray_DIM(np_chunk, 0);
+    view->dim = PyArray_DIM(np_chunk, 1);
+    view->row_stride = PyArray_STRIDE(np_chunk, 0);
+    view->type_num = PyArray_TYPE(np_chunk);
+    return np_chunk;
+}
 
-    #ifdef USE_OPENMP
-    /* Create a parallel thread block. */
-    omp_set_num_threads(n_threads);
-    if(debug) printf("using openmp; n_threads=%i\n", n_threads);
-    assert(omp_get_num_threads() == n_threads);
-    #endif
+void float_chunk_view(float *chunk, Py_ssize_t N_frames, Py_ssize_t dim, chunk_view *view)
+{
+    view->data = (char*) chunk;
+    view->N_frames = N_frames;
+    view->dim = dim;
+    view->row_stride = dim * sizeof(float);
+    view->type_num = NPY_FLOAT32;
+}
 
-    /* Initialize variables */
-    buffer_a = NULL; buffer_b = NULL; trace_centers_p = NULL; centers_precentered = NULL;
-    chunk_p = NULL; dists = NULL;
-    ret = ASSIGN_SUCCESS;
-    debug=0;
+int chunk_is_float_contiguous(chunk_view *view)
+{
+    return view->type_num == NPY_FLOAT32 && (view->N_frames <= 1 || view->row_stride == view->dim * (Py_ssize_t) sizeof(float));
+}
 
-    /* init metric */
-    if(strcmp(metric, "euclidean")==0) {
-        distance = euclidean_distance;
-        dists = malloc(N_centers*sizeof(float));
-        if(!dists) {
-            ret = ASSIGN_ERR_NO_MEMORY;
+float *chunk_row(chunk_view *view, Py_ssize_t i, float *buffer)
+{
+    Py_ssize_t k;
+    double *row;
+    if (view->type_num == NPY_FLOAT32) return (float*) (view->data + i * view->row_stride);
+    row = (double*) (view->data + i * view->row_stride);
+    for (k = 0; k < view->dim; ++k) buffer[k] = (float) row[k];
+    return buffer;
+}
+
+void chunk_rows(chunk_view *view, Py_ssize_t first_row, Py_ssize_t n_rows, float *out)
+{
+    Py_ssize_t i;
+    float *row;
+    for (i = 0; i < n_rows; ++i) {
+        row = chunk_row(view, first_row + i, &out[i*view->dim]);
+        if (row != &out[i*view->dim]) memcpy(&out[i*view->dim], row, view->dim * sizeof(float));
+    }
+}
+
+/*
+ * BLAS sgemm (Fortran calling convention). The pointer is obtained lazily from
+ * scipy.linalg.cython_blas, so we do not need to link against a BLAS library
+ * ourselves. If this fails, a blocked fallback implementation is being used.
+ */
+typedef void (*sgemm_ptr)(char *transa, char *transb, int *m, int *n, int *k,
+                          float *alpha, float *a, int *lda, float *b, int *ldb,
+                          float *beta, float *c, int *ldc);
+static sgemm_ptr _sgemm = NULL;
+static int _sgemm_lookup_done = 0;
+
+/* has to be called while holding the GIL. */
+void init_blas(void)
+{
+    PyObject *module, *capi, *capsule;
+    if (_sgemm_lookup_done) return;
+    _sgemm_lookup_done = 1;
+
+    module = PyImport_ImportModule("scipy.linalg.cython_blas");
+    if (module) {
+        capi = PyObject_GetAttrString(module, "__pyx_capi__");
+        if (capi) {
+            capsule = PyDict_GetItemString(capi, "sgemm"); /* ref:borr. */
+            if (capsule && PyCapsule_CheckExact(capsule)) {
+                _sgemm = (sgemm_ptr) PyCapsule_GetPointer(capsule, PyCapsule_GetName(capsule));
+            }
+            Py_DECREF(capi);
         }
-    } else if(strcmp(metric, "minRMSD")==0) {
-        distance = minRMSD_distance;
-        centers_precentered = malloc(N_centers*dim*sizeof(float));
-        trace_centers_p = malloc(N_centers*sizeof(float));
-        dists = malloc(N_centers*sizeof(float));
-        if(!centers_precentered || !dists || !trace_centers_p) {
-            ret = ASSIGN_ERR_NO_MEMORY;
+        Py_DECREF(module);
+    }
+    /* missing BLAS is not an error, we fall back to our own kernel. */
+    PyErr_Clear();
+}
+
+/*
+ * computes the inner products out[i*N_centers + j] = <chunk[i], centers[j]>
+ * for a block of N_frames frames, either via sgemm or via a simple blocked loop.
+ */
+static void block_inner_products(float *chunk, float *centers, float *out,
+                                 Py_ssize_t N_frames, Py_ssize_t N_centers, Py_ssize_t dim,
+                                 sgemm_ptr sgemm)
+{
+    Py_ssize_t i, j, k, ii, jj, i_end, j_end;
+    float acc;
+    char trans_a = 'T', trans_b = 'N';
+    float alpha = 1.0f, beta = 0.0f;
+    int m, n, kk, lda, ldb, ldc;
+
+    if (sgemm) {
+        /* in column major order: out^T (K x N) = centers (K x dim) * chunk^T (dim x N) */
+        m = (int) N_centers; n = (int) N_frames; kk = (int) dim;
+        lda = kk; ldb = kk; ldc = m;
+        sgemm(&trans_a, &trans_b, &m, &n, &kk, &alpha, centers, &lda, chunk, &ldb, &beta, out, &ldc);
+        return;
+    }
+
+    /* fallback: a tile of centers stays in cache while the frames are streamed past it tile by tile */
+    #pragma omp parallel private(i, j, k, ii, jj, i_end, j_end, acc)
+    for (jj = 0; jj < N_centers; jj += ASSIGN_CENTERS_TILE) {
+        j_end = jj + ASSIGN_CENTERS_TILE < N_centers ? jj + ASSIGN_CENTERS_TILE : N_centers;
+        #pragma omp for
+        for (ii = 0; ii < N_frames; ii += ASSIGN_FRAMES_TILE) {
+            i_end = ii + ASSIGN_FRAMES_TILE < N_frames ? ii + ASSIGN_FRAMES_TILE : N_frames;
+            for (i = ii; i < i_end; ++i) {
+                for (j = jj; j < j_end; ++j) {
+                    acc = 0.0f;
+                    for (k = 0; k < dim; ++k) {
+                        acc += chunk[i*dim + k] * centers[j*dim + k];
+                    }
+                    out[i*N_centers + j] = acc;
+                }
+            }
         }
+    }
+}
 
-        if (ret == ASSIGN_SUCCESS) {
-            memcpy(centers_precentered, centers, N_centers*dim*sizeof(float));
+/*
+ * Euclidean assignment of a chunk of frames via the expansion
+ *   ||x - c||^2 = ||x||^2 - 2 <x, c> + ||c||^2,
+ * where the inner products of a whole block of frames are computed by one matrix product.
+ *
+ * The expansion is less accurate than the direct evaluation performed by euclidean_distance.
+ * To stay bit-compatible with the direct evaluation (including the tie-breaking, which selects the
+ * smallest center index among equal distances), we use the expansion only to rule out centers:
+ * every center whose approximate squared distance is within the rounding error bound of the
+ * minimum is evaluated again with euclidean_distance.
+ */
+static int c_assign_euclidean(chunk_view *view, float *centers, npy_int32 *dtraj,
+                              Py_ssize_t N_centers, sgemm_ptr sgemm)
+{
+    Py_ssize_t i, j, k, block_start, block_size, n_block, N_frames, dim;
+    float *inner, *sq_norm_centers, *frames, *block, *x;
+    float *inner_i, xx, approx, err, threshold, d, mindist;
+    double acc;
+    npy_int32 argmin;
+    /* relative error bound of the expansion in single precision, with a safety factor of two */
+    float rel_err;
+
+    N_frames = view->N_frames;
+    dim = view->dim;
+    rel_err = 2.0f * (dim + 4) * FLT_EPSILON;
+    if (N_frames == 0) return ASSIGN_SUCCESS;
+
+    block_size = ASSIGN_BLOCK_ELEMENTS / N_centers;
+    if (block_size < 1) block_size = 1;
+    if (block_size > N_frames) block_size = N_frames;
+
+    inner = malloc(block_size * N_centers * sizeof(float));
+    sq_norm_centers = malloc(N_centers * sizeof(float));
+    /* frames of other dtypes or layouts are converted block by block */
+    frames = chunk_is_float_contiguous(view) ? NULL : malloc(block_size * dim * sizeof(float));
+    if (!inner || !sq_norm_centers || (!frames && !chunk_is_float_contiguous(view))) {
+        free(inner); free(sq_norm_centers); free(frames);
+        return ASSIGN_ERR_NO_MEMORY;
+    }
+
+    #pragma omp parallel for private(k, acc)
+    for (j = 0; j < N_centers; ++j) {
+        acc = 0.0;
+        for (k = 0; k < dim; ++k) acc += (double) centers[j*dim + k] * centers[j*dim + k];
+        sq_norm_centers[j] = (float) acc;
+    }
+
+    for (block_start = 0; block_start < N_frames; block_start += block_size) {
+        n_block = N_frames - block_start < block_size ? N_frames - block_start : block_size;
+
+        if (frames) {
+            #pragma omp parallel for
+            for (i = 0; i < n_block; ++i) chunk_rows(view, block_start + i, 1, &frames[i*dim]);
+            block = frames;
+        } else {
+            block = (float*) (view->data + block_start * view->row_stride);
+        }
 
-            /* Parallelize centering of cluster generators */
-            /* Note that this is already OpenMP-enabled */
+        block_inner_products(block, centers, inner, n_block, N_centers, dim, sgemm);
+
+        #pragma omp parallel for private(j, k, acc, inner_i, x, xx, approx, err, threshold, d, mindist, argmin)
+        for (i = 0; i < n_block; ++i) {
+            x = &block[i*dim];
+            acc = 0.0;
+            for (k = 0; k < dim; ++k) acc += (double) x[k] * x[k];
+            xx = (float) acc;
+            inner_i = &inner[i*N_centers];
+
+            /* upper bound for the smallest squared distance */
+            threshold = FLT_MAX;
             for (j = 0; j < N_centers; ++j) {
-                inplace_center_and_trace_atom_major(&centers_precentered[j*dim],
-                                                    &trace_centers_p[j], 1, dim/3);
+                approx = xx - 2.0f * inner_i[j] + sq_norm_centers[j];
+                err = rel_err * (xx + sq_norm_centers[j]);
+                if (approx + err < threshold) threshold = approx + err;
             }
-            centers = centers_precentered;
+
+            /* exact evaluation of all remaining candidates, in the order of the brute force search */
+            mindist = FLT_MAX; argmin = -1;
+            if (threshold < FLT_MAX) {
+                for (j = 0; j < N_centers; ++j) {
+                    approx = xx - 2.0f * inner_i[j] + sq_norm_centers[j];
+                    err = rel_err * (xx + sq_norm_centers[j]);
+                    if (approx - err <= threshold) {
+                        d = euclidean_distance(&centers[j*dim], x, dim, NULL, NULL, NULL);
+                        if (d < mindist) { mindist = d; argmin = (npy_int32) j; }
+                    }
+                }
             }
-    } else {
-        ret = ASSIGN_ERR_INVALID_METRIC;
+            /* overflow or non-finite values: use plain brute force for this frame */
+            if (argmin < 0) {
+                for (j = 0; j < N_centers; ++j) {
+                    d = euclidean_distance(&centers[j*dim], x, dim, NULL, NULL, NULL);
+                    if (d < mindist) { mindist = d; argmin = (npy_int32) j; }
+                }
+            }
+            dtraj[block_start + i] = argmin;
+        }
+    }
+
+    free(inner);
+    free(sq_norm_centers);
+    free(frames);
+    return ASSIGN_SUCCESS;
+}
+
+void c_precenter(float *centers, float *centers_precentered, float *traces, Py_ssize_t N_centers, Py_ssize_t dim)
+{
+    Py_ssize_t j;
+    memcpy(centers_precentered, centers, N_centers*dim*sizeof(float));
+    for (j = 0; j < N_centers; ++j) {
+        inplace_center_and_trace_atom_major(&centers_precentered[j*dim], &traces[j], 1, dim/3);
     }
+}
+
+int c_assign_precentered(chunk_view *chunk, float *centers_precentered, float *traces, npy_int32 *dtraj,
+                         Py_ssize_t N_centers, int n_threads)
+{
+    int ret;
+    Py_ssize_t i, j, N_frames, dim;
+    float d, mindist, trace_frame;
+    npy_int32 argmin;
+    float *frame;
+
+    #ifdef USE_OPENMP
+    omp_set_num_threads(n_threads);
+    #endif
+    ret = ASSIGN_SUCCESS;
+    N_frames = chunk->N_frames;
+    dim = chunk->dim;
 
-    #pragma omp parallel private(buffer_a, buffer_b, i, j, chunk_p, mindist, argmin)
+    /* every thread assigns whole frames, so threads do not need to synchronize per frame */
+    #pragma omp parallel private(frame, i, j, d, mindist, argmin, trace_frame)
     {
-        /* Allocate thread storage */
-        buffer_a = malloc(dim*sizeof(float));
-        buffer_b = malloc(dim*sizeof(float));
-        #pragma omp critical
-        if(!buffer_a || !buffer_b) {
-          ret = ASSIGN_ERR_NO_MEMORY;
+        frame = malloc(dim*sizeof(float));
+        if(!frame) {
+            #pragma omp critical
+            ret = ASSIGN_ERR_NO_MEMORY;
         }
-        #pragma omp barrier
-        #pragma omp flush(ret)
 
-        /* Only proceed if no error occurred. */
-        if (ret == ASSIGN_SUCCESS) {
+        #pragma omp for
+        for(i = 0; i < N_frames; ++i) {
+            if(!frame) continue;
+            /* center the frame once and compare it with all (already centered) centers */
+            chunk_rows(chunk, i, 1, frame);
+            inplace_center_and_trace_atom_major(frame, &trace_frame, 1, dim/3);
+            mindist = FLT_MAX; argmin = -1;
+            for(j = 0; j < N_centers; ++j) {
+                d = sqrt(msd_atom_major(dim/3, dim/3, &centers_precentered[j*dim], frame,
+                                        traces[j], trace_frame, 0, NULL));
+                if (d < mindist) { mindist = d; argmin = (npy_int32) j; }
+            }
+            dtraj[i] = argmin;
+        }
 
-            /* Assign each frame */
-            for(i = 0; i < N_frames; ++i) {
-                chunk_p = &chunk[i*dim];
+        free(frame);
+    }
+    return ret;
+}
 
-                /* Parallelize distance calculations to cluster centers to avoid cache misses */
-                #pragma omp for
-                for(j = 0; j < N_centers; ++j) {
-                    dists[j] = distance(&centers[j*dim], chunk_p, dim, buffer_a, buffer_b, &trace_centers_p[j]);
-                }
-                #pragma omp flush(dists)
-
-                /* Only one thread can make actual assignment */
-                #pragma omp single
-                {
-                    mindist = FLT_MAX; argmin = -1;
-                    for (j=0; j < N_centers; ++j) {
-                        if (dists[j] < mindist) { mindist = dists[j]; argmin = j; }
-                    }
-                    dtraj[i] = argmin;
-                }
+int c_assign(float *chunk, float *centers, npy_int32 *dtraj, char* metric,
+             Py_ssize_t N_frames, Py_ssize_t N_centers, Py_ssize_t dim, int n_threads) {
+    chunk_view view;
+    float_chunk_view(chunk, N_frames, dim, &view);
+    return c_assign_view(&view, centers, dtraj, metric, N_centers, n_threads);
+}
 
-            /* Have all threads synchronize in progress through cluster assignments */
-            #pragma omp barrier
-            }
+int c_assign_view(chunk_view *chunk, float *centers, npy_int32 *dtraj, char* metric,
+                  Py_ssize_t N_centers, int n_threads) {
+    int ret;
+    float *centers_precentered;
+    float *trace_centers_p;
+    Py_ssize_t dim;
 
-            /* Clean up thread storage*/
-            free(buffer_a);
-            free(buffer_b);
-        }
+    #ifdef USE_OPENMP
+    omp_set_num_threads(n_threads);
+    #endif
+
+    if(strcmp(metric, "euclidean")==0) {
+        return c_assign_euclidean(chunk, centers, dtraj, N_centers, _sgemm);
+    } else if(strcmp(metric, "minRMSD")!=0) {
+        return ASSIGN_ERR_INVALID_METRIC;
+    }
+
+    /* minRMSD: pre-center cluster centers */
+    dim = chunk->dim;
+    centers_precentered = malloc(N_centers*dim*sizeof(float));
+    trace_centers_p = malloc(N_centers*sizeof(float));
+    if(!centers_precentered || !trace_centers_p) {
+        ret = ASSIGN_ERR_NO_MEMORY;
+    } else {
+        c_precenter(centers, centers_precentered, trace_centers_p, N_centers, dim);
+        ret = c_assign_precentered(chunk, centers_precentered, trace_centers_p, dtraj, N_centers, n_threads);
     }
 
-    /* Clean up global storage */
-    if (dists) free(dists);
-    if (centers_precentered) free(centers_precentered);
-    if (trace_centers_p) free(trace_centers_p);
+    free(centers_precentered);
+    free(trace_centers_p);
     return ret;
 }
 
 PyObject *assign(PyObject *self, PyObject *args) {
 
-    PyObject *py_centers, *py_res;
-    PyArrayObject *np_chunk, *np_centers, *np_dtraj;
+    PyObject *py_chunk, *py_centers, *py_traces, *py_res;
+    PyArrayObject *np_chunk, *np_centers, *np_dtraj, *np_traces;
     Py_ssize_t N_centers, N_frames, dim;
-    float *chunk;
+    chunk_view chunk;
     float *centers;
     npy_int32 *dtraj;
     char *metric;
-    int n_threads;
+    int n_threads, err;
 
-    py_centers = NULL; py_res = NULL;
-    np_chunk = NULL; np_dtraj = NULL;
-    centers = NULL; metric=""; chunk = NULL; dtraj = NULL; n_threads = -1;
+    py_centers = NULL; py_traces = Py_None; py_res = NULL;
+    np_chunk = NULL; np_centers = NULL; np_dtraj = NULL; np_traces = NULL;
+    centers = NULL; metric=""; dtraj = NULL; n_threads = -1;
 
-    if (!PyArg_ParseTuple(args, "O!OO!si", &PyArray_Type, &np_chunk, &py_centers, &PyArray_Type, &np_dtraj, &metric, &n_threads)) goto error; /* ref:borr. */
+    if (!PyArg_ParseTuple(args, "OOO!si|O", &py_chunk, &py_centers, &PyArray_Type, &np_dtraj, &metric, &n_threads, &py_traces)) goto error; /* ref:borr. */
 
     /* import chunk */
-    if(PyArray_TYPE(np_chunk)!=NPY_FLOAT32) { PyErr_SetString(PyExc_ValueError, "dtype of \"chunk\" isn\'t float (32)."); goto error; };
-    if(!PyArray_ISCARRAY_RO(np_chunk) ) { PyErr_SetString(PyExc_ValueError, "\"chunk\" isn\'t C-style contiguous or isn\'t behaved."); goto error; };
-    if(PyArray_NDIM(np_chunk)!=2) { PyErr_SetString(PyExc_ValueError, "Number of dimensions of \"chunk\" isn\'t 2."); goto error;  };
-    N_frames = np_chunk->dimensions[0];
-    dim = np_chunk->dimensions[1];
+    if(!(np_chunk = import_chunk(py_chunk, &chunk))) goto error; /* ref:new */
+    N_frames = chunk.N_frames;
+    dim = chunk.dim;
     if(dim==0) {
         PyErr_SetString(PyExc_ValueError, "chunk dimension must be larger than zero.");
         goto error;
     }
-    chunk = PyArray_DATA(np_chunk);
 
     /* import dtraj */
     if(PyArray_TYPE(np_dtraj)!=NPY_INT32) { PyErr_SetString(PyExc_ValueError, "dtype of \"dtraj\" isn\'t int (32)."); goto error; };
     if(!PyArray_ISBEHAVED_RO(np_dtraj) ) { PyErr_SetString(PyExc_ValueError, "\"dtraj\" isn\'t behaved."); goto error; };
     if(PyArray_NDIM(np_dtraj)!=1) { PyErr_SetString(PyExc_ValueError, "Number of dimensions of \"dtraj\" isn\'t 1."); goto error; };
-    if(np_chunk->dimensions[0]!=N_frames) {
+    if(PyArray_DIM(np_dtraj, 0)!=N_frames) {
         PyErr_SetString(PyExc_ValueError, "Size of \"dtraj\" differs from number of frames in \"chunk\".");
         goto error;
     }
     dtraj = (npy_int32*)PyArray_DATA(np_dtraj);
 
     /* import list of cluster centers */
-    np_centers = (PyArrayObject*)PyArray_ContiguousFromAny(py_centers, NPY_FLOAT32, 2, 2);
+    np_centers = (PyArrayObject*)PyArray_ContiguousFromAny(py_centers, NPY_FLOAT32, 2, 2); /* ref:new */
     if(!np_centers) {
         PyErr_SetString(PyExc_ValueError, "Could not convert \"centers\" to two-dimensional C-contiguous behaved ndarray of float (32).");
         goto error;
@@ -241,8 +468,30 @@ PyObject *assign(PyObject *self, PyObject *args) {
     }
     centers = (float*)PyArray_DATA(np_centers);
 
-    /* do the assignment */
-    switch(c_assign(chunk, centers, dtraj, metric, N_frames, N_centers, dim, n_threads)) {
+    /* import traces of pre-centered cluster centers */
+    if(py_traces != Py_None) {
+        if(strcmp(metric, "minRMSD")!=0) {
+            PyErr_SetString(PyExc_ValueError, "traces can only be used with the minRMSD metric.");
+            goto error;
+        }
+        np_traces = (PyArrayObject*)PyArray_ContiguousFromAny(py_traces, NPY_FLOAT32, 1, 1); /* ref:new */
+        if(!np_traces) goto error;
+        if(PyArray_DIM(np_traces, 0)!=N_centers) {
+            PyErr_SetString(PyExc_ValueError, "Number of traces differs from number of cluster centers.");
+            goto error;
+        }
+    }
+
+    /* do the assignment, other python threads can run meanwhile */
+    init_blas();
+    Py_BEGIN_ALLOW_THREADS
+    if(np_traces) {
+        err = c_assign_precentered(&chunk, centers, (float*)PyArray_DATA(np_traces), dtraj, N_centers, n_threads);
+    } else {
+        err = c_assign_view(&chunk, centers, dtraj, metric, N_centers, n_threads);
+    }
+    Py_END_ALLOW_THREADS
+    switch(err) {
         case ASSIGN_ERR_INVALID_METRIC:
             PyErr_SetString(PyExc_ValueError, "metric must be one of \"euclidean\" or \"minRMSD\".");
             goto error;
@@ -254,5 +503,40 @@ PyObject *assign(PyObject *self, PyObject *args) {
     py_res = Py_BuildValue(""); /* =None */
     /* fall through */
 error:
+    Py_XDECREF(np_chunk);
+    Py_XDECREF(np_centers);
+    Py_XDECREF(np_traces);
+    return py_res;
+}
+
+PyObject *precenter(PyObject *self, PyObject *args) {
+
+    PyObject *py_centers, *py_res;
+    PyArrayObject *np_centers, *np_precentered, *np_traces;
+    npy_intp dims[2];
+
+    py_res = NULL; np_centers = NULL; np_precentered = NULL; np_traces = NULL;
+
+    if (!PyArg_ParseTuple(args, "O", &py_centers)) goto error; /* ref:borr. */
+
+    np_centers = (PyArrayObject*)PyArray_ContiguousFromAny(py_centers, NPY_FLOAT32, 2, 2); /* ref:new */
+    if(!np_centers) goto error;
+    dims[0] = PyArray_DIM(np_centers, 0);
+    dims[1] = PyArray_DIM(np_centers, 1);
+    np_precentered = (PyArrayObject*)PyArray_SimpleNew(2, dims, NPY_FLOAT32); /* ref:new */
+    np_traces = (PyArrayObject*)PyArray_SimpleNew(1, dims, NPY_FLOAT32); /* ref:new */
+    if(!np_precentered || !np_traces) goto error;
+
+    Py_BEGIN_ALLOW_THREADS
+    c_precenter(PyArray_DATA(np_centers), PyArray_DATA(np_precentered), PyArray_DATA(np_traces), dims[0], dims[1]);
+    Py_END_ALLOW_THREADS
+
+    py_res = Py_BuildValue("NN", np_precentered, np_traces); /* steals references */
+    np_precentered = NULL; np_traces = NULL;
+    /* fall through */
+error:
+    Py_XDECREF(np_centers);
+    Py_XDECREF(np_precentered);
+    Py_XDECREF(np_traces);
     return py_res;
 }
@@ -46,187 +46,583 @@ static PyObject *c_set_callback(PyObject *dummy, PyObject *args) {
     return result;
 }
 
+/*
+ * Full search for the closest and the second closest center of one frame.
+ * Ties are resolved to the smallest center index, like in c_assign.
+ */
+static void closest_two_centers(float *frame, float *centers, Py_ssize_t N_centers, Py_ssize_t dim,
+                                npy_int32 *closest, float *dist_closest, float *dist_second)
+{
+    Py_ssize_t j;
+    float d, d1, d2;
+    npy_int32 argmin;
+
+    d1 = FLT_MAX; d2 = FLT_MAX; argmin = -1;
+    for (j = 0; j < N_centers; ++j) {
+        d = euclidean_distance(&centers[j*dim], frame, dim, NULL, NULL, NULL);
+        if (d < d1) {
+            d2 = d1;
+            d1 = d; argmin = (npy_int32) j;
+        } else if (d < d2) {
+            d2 = d;
+        }
+    }
+    *closest = argmin; *dist_closest = d1; *dist_second = d2;
+}
+
+/*
+ * Assignment step with Hamerly's bounds [Hamerly 2010, Making k-means even faster].
+ * For every frame we keep an upper bound of the distance to its assigned center and a
+ * lower bound of the distance to all other centers. If the upper bound is smaller than
+ * both the lower bound and half the distance of the assigned center to its closest
+ * neighbouring center, the assignment can not change and the frame is skipped.
+ */
+static int hamerly_assign(float *chunk, float *centers, Py_ssize_t N_frames, Py_ssize_t N_centers,
+                          Py_ssize_t dim, npy_int32 *assignments, float *upper, float *lower, int n_threads)
+{
+    Py_ssize_t i, j, l;
+    float *half_min_center_dist;
+    float d, m;
+
+    #ifdef USE_OPENMP
+    omp_set_num_threads(n_threads);
+    #endif
+    half_min_center_dist = malloc(N_centers * sizeof(float));
+    if (!half_min_center_dist) return ASSIGN_ERR_NO_MEMORY;
+
+    #pragma omp parallel for private(l, d)
+    for (j = 0; j < N_centers; ++j) {
+        half_min_center_dist[j] = FLT_MAX;
+        for (l = 0; l < N_centers; ++l) {
+            if (l == j) continue;
+            d = 0.5f * euclidean_distance(&centers[j*dim], &centers[l*dim], dim, NULL, NULL, NULL);
+            if (d < half_min_center_dist[j]) half_min_center_dist[j] = d;
+        }
+    }
+
+    #pragma omp parallel for private(m)
+    for (i = 0; i < N_frames; ++i) {
+        if (assignments[i] >= 0 && assignments[i] < N_centers) {
+            m = half_min_center_dist[assignments[i]];
+            if (lower[i] > m) m = lower[i];
+            m *= (1.0f - KMEANS_BOUNDS_TOLERANCE);
+            if (upper[i] < m) continue;
+            /* tighten the upper bound and test again */
+            upper[i] = euclidean_distance(&centers[assignments[i]*dim], &chunk[i*dim], dim, NULL, NULL, NULL);
+            if (upper[i] < m) continue;
+        }
+        closest_two_centers(&chunk[i*dim], centers, N_centers, dim, &assignments[i], &upper[i], &lower[i]);
+    }
+
+    free(half_min_center_dist);
+    return ASSIGN_SUCCESS;
+}
+
+/* moves the bounds according to the displacement of the centers between two iterations */
+static void hamerly_update_bounds(float *old_centers, float *new_centers, Py_ssize_t N_frames,
+                                  Py_ssize_t N_centers, Py_ssize_t dim,
+                                  npy_int32 *assignments, float *upper, float *lower, float *shift)
+{
+    Py_ssize_t i, j;
+    float max_shift;
+
+    max_shift = 0.0f;
+    for (j = 0; j < N_centers; ++j) {
+        shift[j] = euclidean_distance(&old_centers[j*dim], &new_centers[j*dim], dim, NULL, NULL, NULL);
+        if (shift[j] > max_shift) max_shift = shift[j];
+    }
+
+    #pragma omp parallel for
+    for (i = 0; i < N_frames; ++i) {
+        if (assignments[i] < 0) continue;
+        upper[i] += shift[assignments[i]];
+        lower[i] -= max_shift;
+        if (lower[i] < 0.0f) lower[i] = 0.0f;
+    }
+}
+
+/*
+ * Adds all frames to the sums (N_centers x dim) and counts of their assigned centers and, if cost is
+ * not NULL, the squared distances of the frames to these centers to cost. Every thread accumulates into its own buffers,
+ * which are reduced in a fixed order, so the result does not depend on the number of threads.
+ */
+static int accumulate_clusters(chunk_view *chunk, float *centers, npy_int32 *assignments, Py_ssize_t N_centers,
+                               float (*distance)(float*, float*, size_t, float*, float*, float*),
+                               int n_threads, double *sums, npy_int64 *counts, double *cost)
+{
+    Py_ssize_t i, j, k, N_frames, dim;
+    double *thread_sums, *acc_sums;
+    npy_int64 *thread_counts, *acc_counts;
+    float *buffer_a, *buffer_b, *buffer_frame, *frame;
+    double d, thread_cost;
+    int t, n_acc, err;
+
+    #ifdef USE_OPENMP
+    omp_set_num_threads(n_threads);
+    n_acc = n_threads;
+    #else
+    n_acc = 1;
+    #endif
+    err = ASSIGN_SUCCESS;
+    thread_cost = 0.0;
+    N_frames = chunk->N_frames;
+    dim = chunk->dim;
+
+    acc_sums = calloc(n_acc * N_centers * dim, sizeof(double));
+    acc_counts = calloc(n_acc * N_centers, sizeof(npy_int64));
+    if (!acc_sums || !acc_counts) {
+        free(acc_sums);
+        free(acc_counts);
+        return ASSIGN_ERR_NO_MEMORY;
+    }
+
+    #pragma omp parallel private(t, thread_sums, thread_counts, buffer_a, buffer_b, buffer_frame, frame, j, k, d) reduction(+:thread_cost)
+    {
+        #ifdef USE_OPENMP
+        t = omp_get_thread_num();
+        #else
+        t = 0;
+        #endif
+        thread_sums = &acc_sums[t * N_centers * dim];
+        thread_counts = &acc_counts[t * N_centers];
+        buffer_a = malloc(dim * sizeof(float));
+        buffer_b = malloc(dim * sizeof(float));
+        buffer_frame = malloc(dim * sizeof(float));
+        if (!buffer_a || !buffer_b || !buffer_frame) {
+            #pragma omp critical
+            err = ASSIGN_ERR_NO_MEMORY;
+        }
+
+        #pragma omp for schedule(static)
+        for (i = 0; i < N_frames; ++i) {
+            j = assignments[i];
+            if (j < 0 || !buffer_a || !buffer_b || !buffer_frame) continue;
+            frame = chunk_row(chunk, i, buffer_frame);
+            thread_counts[j]++;
+            for (k = 0; k < dim; ++k) {
+                thread_sums[j*dim + k] += frame[k];
+            }
+            if (cost) {
+                d = distance(&centers[j*dim], frame, dim, buffer_a, buffer_b, NULL);
+                thread_cost += d * d;
+            }
+        }
+        free(buffer_a);
+        free(buffer_b);
+        free(buffer_frame);
+    }
+
+    if (err == ASSIGN_SUCCESS) {
+        #pragma omp parallel for private(t, k)
+        for (j = 0; j < N_centers; ++j) {
+            for (t = 0; t < n_acc; ++t) {
+                counts[j] += acc_counts[t*N_centers + j];
+                for (k = 0; k < dim; ++k) sums[j*dim + k] += acc_sums[(t*N_centers + j)*dim + k];
+            }
+        }
+        if (cost) *cost += thread_cost;
+    }
+
+    free(acc_sums);
+    free(acc_counts);
+    return err;
+}
+
+/* adds the squared distances of all frames to their assigned centers to cost */
+static int assignment_cost(chunk_view *chunk, float *centers, npy_int32 *assignments,
+                           float (*distance)(float*, float*, size_t, float*, float*, float*),
+                           int n_threads, double *cost)
+{
+    Py_ssize_t i, N_frames, dim;
+    float *buffer_a, *buffer_b, *buffer_frame, *frame;
+    double d, thread_cost;
+    int err;
+
+    #ifdef USE_OPENMP
+    omp_set_num_threads(n_threads);
+    #endif
+    err = ASSIGN_SUCCESS;
+    thread_cost = 0.0;
+    N_frames = chunk->N_frames;
+    dim = chunk->dim;
+
+    #pragma omp parallel private(buffer_a, buffer_b, buffer_frame, frame, d) reduction(+:thread_cost)
+    {
+        buffer_a = malloc(dim * sizeof(float));
+        buffer_b = malloc(dim * sizeof(float));
+        buffer_frame = malloc(dim * sizeof(float));
+        if (!buffer_a || !buffer_b || !buffer_frame) {
+            #pragma omp critical
+            err = ASSIGN_ERR_NO_MEMORY;
+        }
+
+        #pragma omp for schedule(static)
+        for (i = 0; i < N_frames; ++i) {
+            if (assignments[i] < 0 || !buffer_a || !buffer_b || !buffer_frame) continue;
+            frame = chunk_row(chunk, i, buffer_frame);
+            d = distance(&centers[assignments[i]*dim], frame, dim, buffer_a, buffer_b, NULL);
+            thread_cost += d * d;
+        }
+        free(buffer_a);
+        free(buffer_b);
+        free(buffer_frame);
+    }
+
+    if (err == ASSIGN_SUCCESS) *cost += thread_cost;
+    return err;
+}
+
 static PyObject *cluster(PyObject *self, PyObject *args) {
-    int debug;
-    PyObject *py_centers, *py_item, *py_res;
-    PyArrayObject *np_chunk, *np_item;
-    Py_ssize_t N_centers, N_frames, dim;
-    float *chunk;
-    float **centers;
+    PyObject *py_centers, *py_bounds, *return_new_centers, *py_res;
+    PyArrayObject *np_chunk, *np_centers, *np_assignments, *np_upper, *np_lower;
+    Py_ssize_t N_centers, N_frames, dim, j, k;
+    float *chunk, *centers, *new_centers, *upper, *lower, *shift;
+    npy_int32 *assignments;
+    double *sums;
+    npy_int64 *counts;
+    double cost;
     char *metric;
-    float mindist;
-    float d;
-    float *buffer_a, *buffer_b;
-    int l;
-    int *centers_counter;
-    void *arr_data;
-    float *new_centers;
-    int i, j;
-    int closest_center_index;
+    int n_threads, err;
     npy_intp dims[2];
+    chunk_view view;
     float (*distance)(float*, float*, size_t, float*, float*, float*);
-    PyObject* return_new_centers;
-    debug = 0;
-    closest_center_index = 0;
-    if(debug) printf("KMEANS: \n----------- cluster called ----------\n");
-    if(debug) printf("KMEANS: declaring variables...");
-    if(debug) printf("done.\n");
-
-    if(debug) printf("KMEANS: initializing some of them...");
-    py_centers = NULL; py_item = NULL; py_res = NULL;
-    np_chunk = NULL; np_item = NULL;
-    centers = NULL; metric=""; chunk = NULL;
-    centers_counter = NULL; new_centers = NULL;
-    buffer_a = NULL; buffer_b = NULL;
-    return_new_centers = Py_BuildValue("");
-    if(debug) printf("done\n");
 
-    if(debug) printf("KMEANS: attempting to parse args...");
-    if (!PyArg_ParseTuple(args, "O!O!s", &PyArray_Type, &np_chunk, &PyList_Type, &py_centers, &metric)) {
-        if(debug) printf("FAILED\n");
+    py_centers = NULL; py_bounds = Py_None; return_new_centers = NULL; py_res = NULL;
+    np_chunk = NULL; np_centers = NULL; np_assignments = NULL; np_upper = NULL; np_lower = NULL;
+    new_centers = NULL; upper = NULL; lower = NULL; shift = NULL; assignments = NULL;
+    sums = NULL; counts = NULL; metric = ""; n_threads = 1; cost = 0.0; err = ASSIGN_SUCCESS;
+
+    if (!PyArg_ParseTuple(args, "O!Os|iO", &PyArray_Type, &np_chunk, &py_centers, &metric, &n_threads, &py_bounds)) {
         goto error;
     }
-    if(debug) printf("done\n");
+    if (n_threads < 1) n_threads = 1;
 
     /* import chunk */
-    if(debug) printf("KMEANS: importing chunk...");
     if(PyArray_TYPE(np_chunk)!=NPY_FLOAT32) { PyErr_SetString(PyExc_ValueError, "dtype of \"chunk\" isn\'t float (32)."); goto error; };
     if(!PyArray_ISCARRAY_RO(np_chunk) ) { PyErr_SetString(PyExc_ValueError, "\"chunk\" isn\'t C-style contiguous or isn\'t behaved."); goto error; };
     if(PyArray_NDIM(np_chunk)!=2) { PyErr_SetString(PyExc_ValueError, "Number of dimensions of \"chunk\" isn\'t 2."); goto error;  };
-    N_frames = np_chunk->dimensions[0];
-    dim = np_chunk->dimensions[1];
+    N_frames = PyArray_DIM(np_chunk, 0);
+    dim = PyArray_DIM(np_chunk, 1);
     if(dim==0) {
         PyErr_SetString(PyExc_ValueError, "chunk dimension must be larger than zero.");
         goto error;
     }
     chunk = PyArray_DATA(np_chunk);
-    if(debug) printf("done with N_frames=%zd, dim=%zd\n", N_frames, dim);
 
-    if(debug) printf("KMEANS: creating metric function...");
     if(strcmp(metric,"euclidean")==0) {
         distance = euclidean_distance;
     } else if(strcmp(metric,"minRMSD")==0) {
         distance = minRMSD_distance;
-        buffer_a = malloc(dim*sizeof(float));
-        buffer_b = malloc(dim*sizeof(float));
-        if(!buffer_a || !buffer_b) { PyErr_NoMemory(); goto error; }
     } else {
         PyErr_SetString(PyExc_ValueError, "metric must be one of \"euclidean\" or \"minRMSD\".");
         goto error;
     }
-    if(debug) printf("done\n");
-
-    /* import list of cluster centers */
-    if(debug) printf("KMEANS: importing list of cluster centers...");
-    N_centers = PyList_Size(py_centers);
-    if(!(centers = malloc(N_centers*sizeof(float*)))) {
-        PyErr_NoMemory(); goto error;
-    }
-    for(i = 0; i < N_centers; ++i) {
-        l = 0;
-        if(debug) printf("%d", l++); /* 0 */
-        py_item = PyList_GetItem(py_centers,i); /* ref:borr. */
-        if(debug) printf("%d", l++); /* 1 */
-        if(!py_item) goto error;
-        if(debug) printf("%d", l++); /* 2 */
-        if(!PyArray_Check(py_item)) { PyErr_SetString(PyExc_ValueError, "Elements of centers must be numpy arrays."); goto error; }
-        if(debug) printf("%d", l++); /* 3 */
-        np_item = (PyArrayObject*)py_item;
-        if(debug) printf("%d", l++); /* 4 */
-        if(PyArray_TYPE(np_item)!=NPY_FLOAT32) { PyErr_SetString(PyExc_ValueError, "dtype of cluster center isn\'t float (32)."); goto error; };
-        if(debug) printf("%d", l++); /* 5 */
-        if(!PyArray_ISBEHAVED_RO(np_item) ) { PyErr_SetString(PyExc_ValueError, "cluster center isn\'t behaved."); goto error; };
-        if(debug) printf("%d", l++); /* 6 */
-        if(PyArray_NDIM(np_item)!=1) { PyErr_SetString(PyExc_ValueError, "Number of dimensions of cluster centers must be 1."); goto error;  };
-        if(debug) printf("%d", l++); /* 7 */
-        if(np_item->dimensions[0]!=dim) {
-          PyErr_SetString(PyExc_ValueError, "Dimension of cluster centers doesn\'t match dimension of frames.");
-          goto error;
+
+    /* import cluster centers (list of 1d arrays or 2d array) */
+    np_centers = (PyArrayObject*) PyArray_ContiguousFromAny(py_centers, NPY_FLOAT32, 2, 2);
+    if(!np_centers) {
+        PyErr_SetString(PyExc_ValueError, "Could not convert \"centers\" to two-dimensional C-contiguous behaved ndarray of float (32).");
+        goto error;
+    }
+    N_centers = PyArray_DIM(np_centers, 0);
+    if(N_centers == 0) {
+        PyErr_SetString(PyExc_ValueError, "centers must contain at least one element.");
+        goto error;
+    }
+    if(PyArray_DIM(np_centers, 1) != dim) {
+        PyErr_SetString(PyExc_ValueError, "Dimension of cluster centers doesn\'t match dimension of frames.");
+        goto error;
+    }
+    centers = PyArray_DATA(np_centers);
+
+    /* import bounds (assignments, upper, lower), which are being updated in place */
+    if (py_bounds != Py_None) {
+        if (strcmp(metric, "euclidean") != 0) {
+            PyErr_SetString(PyExc_ValueError, "bounds are only supported for the euclidean metric.");
+            goto error;
         }
-        if(debug) printf("%d", l++); /* 8 */
-        centers[i] = (float*)PyArray_DATA(np_item);
-        if(debug) printf("%d", l++); /* 9 */
-    }
-    if(debug) printf("done, k=%zd\n", N_centers);
-
-    /* initialize centers_counter and new_centers with zeros */
-    if(debug) printf("KMEANS: initializing calloc centers counter and new_centers stuff...");
-    centers_counter = (int*) calloc(N_centers, sizeof(int));
-    new_centers = (float*) calloc(N_centers * dim, sizeof(float));
-    if(!centers_counter || !new_centers) { PyErr_NoMemory(); goto error; }
-    if(debug) printf("done\n");
-
-    /* do the clustering */
-    if(debug) printf("KMEANS: performing the clustering...");
-    for (i = 0; i < N_frames; i++) {
-        mindist = FLT_MAX;
-        for(j = 0; j < N_centers; ++j) {
-            d = distance(&chunk[i*dim], centers[j], dim, buffer_a, buffer_b, NULL);
-            if(d<mindist) {
-                mindist = d;
-                closest_center_index = j;
-            }
+        if (!PyArg_ParseTuple(py_bounds, "O!O!O!", &PyArray_Type, &np_assignments,
+                              &PyArray_Type, &np_upper, &PyArray_Type, &np_lower)) {
+            goto error;
+        }
+        if (PyArray_TYPE(np_assignments) != NPY_INT32 || PyArray_TYPE(np_upper) != NPY_FLOAT32
+            || PyArray_TYPE(np_lower) != NPY_FLOAT32
+            || !PyArray_ISCARRAY(np_assignments) || !PyArray_ISCARRAY(np_upper) || !PyArray_ISCARRAY(np_lower)
+            || PyArray_NDIM(np_assignments) != 1 || PyArray_NDIM(np_upper) != 1 || PyArray_NDIM(np_lower) != 1
+            || PyArray_DIM(np_assignments, 0) != N_frames || PyArray_DIM(np_upper, 0) != N_frames
+            || PyArray_DIM(np_lower, 0) != N_frames) {
+            PyErr_SetString(PyExc_ValueError, "bounds have to be a tuple of writeable, contiguous arrays "
+                                              "(assignments (int32), upper (float32), lower (float32)) of length N_frames.");
+            goto error;
         }
-        (*(centers_counter + closest_center_index))++;
-	    for (j = 0; j < dim; j++) {
-	        new_centers[closest_center_index*dim+j] += chunk[i*dim+j];
-	    }
+        assignments = PyArray_DATA(np_assignments);
+        upper = PyArray_DATA(np_upper);
+        lower = PyArray_DATA(np_lower);
+    } else {
+        if(!(assignments = malloc(N_frames * sizeof(npy_int32)))) { PyErr_NoMemory(); goto error; }
     }
 
-    for (i = 0; i < N_centers; i++) {
-        if (*(centers_counter + i) == 0) {
-            for (j = 0; j < dim; j++) {
-                (*(new_centers + i * dim + j)) = centers[i][j];
-            }
-        } else {
-            for (j=0; j < dim; j++) {
-                (*(new_centers + i * dim + j)) /= (*(centers_counter + i));
+    sums = calloc(N_centers * dim, sizeof(double));
+    counts = calloc(N_centers, sizeof(npy_int64));
+    new_centers = malloc(N_centers * dim * sizeof(float));
+    if (!sums || !counts || !new_centers) { PyErr_NoMemory(); goto error; }
+
+    if (upper && !(shift = malloc(N_centers * sizeof(float)))) { PyErr_NoMemory(); goto error; }
+
+    init_blas();
+    Py_BEGIN_ALLOW_THREADS
+    /* 1. assignment step */
+    if (upper) {
+        err = hamerly_assign(chunk, centers, N_frames, N_centers, dim, assignments, upper, lower, n_threads);
+    } else {
+        err = c_assign(chunk, centers, assignments, metric, N_frames, N_centers, dim, n_threads);
+    }
+
+    /* 2. accumulate the frames of each cluster */
+    if (err == ASSIGN_SUCCESS) {
+        float_chunk_view(chunk, N_frames, dim, &view);
+        err = accumulate_clusters(&view, centers, assignments, N_centers, distance,
+                                  n_threads, sums, counts, NULL);
+    }
+
+    if (err == ASSIGN_SUCCESS) {
+        /* 3. compute the new centers, empty clusters keep their center */
+        for (j = 0; j < N_centers; ++j) {
+            for (k = 0; k < dim; ++k) {
+                new_centers[j*dim + k] = counts[j] > 0 ? (float) (sums[j*dim + k] / counts[j]) : centers[j*dim + k];
             }
         }
+        if (upper) {
+            hamerly_update_bounds(centers, new_centers, N_frames, N_centers, dim, assignments, upper, lower, shift);
+        }
+        /* 4. cost of the assignment with respect to the updated centers */
+        err = assignment_cost(&view, new_centers, assignments, distance, n_threads, &cost);
     }
-    if(debug) printf("done\n");
+    Py_END_ALLOW_THREADS
+    if (err == ASSIGN_ERR_NO_MEMORY) { PyErr_NoMemory(); goto error; }
 
-    if(debug) printf("KMEANS: creating return_new_centers...");
     dims[0] = N_centers; dims[1] = dim;
     return_new_centers = PyArray_SimpleNew(2, dims, NPY_FLOAT32);
-    if (return_new_centers == NULL){
-        PyErr_SetString(PyExc_MemoryError, "Error occurs when creating a new PyArray");
-        goto error;
-    }
-    arr_data = PyArray_DATA((PyArrayObject*)return_new_centers);
-    if(debug) printf("done\n");
-    /* Need to copy the data of the malloced buffer to the PyObject
-       since the malloced buffer will disappear after the C extension is called. */
-    if(debug) printf("KMEANS: attempting memcopy...");
-    memcpy(arr_data, new_centers, PyArray_ITEMSIZE((PyArrayObject*) return_new_centers) * N_centers * dim);
-    if(debug) printf("done\n");
-    if(debug) printf("KMEANS: increasing ref to return_new_centers object...");
-    Py_INCREF(return_new_centers);  /* The returned list should still exist after calling the C extension */
-    if(debug) printf("done\n");
+    if (!return_new_centers) goto error;
+    memcpy(PyArray_DATA((PyArrayObject*)return_new_centers), new_centers, N_centers * dim * sizeof(float));
+
+    py_res = Py_BuildValue("Nd", return_new_centers, cost); /* steals reference to return_new_centers */
     /* fall through */
 error:
-    free(centers_counter);
+    if (!upper) free(assignments);
+    Py_XDECREF(np_centers);
+    free(sums);
+    free(counts);
     free(new_centers);
-    free(centers);
-    free(buffer_a);
-    free(buffer_b);
-    return return_new_centers;
+    free(shift);
+    return py_res;
+}
+
+static PyObject *accumulate(PyObject *self, PyObject *args) {
+    PyObject *py_chunk, *py_prev_centers, *py_res;
+    PyArrayObject *np_chunk, *np_centers, *np_prev_centers, *np_sums, *np_counts;
+    Py_ssize_t N_centers, N_frames, dim;
+    chunk_view chunk;
+    npy_int32 *assignments;
+    double cost;
+    char *metric;
+    int n_threads, err;
+    float (*distance)(float*, float*, size_t, float*, float*, float*);
+
+    np_chunk = NULL; np_centers = NULL; np_prev_centers = NULL; np_sums = NULL; np_counts = NULL; py_res = NULL;
+    py_prev_centers = Py_None; assignments = NULL; metric = ""; n_threads = 1; cost = 0.0; err = ASSIGN_SUCCESS;
+
+    if (!PyArg_ParseTuple(args, "OO!siO!O!|O", &py_chunk, &PyArray_Type, &np_centers,
+                          &metric, &n_threads, &PyArray_Type, &np_sums, &PyArray_Type, &np_counts,
+                          &py_prev_centers)) {
+        return NULL;
+    }
+    if (n_threads < 1) n_threads = 1;
+
+    if(PyArray_TYPE(np_centers)!=NPY_FLOAT32 || !PyArray_ISCARRAY_RO(np_centers) || PyArray_NDIM(np_centers)!=2) {
+        PyErr_SetString(PyExc_ValueError, "\"centers\" has to be a C-contiguous two-dimensional ndarray of float (32).");
+        return NULL;
+    }
+    if(!(np_chunk = import_chunk(py_chunk, &chunk))) return NULL; /* ref:new */
+    N_frames = chunk.N_frames;
+    dim = chunk.dim;
+    N_centers = PyArray_DIM(np_centers, 0);
+    if(dim == 0 || N_centers == 0 || PyArray_DIM(np_centers, 1) != dim) {
+        PyErr_SetString(PyExc_ValueError, "Dimension of cluster centers doesn\'t match dimension of frames.");
+        goto error;
+    }
+    if(PyArray_TYPE(np_sums)!=NPY_FLOAT64 || !PyArray_ISCARRAY(np_sums) || PyArray_NDIM(np_sums)!=2
+       || PyArray_DIM(np_sums, 0) != N_centers || PyArray_DIM(np_sums, 1) != dim) {
+        PyErr_SetString(PyExc_ValueError, "\"sums\" has to be a writeable, C-contiguous (K,M) array of float (64).");
+        goto error;
+    }
+    if(PyArray_TYPE(np_counts)!=NPY_INT64 || !PyArray_ISCARRAY(np_counts) || PyArray_NDIM(np_counts)!=1
+       || PyArray_DIM(np_counts, 0) != N_centers) {
+        PyErr_SetString(PyExc_ValueError, "\"counts\" has to be a writeable, contiguous (K) array of int (64).");
+        goto error;
+    }
+    if (py_prev_centers != Py_None) {
+        if (!PyArray_Check(py_prev_centers)) {
+            PyErr_SetString(PyExc_ValueError, "\"prev_centers\" has to be None or an ndarray.");
+            goto error;
+        }
+        np_prev_centers = (PyArrayObject*) py_prev_centers;
+        if (PyArray_TYPE(np_prev_centers) != NPY_FLOAT32 || !PyArray_ISCARRAY_RO(np_prev_centers)
+            || PyArray_NDIM(np_prev_centers) != 2 || PyArray_DIM(np_prev_centers, 0) != N_centers
+            || PyArray_DIM(np_prev_centers, 1) != dim) {
+            PyErr_SetString(PyExc_ValueError, "\"prev_centers\" has to be a C-contiguous (K,M) ndarray of float (32).");
+            goto error;
+        }
+    }
+
+    if(strcmp(metric,"euclidean")==0) {
+        distance = euclidean_distance;
+    } else if(strcmp(metric,"minRMSD")==0) {
+        distance = minRMSD_distance;
+    } else {
+        PyErr_SetString(PyExc_ValueError, "metric must be one of \"euclidean\" or \"minRMSD\".");
+        goto error;
+    }
+
+    if (N_frames > 0) {
+        if(!(assignments = malloc(N_frames * sizeof(npy_int32)))) { PyErr_NoMemory(); goto error; }
+
+        init_blas();
+        Py_BEGIN_ALLOW_THREADS
+        if (np_prev_centers) {
+            /* cost of the assignment to the previous centers with respect to the given (updated) centers */
+            err = c_assign_view(&chunk, PyArray_DATA(np_prev_centers), assignments, metric, N_centers, n_threads);
+            if (err == ASSIGN_SUCCESS) {
+                err = assignment_cost(&chunk, PyArray_DATA(np_centers), assignments, distance, n_threads, &cost);
+            }
+        }
+        if (err == ASSIGN_SUCCESS) {
+            err = c_assign_view(&chunk, PyArray_DATA(np_centers), assignments, metric, N_centers, n_threads);
+        }
+        if (err == ASSIGN_SUCCESS) {
+            err = accumulate_clusters(&chunk, PyArray_DATA(np_centers), assignments, N_centers, distance, n_threads,
+                                      PyArray_DATA(np_sums), PyArray_DATA(np_counts),
+                                      np_prev_centers ? NULL : &cost);
+        }
+        Py_END_ALLOW_THREADS
+        free(assignments);
+        if (err == ASSIGN_ERR_NO_MEMORY) { PyErr_NoMemory(); goto error; }
+    }
+
+    py_res = Py_BuildValue("d", cost);
+error:
+    Py_XDECREF(np_chunk);
+    return py_res;
+}
+
+static PyObject *closest_centers(PyObject *self, PyObject *args) {
+    PyArrayObject *np_chunk, *np_centers;
+    PyObject *py_chunk, *py_res, *py_assignments;
+    Py_ssize_t N_centers, N_frames, dim, i;
+    npy_int32 *assignments;
+    chunk_view chunk;
+    float *centers, *res, *buffer_a, *buffer_b, *buffer_frame;
+    char *metric;
+    int n_threads, err;
+    npy_intp dims[1];
+    float (*distance)(float*, float*, size_t, float*, float*, float*);
+
+    np_chunk = NULL; np_centers = NULL; py_res = NULL; py_assignments = NULL; assignments = NULL;
+    metric = ""; n_threads = 1; err = ASSIGN_SUCCESS;
+
+    if (!PyArg_ParseTuple(args, "OO!s|i", &py_chunk, &PyArray_Type, &np_centers,
+                          &metric, &n_threads)) {
+        return NULL;
+    }
+    if (n_threads < 1) n_threads = 1;
+
+    if(PyArray_TYPE(np_centers)!=NPY_FLOAT32 || !PyArray_ISCARRAY_RO(np_centers) || PyArray_NDIM(np_centers)!=2) {
+        PyErr_SetString(PyExc_ValueError, "\"centers\" has to be a C-contiguous two-dimensional ndarray of float (32).");
+        return NULL;
+    }
+    if(strcmp(metric,"euclidean")==0) {
+        distance = euclidean_distance;
+    } else if(strcmp(metric,"minRMSD")==0) {
+        distance = minRMSD_distance;
+    } else {
+        PyErr_SetString(PyExc_ValueError, "metric must be one of \"euclidean\" or \"minRMSD\".");
+        return NULL;
+    }
+    if(!(np_chunk = import_chunk(py_chunk, &chunk))) return NULL; /* ref:new */
+    N_frames = chunk.N_frames;
+    dim = chunk.dim;
+    N_centers = PyArray_DIM(np_centers, 0);
+    if(dim == 0 || N_centers == 0 || PyArray_DIM(np_centers, 1) != dim) {
+        PyErr_SetString(PyExc_ValueError, "Dimension of cluster centers doesn\'t match dimension of frames.");
+        Py_DECREF(np_chunk);
+        return NULL;
+    }
+    centers = PyArray_DATA(np_centers);
+
+    dims[0] = N_frames;
+    py_res = PyArray_SimpleNew(1, dims, NPY_FLOAT32);
+    py_assignments = PyArray_SimpleNew(1, dims, NPY_INT32);
+    if (!py_res || !py_assignments) {
+        Py_XDECREF(py_res);
+        Py_XDECREF(py_assignments);
+        Py_DECREF(np_chunk);
+        return NULL;
+    }
+    res = PyArray_DATA((PyArrayObject*) py_res);
+    assignments = PyArray_DATA((PyArrayObject*) py_assignments);
+
+    if (N_frames > 0) {
+        init_blas();
+        Py_BEGIN_ALLOW_THREADS
+        err = c_assign_view(&chunk, centers, assignments, metric, N_centers, n_threads);
+
+        #pragma omp parallel private(buffer_a, buffer_b, buffer_frame)
+        {
+            buffer_a = malloc(dim * sizeof(float));
+            buffer_b = malloc(dim * sizeof(float));
+            buffer_frame = malloc(dim * sizeof(float));
+            if (!buffer_a || !buffer_b || !buffer_frame) {
+                #pragma omp critical
+                err = ASSIGN_ERR_NO_MEMORY;
+            }
+            #pragma omp for
+            for (i = 0; i < N_frames; ++i) {
+                if (err != ASSIGN_SUCCESS || !buffer_a || !buffer_b || !buffer_frame) continue;
+                /* frames which could not be assigned (NaN) are infinitely far away */
+                res[i] = assignments[i] < 0 ? FLT_MAX :
+                         distance(&centers[assignments[i]*dim], chunk_row(&chunk, i, buffer_frame), dim,
+                                  buffer_a, buffer_b, NULL);
+            }
+            free(buffer_a);
+            free(buffer_b);
+            free(buffer_frame);
+        }
+        Py_END_ALLOW_THREADS
+    }
+    Py_DECREF(np_chunk);
+    if (err != ASSIGN_SUCCESS) {
+        Py_DECREF(py_res);
+        Py_DECREF(py_assignments);
+        return PyErr_NoMemory();
+    }
+    return Py_BuildValue("NN", py_assignments, py_res); /* steals both references */
 }
 
 static PyObject* costFunction(PyObject *self, PyObject *args) {
-    int k, i, j, r;
-    float value, d;
-    float *data, *centers;
+    int k, i, r;
+    float value;
+    float *data;
+    float **centers;
     char *metric;
-    PyObject *ret_cost;
+    PyObject *ret_cost, *py_item;
     Py_ssize_t dim, n_frames;
     PyArrayObject *np_data, *np_centers;
     float (*distance)(float*, float*, size_t, float*, float*, float*);
     float *buffer_a, *buffer_b;
 
-    k = 0; r = 0; i = 0; j = 0; value = 0.0; d = 0.0;
-    metric = NULL; np_data = NULL;
-    data = NULL; ret_cost = Py_BuildValue("");
+    k = 0; r = 0; i = 0; value = 0.0;
+    metric = NULL; np_data = NULL; centers = NULL;
+    data = NULL; ret_cost = NULL;
     buffer_a = NULL; buffer_b = NULL;
     /* parse python input (np_data, np_centers, metric, k) */
     if (!PyArg_ParseTuple(args, "O!O!si", &PyArray_Type, &np_data, &PyList_Type, &np_centers, &metric, &k)) {
@@ -248,15 +644,34 @@ static PyObject* costFunction(PyObject *self, PyObject *args) {
         goto error;
     }
 
+    /* collect the centers while holding the GIL */
+    if(k > PyList_Size((PyObject*) np_centers)) {
+        PyErr_SetString(PyExc_ValueError, "k exceeds the number of cluster centers.");
+        goto error;
+    }
+    if(k > 0 && !(centers = malloc(k * sizeof(float*)))) { PyErr_NoMemory(); goto error; }
+    for(r = 0; r < k; r++) {
+        py_item = PyList_GetItem((PyObject*) np_centers, r); /* ref:borr. */
+        if(!PyArray_Check(py_item) || PyArray_TYPE((PyArrayObject*) py_item) != NPY_FLOAT32
+           || !PyArray_ISCARRAY_RO((PyArrayObject*) py_item) || PyArray_SIZE((PyArrayObject*) py_item) != dim) {
+            PyErr_SetString(PyExc_ValueError, "cluster centers have to be contiguous arrays of float (32) with the dimension of the data.");
+            goto error;
+        }
+        centers[r] = PyArray_DATA((PyArrayObject*) py_item);
+    }
+
+    Py_BEGIN_ALLOW_THREADS
     for(r = 0; r < k; r++) {
-        centers = PyArray_DATA(PyList_GetItem(np_centers,r));
         for(i = 0; i < n_frames; i++) {
-            value += pow(distance(&data[i*dim], &centers[0], dim, buffer_a, buffer_b, NULL), 2);
+            value += pow(distance(&data[i*dim], centers[r], dim, buffer_a, buffer_b, NULL), 2);
         }
     }
+    Py_END_ALLOW_THREADS
     ret_cost = Py_BuildValue("f", value);
-    Py_INCREF(ret_cost);
 error:
+    free(centers);
+    free(buffer_a);
+    free(buffer_b);
     return ret_cost;
 }
 
@@ -278,10 +693,12 @@ static PyObject* initCentersKMpp(PyObject *self, PyObject *args) {
     int *next_center_candidates;
     float *next_center_candidates_rand;
     float *next_center_candidates_potential;
-    float *data, *init_centers;
+    float *data, *init_centers, *weights;
     float *buffer_a, *buffer_b;
     void *arr_data;
     float *squared_distances;
+    PyObject *py_weights;
+    PyArrayObject *np_weights;
     float (*distance)(float*, float*, size_t, float*, float*, float*);
 
     ret_init_centers = Py_BuildValue("");
@@ -295,10 +712,11 @@ static PyObject* initCentersKMpp(PyObject *self, PyObject *args) {
     next_center_candidates_potential = NULL;
     dist_sum = 0.0;
     use_random_seed = 1;
+    py_weights = Py_None; np_weights = NULL; weights = NULL;
 
 
-    /* parse python input (np_data, metric, k) */
-    if (!PyArg_ParseTuple(args, "O!sii", &PyArray_Type, &np_data, &metric, &k, &use_random_seed)) {
+    /* parse python input (np_data, metric, k, use_random_seed, weights) */
+    if (!PyArg_ParseTuple(args, "O!sii|O", &PyArray_Type, &np_data, &metric, &k, &use_random_seed, &py_weights)) {
         goto error;
     }
 
@@ -318,6 +736,16 @@ static PyObject* initCentersKMpp(PyObject *self, PyObject *args) {
     n_frames = np_data->dimensions[0];
     dim = np_data->dimensions[1];
     data = PyArray_DATA(np_data);
+    /* optional weights (multiplicities) of the data points */
+    if (py_weights != Py_None) {
+        np_weights = (PyArrayObject*) PyArray_ContiguousFromAny(py_weights, NPY_FLOAT32, 1, 1);
+        if (!np_weights) goto error;
+        if (PyArray_DIM(np_weights, 0) != n_frames) {
+            PyErr_SetString(PyExc_ValueError, "weights must have the same length as data.");
+            goto error;
+        }
+        weights = PyArray_DATA(np_weights);
+    }
     /* number of trials before choosing the data point with the best potential */
     n_trials = 2 + (int) log(k);
 
@@ -346,8 +774,20 @@ static PyObject* initCentersKMpp(PyObject *self, PyObject *args) {
         goto error;
     }
 
-    /* pick first center randomly */
+    /* the GIL is only needed again for the callbacks */
+    Py_BEGIN_ALLOW_THREADS
+    /* pick first center randomly (proportional to its weight) */
     first_center_index = rand() % n_frames;
+    if (weights) {
+        sum = 0.0;
+        for(i = 0; i < n_frames; i++) sum += weights[i];
+        d = sum * ((float)rand()/(float)RAND_MAX);
+        sum = 0.0;
+        for(i = 0; i < n_frames; i++) {
+            sum += weights[i];
+            if (weights[i] > 0 && sum >= d) { first_center_index = i; break; }
+        }
+    }
     /* and mark it as assigned */
     taken_points[first_center_index] = 1;
     /* write its coordinates into the init_centers array */
@@ -358,8 +798,10 @@ static PyObject* initCentersKMpp(PyObject *self, PyObject *args) {
     centers_found++;
     /* perform callback */
     if(set_callback) {
+        Py_BLOCK_THREADS
         py_callback_result = PyObject_CallObject(set_callback, NULL);
         if(py_callback_result) Py_DECREF(py_callback_result);
+        Py_UNBLOCK_THREADS
     }
 
     /* iterate over all data points j, measuring the squared distance between j and the initial center i: */
@@ -367,6 +809,7 @@ static PyObject* initCentersKMpp(PyObject *self, PyObject *args) {
     for(i = 0; i < n_frames; i++) {
         if(i != first_center_index) {
             d = pow(distance(&data[i*dim], &data[first_center_index*dim], dim, buffer_a, buffer_b, NULL), 2);
+            if (weights) d *= weights[i];
             squared_distances[i] = d;
             /* build up dist_sum which keeps the sum of all squared distances */
             dist_sum += d;
@@ -409,6 +852,7 @@ static PyObject* initCentersKMpp(PyObject *self, PyObject *args) {
                     if(next_center_candidates[j] == -1) break;
                     if(next_center_candidates[j] != i) {
                         d = pow(distance(&data[i*dim], &data[next_center_candidates[j]*dim], dim, buffer_a, buffer_b, NULL), 2);
+                        if (weights) d *= weights[i];
                         if(d < squared_distances[i]) {
                             next_center_candidates_potential[j] += d;
                         } else {
@@ -449,8 +893,10 @@ static PyObject* initCentersKMpp(PyObject *self, PyObject *args) {
             centers_found++;
             /* perform the callback */
             if(set_callback) {
+                Py_BLOCK_THREADS
                 py_callback_result = PyObject_CallObject(set_callback, NULL);
                 if(py_callback_result) Py_DECREF(py_callback_result);
+                Py_UNBLOCK_THREADS
             }
             /* mark the data point as assigned center */
             taken_points[best_candidate] = 1;
@@ -466,6 +912,7 @@ static PyObject* initCentersKMpp(PyObject *self, PyObject *args) {
                 for(i = 0; i < n_frames; i++) {
                     if(!taken_points[i]) {
                         d = pow(distance(&data[i*dim], &data[best_candidate*dim], dim, buffer_a, buffer_b, NULL), 2);
+                        if (weights) d *= weights[i];
                         if(d < squared_distances[i]) {
                             dist_sum += d - squared_distances[i];
                             squared_distances[i] = d;
@@ -478,6 +925,8 @@ static PyObject* initCentersKMpp(PyObject *self, PyObject *args) {
         }
     }
 
+    Py_END_ALLOW_THREADS
+
     /* create the output objects */
     dims[0] = k;
     dims[1] = dim;
@@ -504,37 +953,90 @@ error:
     free(next_center_candidates);
     free(next_center_candidates_rand);
     free(next_center_candidates_potential);
+    Py_XDECREF(np_weights);
     return ret_init_centers;
 }
 
 static char MOD_USAGE[] = "Chunked regular spatial clustering";
 
-static char CLUSTER_USAGE[] = "cluster(chunk, centers, mindist, metric)\n"\
-"Given a chunk of data and a list of cluster centers, update the list of cluster centers with the newly found centers.\n"\
+static char CLUSTER_USAGE[] = "cluster(chunk, centers, metric, n_threads=1, bounds=None)\n"\
+"Performs one Lloyd iteration (assignment and update step) of k-means.\n"\
 "\n"\
 "Parameters\n"\
 "----------\n"\
 "chunk : (N,M) C-style contiguous and behaved ndarray of np.float32\n"\
 "    (input) array of N frames, each frame having dimension M\n"\
-"centers : list of (M) behaved ndarrays of np.float32\n"\
-"    (input/output) Possibly empty list of previously found cluster\n"\
-"    centers. New centers are appended to this list.\n"\
-"dmin : float\n"\
-"    (input) Distance parameter for regular spatial clustering. Whenever\n"\
-"    a frame is at least `dmin` away form all cluster centers it is added\n"\
-"    as a new cluster center.\n"\
+"centers : (K,M) ndarray-like of np.float32\n"\
+"    (input) current cluster centers (or list of K arrays of dimension M).\n"\
 "metric : string\n"\
 "    (input) One of \"euclidean\" or \"minRMSD\" (case sensitive).\n"\
+"n_threads : int\n"\
+"    (input) number of OpenMP threads.\n"\
+"bounds : None or tuple (assignments, upper, lower)\n"\
+"    (input/output) Only for the euclidean metric. Arrays of length N with dtypes\n"\
+"    (np.int32, np.float32, np.float32) holding the assignment of every frame and\n"\
+"    Hamerly's upper and lower distance bounds. They are being updated in place and\n"\
+"    should be passed again in the next iteration to skip frames whose assignment\n"\
+"    can not change. Initialize the assignments with -1.\n"\
 "\n"\
 "Returns\n"\
 "-------\n"\
-"None. The input parameter `centers` is updated instead.\n"\
+"(new_centers, cost): (K,M) ndarray of np.float32 and the sum of squared distances\n"\
+"of all frames to their assigned (new) center. Empty clusters keep their center.\n"\
 "\n"\
 "Note\n"\
 "----\n"\
 "This function uses the minRMSD implementation of mdtraj.";
 
-static char INIT_CENTERS_USAGE[] = "init_centers(data, metric, k)\n"\
+static char ACCUMULATE_USAGE[] = "accumulate(chunk, centers, metric, n_threads, sums, counts, prev_centers=None)\n"\
+"Assigns a chunk of frames to the given cluster centers and accumulates them for a k-means update.\n"\
+"\n"\
+"Calling this for all chunks of a data set followed by sums / counts (for non-empty clusters)\n"\
+"performs a Lloyd iteration without having to hold all frames in memory.\n"\
+"\n"\
+"Parameters\n"\
+"----------\n"\
+"chunk : (N,M) ndarray of np.float32 or np.float64\n"\
+"    (input) array of N frames, each frame having dimension M. The rows may be strided.\n"\
+"centers : (K,M) C-style contiguous and behaved ndarray of np.float32\n"\
+"    (input) current cluster centers\n"\
+"metric : string\n"\
+"    (input) One of \"euclidean\" or \"minRMSD\" (case sensitive).\n"\
+"n_threads : int\n"\
+"    (input) number of OpenMP threads.\n"\
+"sums : (K,M) C-style contiguous ndarray of np.float64\n"\
+"    (input/output) the frames assigned to each center are added to its row.\n"\
+"counts : (K) contiguous ndarray of np.int64\n"\
+"    (input/output) number of frames assigned to each center is added.\n"\
+"prev_centers : None or (K,M) C-style contiguous and behaved ndarray of np.float32\n"\
+"    (input) the centers, which have been updated to centers by the previous Lloyd iteration.\n"\
+"\n"\
+"Returns\n"\
+"-------\n"\
+"cost : sum of squared distances of the frames to their assigned center. If prev_centers is given,\n"\
+"    the frames are assigned to prev_centers instead and the distances refer to the respective\n"\
+"    center in centers, which is the cost of the previous iteration as returned by cluster.\n";
+
+static char CLOSEST_CENTERS_USAGE[] = "closest_centers(chunk, centers, metric, n_threads=1)\n"\
+"Assigns every frame to its closest cluster center and computes the distance to it.\n"\
+"\n"\
+"Parameters\n"\
+"----------\n"\
+"chunk : (N,M) ndarray of np.float32 or np.float64\n"\
+"    (input) array of N frames, each frame having dimension M. The rows may be strided.\n"\
+"centers : (K,M) C-style contiguous and behaved ndarray of np.float32\n"\
+"    (input) cluster centers\n"\
+"metric : string\n"\
+"    (input) One of \"euclidean\" or \"minRMSD\" (case sensitive).\n"\
+"n_threads : int\n"\
+"    (input) number of OpenMP threads.\n"\
+"\n"\
+"Returns\n"\
+"-------\n"\
+"(assignments, distances): (N) ndarrays of np.int32 and np.float32. Frames, which can\n"\
+"not be assigned (NaN), get the index -1 and the distance FLT_MAX.\n";
+
+static char INIT_CENTERS_USAGE[] = "init_centers(data, metric, k, use_random_seed, weights=None)\n"\
 "Given the data, choose \"k\" cluster centers according to the kmeans++ initialization."\
 "\n"\
 "Parameters\n"\
@@ -547,6 +1049,9 @@ static char INIT_CENTERS_USAGE[] = "init_centers(data, metric, k)\n"\
 "    (input) the number of cluster centers to be assigned for initialization."\
 "use_random_seed : bool\n"\
 "    (input) determines if a fixed seed should be used or a random one\n"\
+"weights : None or (N) ndarray of np.float32\n"\
+"    (input) optional non-negative weights (multiplicities) of the data points, the\n"\
+"    D^2 sampling then uses the weighted squared distances.\n"\
 "\n"\
 "Returns\n"\
 "-------\n"\
@@ -561,6 +1066,8 @@ static PyMethodDef kmeansMethods[] =
 {
      {"cluster", cluster, METH_VARARGS, CLUSTER_USAGE},
      {"assign",  assign,  METH_VARARGS, ASSIGN_USAGE},
+     {"accumulate", accumulate, METH_VARARGS, ACCUMULATE_USAGE},
+     {"closest_centers", closest_centers, METH_VARARGS, CLOSEST_CENTERS_USAGE},
      {"init_centers", initCentersKMpp, METH_VARARGS, INIT_CENTERS_USAGE},
      {"cost_function", costFunction, METH_VARARGS, "Evaluates the cost function for the k-means clustering algorithm."},
      {"set_callback", c_set_callback, METH_VARARGS, "For setting a callback."},
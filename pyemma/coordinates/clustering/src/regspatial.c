@@ -18,25 +18,188 @@
 
 #include <clustering.h>
 
+/*
+ * Uniform grid over the centers for the euclidean metric. The centers are hashed by the cell of their
+ * projection onto the first (up to REGSPACE_GRID_DIMS) coordinates. The cell size is slightly larger
+ * than the cutoff, so all centers within the cutoff of a frame are located in the neighbouring cells.
+ * Centers with coordinates, which can not be mapped to a cell (NaN, inf, huge values) are kept in
+ * a separate list, which is always searched.
+ */
+typedef struct {
+    int n_dims;              /* number of coordinates used for the grid */
+    double cell_size;
+    Py_ssize_t n_centers;    /* number of centers in the grid */
+    Py_ssize_t capacity;     /* allocated number of centers */
+    npy_int64 *cells;        /* (capacity x n_dims) cell coordinates of each center */
+    Py_ssize_t *next;        /* next center in the same hash bucket (or -1) */
+    Py_ssize_t *heads;       /* first center of each hash bucket (or -1) */
+    Py_ssize_t n_buckets;    /* power of two */
+    Py_ssize_t *unmapped;    /* centers without a cell */
+    Py_ssize_t n_unmapped;
+} regspace_grid;
+
+static int grid_cell(regspace_grid *grid, float *x, npy_int64 *cell)
+{
+    int k;
+    double c;
+    for (k = 0; k < grid->n_dims; ++k) {
+        c = floor(x[k] / grid->cell_size);
+        if (!(c > -4.0e18 && c < 4.0e18)) return 0;  /* also catches NaN */
+        cell[k] = (npy_int64) c;
+    }
+    return 1;
+}
+
+static Py_ssize_t grid_bucket(regspace_grid *grid, npy_int64 *cell)
+{
+    int k;
+    npy_uint64 h = 1469598103934665603ULL;
+    for (k = 0; k < grid->n_dims; ++k) {
+        h ^= (npy_uint64) cell[k];
+        h *= 1099511628211ULL;
+        h ^= h >> 29;
+    }
+    return (Py_ssize_t) (h & (npy_uint64) (grid->n_buckets - 1));
+}
+
+static void grid_free(regspace_grid *grid)
+{
+    free(grid->cells);
+    free(grid->next);
+    free(grid->heads);
+    free(grid->unmapped);
+}
+
+static int grid_rehash(regspace_grid *grid, Py_ssize_t n_buckets)
+{
+    Py_ssize_t i, b, *heads;
+    heads = malloc(n_buckets * sizeof(Py_ssize_t));
+    if (!heads) return ASSIGN_ERR_NO_MEMORY;
+    free(grid->heads);
+    grid->heads = heads;
+    grid->n_buckets = n_buckets;
+    for (b = 0; b < n_buckets; ++b) heads[b] = -1;
+    for (i = 0; i < grid->n_centers; ++i) {
+        if (grid->next[i] == -2) continue;  /* unmapped */
+        b = grid_bucket(grid, &grid->cells[i*grid->n_dims]);
+        grid->next[i] = heads[b];
+        heads[b] = i;
+    }
+    return ASSIGN_SUCCESS;
+}
+
+/* adds the center with index grid->n_centers */
+static int grid_insert(regspace_grid *grid, float *center)
+{
+    Py_ssize_t i, b, capacity;
+    void *p;
+
+    if (grid->n_centers == grid->capacity) {
+        capacity = grid->capacity > 0 ? 2 * grid->capacity : 64;
+        if (!(p = realloc(grid->cells, capacity * grid->n_dims * sizeof(npy_int64)))) return ASSIGN_ERR_NO_MEMORY;
+        grid->cells = p;
+        if (!(p = realloc(grid->next, capacity * sizeof(Py_ssize_t)))) return ASSIGN_ERR_NO_MEMORY;
+        grid->next = p;
+        if (!(p = realloc(grid->unmapped, capacity * sizeof(Py_ssize_t)))) return ASSIGN_ERR_NO_MEMORY;
+        grid->unmapped = p;
+        grid->capacity = capacity;
+    }
+    if (2 * (grid->n_centers + 1) > grid->n_buckets) {
+        /* n_centers is incremented after the rehash, so the new center is not yet part of it */
+        if (grid_rehash(grid, grid->n_buckets > 0 ? 4 * grid->n_buckets : 256) != ASSIGN_SUCCESS) return ASSIGN_ERR_NO_MEMORY;
+    }
+    i = grid->n_centers;
+    if (grid_cell(grid, center, &grid->cells[i*grid->n_dims])) {
+        b = grid_bucket(grid, &grid->cells[i*grid->n_dims]);
+        grid->next[i] = grid->heads[b];
+        grid->heads[b] = i;
+    } else {
+        grid->next[i] = -2;
+        grid->unmapped[grid->n_unmapped++] = i;
+    }
+    grid->n_centers++;
+    return ASSIGN_SUCCESS;
+}
+
+/*
+ * Whether any of the centers (with index >= first_center) is within the cutoff of the frame.
+ * Only this is needed for regular space clustering, so the search can stop at the first hit.
+ */
+static int grid_covered(regspace_grid *grid, float *frame, float *centers, Py_ssize_t dim, float cutoff,
+                        Py_ssize_t first_center)
+{
+    npy_int64 cell[REGSPACE_GRID_DIMS], neighbour[REGSPACE_GRID_DIMS];
+    Py_ssize_t i, j;
+    int k, n, n_neighbours, offset, equal;
+
+    if (grid->n_centers <= first_center) return 0;
+    for (i = 0; i < grid->n_unmapped; ++i) {
+        j = grid->unmapped[i];
+        if (j >= first_center && euclidean_distance(frame, &centers[j*dim], dim, NULL, NULL, NULL) <= cutoff) return 1;
+    }
+    if (!grid_cell(grid, frame, cell)) {
+        /* no cell for the frame, compare with all centers */
+        for (j = first_center; j < grid->n_centers; ++j) {
+            if (euclidean_distance(frame, &centers[j*dim], dim, NULL, NULL, NULL) <= cutoff) return 1;
+        }
+        return 0;
+    }
+    n_neighbours = 1;
+    for (k = 0; k < grid->n_dims; ++k) n_neighbours *= 3;
+    for (n = 0; n < n_neighbours; ++n) {
+        offset = n;
+        for (k = 0; k < grid->n_dims; ++k) {
+            neighbour[k] = cell[k] + (offset % 3) - 1;
+            offset /= 3;
+        }
+        for (j = grid->heads[grid_bucket(grid, neighbour)]; j >= 0; j = grid->next[j]) {
+            if (j < first_center) continue;
+            equal = 1;
+            for (k = 0; k < grid->n_dims; ++k) {
+                if (grid->cells[j*grid->n_dims + k] != neighbour[k]) { equal = 0; break; }
+            }
+            if (equal && euclidean_distance(frame, &centers[j*dim], dim, NULL, NULL, NULL) <= cutoff) return 1;
+        }
+    }
+    return 0;
+}
+
+/* brute force version of grid_covered (for metrics without a grid) */
+static int brute_force_covered(float *frame, float *centers, Py_ssize_t dim, float cutoff,
+                               Py_ssize_t first_center, Py_ssize_t N_centers,
+                               float (*distance)(float*, float*, size_t, float*, float*, float*),
+                               float *buffer_a, float *buffer_b)
+{
+    Py_ssize_t j;
+    for (j = first_center; j < N_centers; ++j) {
+        if (distance(frame, &centers[j*dim], dim, buffer_a, buffer_b, NULL) <= cutoff) return 1;
+    }
+    return 0;
+}
+
 static PyObject *cluster(PyObject *self, PyObject *args) {
-    PyObject *py_centers, *py_item, *py_res;
-    PyArrayObject *np_chunk, *np_item, *np_new_center;
-    Py_ssize_t N_centers, N_frames, dim, i, j, max_clusters;
-    npy_intp new_dims[1];
-    float *chunk;
-    float **centers;
+    PyObject *py_res, *py_chunk;
+    PyArrayObject *np_chunk, *np_centers, *np_new_centers;
+    Py_ssize_t N_centers, N_centers_chunk, N_frames, dim, i, capacity, max_clusters;
+    npy_intp new_dims[2];
+    chunk_view chunk;
+    float *centers, *frame;
     char *metric;
-    float cutoff, mindist;
-    float d;
-    float *buffer_a, *buffer_b;
+    float cutoff;
+    float *buffer_a, *buffer_b, *buffer_frame;
+    char *covered;
+    int n_threads, use_grid, max_reached, err, owns_centers;
+    regspace_grid grid;
     float (*distance)(float*, float*, size_t, float*, float*, float*);
 
-    py_centers = NULL; py_item = NULL; py_res = NULL;
-    np_chunk = NULL; np_item = NULL;
-    centers = NULL; metric=""; chunk = NULL;
-    buffer_a = NULL; buffer_b = NULL;
+    py_res = NULL; np_chunk = NULL; np_centers = NULL; np_new_centers = NULL;
+    metric = ""; covered = NULL;
+    n_threads = 1; max_reached = 0; err = ASSIGN_SUCCESS; owns_centers = 0;
+    memset(&grid, 0, sizeof(regspace_grid));
 
-    if (!PyArg_ParseTuple(args, "O!O!fsn", &PyArray_Type, &np_chunk, &PyList_Type, &py_centers, &cutoff, &metric, &max_clusters)) goto error; /* ref:borr. */
+    if (!PyArg_ParseTuple(args, "OO!nfsn|i", &py_chunk, &PyArray_Type, &np_centers, &N_centers,
+                          &cutoff, &metric, &max_clusters, &n_threads)) goto error; /* ref:borr. */
+    if (n_threads < 1) n_threads = 1;
 
     if(cutoff<=0.0) {
         PyErr_SetString(PyExc_ValueError, "cutoff can\'t be zero or negative.");
@@ -44,98 +207,168 @@ static PyObject *cluster(PyObject *self, PyObject *args) {
     }
 
     /* import chunk */
-    if(PyArray_TYPE(np_chunk)!=NPY_FLOAT32) { PyErr_SetString(PyExc_ValueError, "dtype of \"chunk\" isn\'t float (32)."); goto error; };
-    if(!PyArray_ISCARRAY_RO(np_chunk) ) { PyErr_SetString(PyExc_ValueError, "\"chunk\" isn\'t C-style contiguous or isn\'t behaved."); goto error; };
-    if(PyArray_NDIM(np_chunk)!=2) { PyErr_SetString(PyExc_ValueError, "Number of dimensions of \"chunk\" isn\'t 2."); goto error;  };
-    N_frames = np_chunk->dimensions[0];
-    dim = np_chunk->dimensions[1];
+    if(!(np_chunk = import_chunk(py_chunk, &chunk))) goto error; /* ref:new */
+    N_frames = chunk.N_frames;
+    dim = chunk.dim;
     if(dim==0) {
         PyErr_SetString(PyExc_ValueError, "chunk dimension must be larger than zero.");
         goto error;
     }
-    chunk = PyArray_DATA(np_chunk);
 
-    if(strcmp(metric,"euclidean")==0)
+    if(strcmp(metric,"euclidean")==0) {
         distance = euclidean_distance;
-    else if(strcmp(metric,"minRMSD")==0) {
+        use_grid = 1;
+    } else if(strcmp(metric,"minRMSD")==0) {
         distance = minRMSD_distance;
-        buffer_a = malloc(dim*sizeof(float));
-        buffer_b = malloc(dim*sizeof(float));
-        if(!buffer_a || !buffer_b) { PyErr_NoMemory(); goto error; }
-    }
-    else {
+        use_grid = 0;
+    } else {
         PyErr_SetString(PyExc_ValueError, "metric must be one of \"euclidean\" or \"minRMSD\".");
         goto error;
     }
 
-    /* import list of cluster centers */
-    N_centers = PyList_Size(py_centers);
-    centers = malloc(N_centers*sizeof(float*));
-    if(!centers) { PyErr_NoMemory(); goto error; }
-
-    for(i = 0; i < N_centers; ++i) {
-        py_item = PyList_GetItem(py_centers,i); /* ref:borr. */
-        if(!py_item) goto error;
-        if(!PyArray_Check(py_item)) { PyErr_SetString(PyExc_ValueError, "Elements of centers must be numpy arrays."); goto error; }
-        np_item = (PyArrayObject*)py_item;
-        if(PyArray_TYPE(np_item)!=NPY_FLOAT32) { PyErr_SetString(PyExc_ValueError, "dtype of cluster center isn\'t float (32)."); goto error; };
-        if(!PyArray_ISBEHAVED_RO(np_item) ) { PyErr_SetString(PyExc_ValueError, "cluster center isn\'t behaved."); goto error; };
-        if(PyArray_NDIM(np_item)!=1) { PyErr_SetString(PyExc_ValueError, "Number of dimensions of cluster centers must be 1."); goto error;  };
-        if(np_item->dimensions[0]!=dim) {
-          PyErr_SetString(PyExc_ValueError, "Dimension of cluster centers doesn\'t match dimension of frames.");
-          goto error;
+    /* import buffer of cluster centers, of which the first N_centers rows are used */
+    if(PyArray_TYPE(np_centers)!=NPY_FLOAT32 || !PyArray_ISCARRAY(np_centers) || PyArray_NDIM(np_centers)!=2) {
+        PyErr_SetString(PyExc_ValueError, "centers has to be a writeable, C-contiguous two-dimensional ndarray of float (32).");
+        goto error;
+    }
+    if(PyArray_DIM(np_centers, 1)!=dim) {
+        PyErr_SetString(PyExc_ValueError, "Dimension of cluster centers doesn\'t match dimension of frames.");
+        goto error;
+    }
+    capacity = PyArray_DIM(np_centers, 0);
+    if(N_centers < 0 || N_centers > capacity) {
+        PyErr_SetString(PyExc_ValueError, "n_centers exceeds the size of the centers buffer.");
+        goto error;
+    }
+    Py_INCREF(np_centers);  /* we return either this or a new buffer */
+    owns_centers = 1;
+    centers = PyArray_DATA(np_centers);
+
+    if (!(covered = calloc(N_frames, sizeof(char)))) { PyErr_NoMemory(); goto error; }
+
+    /* the GIL is only needed again to grow the buffer of centers */
+    Py_BEGIN_ALLOW_THREADS
+    if (use_grid) {
+        grid.n_dims = dim < REGSPACE_GRID_DIMS ? (int) dim : REGSPACE_GRID_DIMS;
+        grid.cell_size = cutoff * (1.0 + REGSPACE_GRID_MARGIN);
+        for (i = 0; i < N_centers && err == ASSIGN_SUCCESS; ++i) {
+            err = grid_insert(&grid, &centers[i*dim]);
         }
-        centers[i] = (float*)PyArray_DATA(np_item);
     }
 
-    /* do the clustering */
-    for(i = 0; i < N_frames; ++i) {
-        mindist = FLT_MAX;
-        for(j = 0; j < N_centers; ++j) {
-            d = distance(&chunk[i*dim], centers[j], dim, buffer_a, buffer_b, NULL);
-            if(d<mindist) mindist = d;
+    /* 1. screen all frames of the chunk in parallel against the centers found so far */
+    if (err == ASSIGN_SUCCESS) {
+        #ifdef USE_OPENMP
+        omp_set_num_threads(n_threads);
+        #endif
+        #pragma omp parallel private(buffer_a, buffer_b, buffer_frame, frame)
+        {
+            buffer_a = malloc(dim*sizeof(float));
+            buffer_b = malloc(dim*sizeof(float));
+            buffer_frame = malloc(dim*sizeof(float));
+            if (!buffer_a || !buffer_b || !buffer_frame) {
+                #pragma omp critical
+                err = ASSIGN_ERR_NO_MEMORY;
+            }
+            #pragma omp for schedule(dynamic, 64)
+            for (i = 0; i < N_frames; ++i) {
+                if (!buffer_a || !buffer_b || !buffer_frame) continue;
+                frame = chunk_row(&chunk, i, buffer_frame);
+                if (use_grid) {
+                    covered[i] = (char) grid_covered(&grid, frame, centers, dim, cutoff, 0);
+                } else {
+                    covered[i] = (char) brute_force_covered(frame, centers, dim, cutoff, 0, N_centers,
+                                                            distance, buffer_a, buffer_b);
+                }
+            }
+            free(buffer_a);
+            free(buffer_b);
+            free(buffer_frame);
+        }
+    }
+
+    /* 2. sequentially accept the remaining frames, which only have to be compared with the new centers */
+    buffer_a = NULL; buffer_b = NULL;
+    if (!use_grid) {
+        buffer_a = malloc(dim*sizeof(float));
+        buffer_b = malloc(dim*sizeof(float));
+    }
+    buffer_frame = malloc(dim*sizeof(float));
+    N_centers_chunk = N_centers;
+    for (i = 0; i < N_frames && err == ASSIGN_SUCCESS; ++i) {
+        if (covered[i]) continue;
+        if (!buffer_frame) { err = ASSIGN_ERR_NO_MEMORY; break; }
+        frame = chunk_row(&chunk, i, buffer_frame);
+        if (use_grid) {
+            if (grid_covered(&grid, frame, centers, dim, cutoff, N_centers_chunk)) continue;
+        } else {
+            if (!buffer_a || !buffer_b) { err = ASSIGN_ERR_NO_MEMORY; break; }
+            if (brute_force_covered(frame, centers, dim, cutoff, N_centers_chunk, N_centers,
+                                    distance, buffer_a, buffer_b)) continue;
         }
-        if(mindist > cutoff) {
-            if(N_centers+1>max_clusters) {
-                PyErr_SetString(PyExc_RuntimeError, "Maximum number of cluster centers reached. "\
-                                                    "Consider increasing max_clusters or choose "\
-                                                    "a larger minimum distance, dmin.");
-                goto error;
+        if(N_centers+1>max_clusters) {
+            max_reached = 1;
+            break;
+        }
+        if (N_centers == capacity) {
+            /* grow the buffer geometrically */
+            capacity = 2 * capacity > 16 ? 2 * capacity : 16;
+            if (capacity > max_clusters) capacity = max_clusters;
+            new_dims[0] = capacity; new_dims[1] = dim;
+            Py_BLOCK_THREADS
+            np_new_centers = (PyArrayObject*) PyArray_SimpleNew(2, new_dims, NPY_FLOAT32); /* ref:new */
+            if (np_new_centers) {
+                memcpy(PyArray_DATA(np_new_centers), centers, N_centers*dim*sizeof(float));
+                Py_DECREF(np_centers);
+                np_centers = np_new_centers;
+                centers = PyArray_DATA(np_centers);
             }
-            new_dims[0] = dim;
-            np_new_center = (PyArrayObject*) PyArray_SimpleNew(1, new_dims, NPY_FLOAT32); /* ref:new */
-            if(!np_new_center) goto error;
-            memcpy(PyArray_DATA(np_new_center), &chunk[i*dim], sizeof(float)*dim);
-            if(PyList_Append(py_centers, (PyObject*)np_new_center)!=0) goto error; /* ref:not stolen */
-            Py_DECREF(np_new_center);
-            centers = realloc(centers, (N_centers+1)*sizeof(float*));
-            if(!centers) { PyErr_NoMemory(); goto error; }
-            centers[N_centers] = (float*)PyArray_DATA(np_new_center);
-            N_centers++;
+            Py_UNBLOCK_THREADS
+            if (!np_new_centers) { err = ASSIGN_ERR_NO_MEMORY; break; }
         }
+        memcpy(&centers[N_centers*dim], frame, dim*sizeof(float));
+        if (use_grid && grid_insert(&grid, &centers[N_centers*dim]) != ASSIGN_SUCCESS) { err = ASSIGN_ERR_NO_MEMORY; break; }
+        N_centers++;
+    }
+    free(buffer_a);
+    free(buffer_b);
+    free(buffer_frame);
+    Py_END_ALLOW_THREADS
+    if (err != ASSIGN_SUCCESS) {
+        if (!PyErr_Occurred()) PyErr_NoMemory();
+        goto error;
     }
 
-    py_res = Py_BuildValue(""); /* =None */
+    py_res = Py_BuildValue("Nni", np_centers, N_centers, max_reached); /* steals reference to np_centers */
+    owns_centers = 0;
     /* fall through */
 error:
-    free(centers);
-    free(buffer_a);
-    free(buffer_b);
+    if (owns_centers) Py_DECREF(np_centers);
+    Py_XDECREF(np_chunk);
+    grid_free(&grid);
+    free(covered);
     return py_res;
 }
 
 static char MOD_USAGE[] = "Chunked regular spatial clustering";
 
-static char CLUSTER_USAGE[] = "cluster(chunk, centers, mindist, metric)\n"\
-"Given a chunk of data and a list of cluster centers, update the list of cluster centers with the newly found centers.\n"\
+static char CLUSTER_USAGE[] = "cluster(chunk, centers, n_centers, dmin, metric, max_clusters, n_threads=1)\n"\
+"Given a chunk of data and a buffer of cluster centers, add the newly found centers to the buffer.\n"\
+"\n"\
+"All frames of the chunk are first compared with the previously found centers in parallel\n"\
+"(for the euclidean metric using a grid over the centers), only the remaining frames are then\n"\
+"processed sequentially in order. The result is the same as comparing frame by frame.\n"\
 "\n"\
 "Parameters\n"\
 "----------\n"\
-"chunk : (N,M) C-style contiguous and behaved ndarray of np.float32\n"\
-"    (input) array of N frames, each frame having dimension M\n"\
-"centers : list of (M) behaved ndarrays of np.float32\n"\
-"    (input/output) Possibly empty list of previously found cluster\n"\
-"    centers. New centers are appended to this list.\n"\
+"chunk : (N,M) ndarray of np.float32 or np.float64\n"\
+"    (input) array of N frames, each frame having dimension M. The rows may be strided.\n"\
+"centers : (C,M) C-style contiguous and writeable ndarray of np.float32\n"\
+"    (input/output) buffer of cluster centers, of which the first `n_centers` rows are\n"\
+"    used. New centers are written to the following rows. If the buffer is full, a\n"\
+"    larger buffer is allocated and returned.\n"\
+"n_centers : int\n"\
+"    (input) number of previously found cluster centers.\n"\
 "dmin : float\n"\
 "    (input) Distance parameter for regular spatial clustering. Whenever\n"\
 "    a frame is at least `dmin` away form all cluster centers it is added\n"\
@@ -143,12 +376,14 @@ static char CLUSTER_USAGE[] = "cluster(chunk, centers, mindist, metric)\n"\
 "metric : string\n"\
 "    (input) One of \"euclidean\" or \"minRMSD\" (case sensitive).\n"\
 "max_clusters : unsigned integer\n"\
-"    (input) Maximum allowed number of cluster. The function will raise\n"\
-"    a `RuntimeError` when this limit is exceeded.\n"\
+"    (input) Maximum allowed number of cluster.\n"\
+"n_threads : int\n"\
+"    (input) number of OpenMP threads used to compare the frames with the centers.\n"\
 "\n"\
 "Returns\n"\
 "-------\n"\
-"None. The input parameter `centers` is updated instead.\n"\
+"(centers, n_centers, max_reached): the (possibly reallocated) buffer of centers, the number\n"\
+"of centers in it and whether the clustering stopped, because `max_clusters` was reached.\n"\
 "\n"\
 "Note\n"\
 "----\n"\
@@ -159,6 +394,7 @@ static PyMethodDef regspatialMethods[] =
 {
      {"cluster", cluster, METH_VARARGS, CLUSTER_USAGE},
      {"assign",  assign,  METH_VARARGS, ASSIGN_USAGE},
+     {"precenter", precenter, METH_VARARGS, PRECENTER_USAGE},
      {NULL, NULL, 0, NULL}
 };
 
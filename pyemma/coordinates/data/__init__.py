@@ -42,6 +42,7 @@ Reader
     FeatureReader - reads features via featurizer
     NumPyFileReader - reads numpy files
     PyCSVReader - reads tabulated ascii files
+    StoreReader - reads binary stores written by write_to_store
     DataInMemory - used if data is already available in mem
 
 """
@@ -50,6 +51,7 @@ from .featurization.featurizer import MDFeaturizer, CustomFeature
 from .data_in_memory import DataInMemory
 from .numpy_filereader import NumPyFileReader
 from .py_csv_reader import PyCSVReader
+from .store_reader import StoreReader
 
 # util func
 from .util.reader_utils import create_file_reader
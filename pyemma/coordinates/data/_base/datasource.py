@@ -17,6 +17,8 @@
 
 from abc import ABCMeta, abstractmethod
 from math import ceil
+import threading
+import time
 
 import numpy as np
 import six
@@ -103,30 +105,95 @@ class DataSource(Iterable, TrajectoryRandomAccessible):
 
             # number of trajectories/data sets
             self._filenames = filename_list
-            # determine len and dim via cache lookup,
-            lengths = []
-            offsets = []
-            ndims = []
+            # lengths, offsets and dimension are determined on first access (see _resolve_traj_infos).
+            self._traj_lengths = [None] * self._ntraj
+            self._traj_offsets = [None] * self._ntraj
+            self._traj_ndims = [None] * self._ntraj
+            self._traj_ndim = None
+            self._unresolved = set(range(self._ntraj))
+
+        else:
+            # propagate this until we finally have a a reader
+            self.data_producer.filenames = filename_list
+
+    # indices of the files, whose length, offsets and dimension have not been determined yet.
+    _unresolved = ()
+    # guards the resolution of file infos, which can be triggered by several threads (eg. prefetching).
+    _resolve_lock = threading.RLock()
+
+    @property
+    def _lengths(self):
+        self._resolve_traj_infos()
+        return self._traj_lengths
+
+    @_lengths.setter
+    def _lengths(self, value):
+        self._traj_lengths = value
+
+    @property
+    def _offsets(self):
+        self._resolve_traj_infos()
+        return self._traj_offsets
+
+    @_offsets.setter
+    def _offsets(self, value):
+        self._traj_offsets = value
+
+    @property
+    def _ndim(self):
+        # the dimension is determined from the first file.
+        if 0 in self._unresolved:
+            self._resolve_traj_infos(0)
+        return self._traj_ndim
+
+    @_ndim.setter
+    def _ndim(self, value):
+        self._traj_ndim = value
+
+    def _trajectory_offsets(self, itraj):
+        """ offsets of the given trajectory, determined without resolving the infos of all other files. """
+        self._resolve_traj_infos(itraj)
+        return self._traj_offsets[itraj]
+
+    def _resolve_traj_infos(self, itraj=None):
+        """ determines length, offsets and dimension of all pending files or only of trajectory itraj.
+
+        The infos are looked up in the trajectory info cache (in bulk for several files), if enabled.
+        """
+        with self._resolve_lock:
+            if itraj is None:
+                indices = sorted(self._unresolved)
+            else:
+                indices = [itraj] if itraj in self._unresolved else []
+            if not indices:
+                return
+            filenames = [self._filenames[i] for i in indices]
             # avoid cyclic imports
             from pyemma.coordinates.data.util.traj_info_cache import TrajectoryInfoCache
-            if len(filename_list) > 3:
-                self._progress_register(len(filename_list), 'Obtaining file info')
-            for filename in filename_list:
-                if config.use_trajectory_lengths_cache:
-                    info = TrajectoryInfoCache.instance()[filename, self]
-                else:
-                    info = self._get_traj_info(filename)
-                lengths.append(info.length)
-                offsets.append(info.offsets)
-                ndims.append(info.ndim)
-                if len(filename_list) > 3:
-                    self._progress_update(1)
+            show_progress = len(filenames) > 3
+            if show_progress:
+                self._progress_register(len(filenames), 'Obtaining file info')
+            if config.use_trajectory_lengths_cache:
+                infos = TrajectoryInfoCache.instance().get_many(
+                    filenames, self, callback=self._progress_update if show_progress else None)
+            else:
+                infos = []
+                for filename in filenames:
+                    infos.append(self._get_traj_info(filename))
+                    if show_progress:
+                        self._progress_update(1)
+            for i, info in zip(indices, infos):
+                self._traj_lengths[i] = info.length
+                self._traj_offsets[i] = info.offsets
+                self._traj_ndims[i] = info.ndim
+                self._unresolved.discard(i)
 
             # ensure all trajs have same dim
+            resolved = [i for i, ndim in enumerate(self._traj_ndims) if ndim is not None]
+            ndims = np.array([self._traj_ndims[i] for i in resolved])
             if not np.unique(ndims).size == 1:
                 # group files by their dimensions to give user indicator
-                ndims = np.array(ndims)
-                filename_list = np.asarray(filename_list)
+                filename_list = np.asarray(self._filenames)[resolved]
                 sort_inds = np.argsort(ndims)
                 import itertools, operator
                 res = {}
@@ -137,14 +204,7 @@ class DataSource(Iterable, TrajectoryRandomAccessible):
                 raise ValueError("Input data has different dimensions ({dims})!"
                                  " Files grouped by dimensions: {groups}".format(dims=res.keys(),
                                                                                  groups=res))
-
-            self._ndim = ndims[0]
-            self._lengths = lengths
-            self._offsets = offsets
-
-        else:
-            # propagate this until we finally have a a reader
-            self.data_producer.filenames = filename_list
+            self._traj_ndim = ndims[0]
 
     @property
     def is_reader(self):
@@ -207,7 +267,8 @@ class DataSource(Iterable, TrajectoryRandomAccessible):
             selection = stride[stride[:, 0] == itraj][:, 0]
             return 0 if itraj not in selection else len(selection)
         else:
-            return (self._lengths[itraj] - (0 if skip is None else skip) - 1) // int(stride) + 1
+            self._resolve_traj_infos(itraj)
+            return (self._traj_lengths[itraj] - (0 if skip is None else skip) - 1) // int(stride) + 1
 
     def n_chunks(self, chunksize, stride=1, skip=0):
         """ how many chunks an iterator of this sourcde will output, starting (eg. after calling reset())
@@ -338,6 +399,11 @@ class DataSourceIterator(six.with_metaclass(ABCMeta)):
     """
     Abstract class for any data source iterator.
     """
+    # number of upcoming chunks, which are timed to adapt the automatic chunksize of the data source.
+    _auto_tune_chunks = 0
+    # number of frames read by the timed iterator per frame of the chunks handed out to the caller (eg. lagged).
+    _auto_tune_frames_per_output = 1
+
     def __init__(self, data_source, skip=0, chunk=0, stride=1, return_trajindex=False, cols=None):
         self._data_source = data_source
         self.state = IteratorState(skip=skip, chunk=chunk,
@@ -687,11 +753,20 @@ class DataSourceIterator(six.with_metaclass(ABCMeta)):
         return X
 
     def next(self):
+        if self._auto_tune_chunks > 0:
+            start = time.time()
         X = self._it_next()
         while X is not None and (
                 (not self.return_traj_index and len(X) == 0) or (self.return_traj_index and len(X[1]) == 0)
         ):
             X = self._it_next()
+        if self._auto_tune_chunks > 0:
+            self._auto_tune_chunks -= 1
+            n_frames = len(X if not self.return_traj_index else X[1])
+            # chunks at the end of a trajectory are not representative.
+            if n_frames == self.chunksize:
+                self._data_source._tune_auto_chunksize(float(n_frames) / self._auto_tune_frames_per_output,
+                                                       time.time() - start)
         if config.coordinates_check_output:
             array = X if not self.return_traj_index else X[1]
             if not np.all(np.isfinite(array)):
@@ -17,22 +17,40 @@
 
 from __future__ import print_function
 from abc import ABCMeta, abstractmethod
+import os
+import sys
+import tempfile
+import threading
+
 import six
 import numpy as np
+from six.moves import queue
+
+try:
+    from math import gcd
+except ImportError:
+    from fractions import gcd
 
 from pyemma._base.logging import Loggable
 from pyemma._base.progress import ProgressReporter
-from pyemma.util.contexts import attribute
+from pyemma.util import config
 from pyemma.util.types import is_int
 
 
 class Iterable(six.with_metaclass(ABCMeta, ProgressReporter, Loggable)):
 
+    # with chunksize='auto', the chunksize is adapted such that a chunk is processed in about this many seconds.
+    _AUTO_CHUNK_SECONDS = 1.0
+    # number of chunks measured by an iterator to adapt the automatic chunksize.
+    _AUTO_TUNE_CHUNKS = 3
+    # directory of the memory mapped files holding the in memory results (if any).
+    _in_memory_dir = None
+
     def __init__(self, chunksize=1000):
         super(Iterable, self).__init__()
-        self._default_chunksize = chunksize
-        if self.default_chunksize < 0:
-            raise ValueError("Chunksize of %s was provided, but has to be >= 0" % self.default_chunksize)
+        self._default_chunksize = self._check_chunksize(chunksize)
+        # automatic chunksize adapted to the time needed per chunk.
+        self._tuned_chunksize = None
         self._in_memory = False
         # should be set in subclass
         self._ndim = 0
@@ -46,16 +64,61 @@ class Iterable(six.with_metaclass(ABCMeta, ProgressReporter, Loggable)):
 
     @property
     def default_chunksize(self):
-        """ How much data will be processed at once, in case no chunksize has been provided."""
+        """ How much data will be processed at once, in case no chunksize has been provided.
+
+        If the chunksize has been set to 'auto', it is determined from the size of a frame and config.auto_chunk_size
+        and adapted to the time previous iterations needed per chunk.
+        """
+        if self._is_auto_chunksize(self._default_chunksize):
+            return self._auto_chunksize()
         return self._default_chunksize
 
     @property
     def chunksize(self):
-        return self._default_chunksize
+        return self.default_chunksize
 
     @chunksize.setter
     def chunksize(self, value):
-        self._default_chunksize = value
+        self._default_chunksize = self._check_chunksize(value)
+        self._tuned_chunksize = None
+
+    @staticmethod
+    def _is_auto_chunksize(chunksize):
+        return isinstance(chunksize, six.string_types) and chunksize == 'auto'
+
+    @staticmethod
+    def _check_chunksize(chunksize):
+        if isinstance(chunksize, six.string_types):
+            if chunksize != 'auto':
+                raise ValueError('Chunksize of "%s" was provided, but has to be an integer or "auto"' % chunksize)
+        elif chunksize < 0:
+            raise ValueError("Chunksize of %s was provided, but has to be >= 0" % chunksize)
+        return chunksize
+
+    def _bytes_per_frame(self):
+        return max(1, self.dimension()) * np.dtype(self.output_type()).itemsize
+
+    def _max_auto_chunksize(self):
+        return max(1, config.auto_chunk_size * 1024 * 1024 // self._bytes_per_frame())
+
+    def _auto_chunksize(self):
+        if self._tuned_chunksize is not None:
+            return self._tuned_chunksize
+        return self._max_auto_chunksize()
+
+    def _tune_auto_chunksize(self, n_frames, seconds):
+        """ adapts the automatic chunksize to the given time needed to obtain a chunk of n_frames. """
+        if n_frames == 0 or seconds <= 0:
+            return
+        chunksize = self._auto_chunksize()
+        # only adapt, if a chunk of the current size takes considerably more or less time than intended.
+        expected_seconds = seconds * chunksize / n_frames
+        if 0.5 * self._AUTO_CHUNK_SECONDS <= expected_seconds <= 2 * self._AUTO_CHUNK_SECONDS:
+            return
+        chunksize = int(n_frames * self._AUTO_CHUNK_SECONDS / seconds)
+        self._tuned_chunksize = min(max(1, chunksize), self._max_auto_chunksize())
+        if self._logger_is_active(self._loglevel_DEBUG):
+            self._logger.debug("adapted automatic chunksize to %s" % self._tuned_chunksize)
 
     @property
     def in_memory(self):
@@ -65,11 +128,16 @@ class Iterable(six.with_metaclass(ABCMeta, ProgressReporter, Loggable)):
     @in_memory.setter
     def in_memory(self, op_in_mem):
         r"""
-        If set to True, the output will be stored in memory.
+        If set to True, the output will be stored in memory. If set to the path of a directory, the output will be
+        stored in memory mapped .npy files in this directory, which are removed once in_memory is set to False.
         """
+        memmap_dir = None
+        if isinstance(op_in_mem, six.string_types):
+            memmap_dir, op_in_mem = op_in_mem, True
         old_state = self._in_memory
         if not old_state and op_in_mem:
             self._in_memory = op_in_mem
+            self._in_memory_dir = memmap_dir
             self._Y = []
             self._map_to_memory()
         elif not op_in_mem and old_state:
@@ -80,8 +148,15 @@ class Iterable(six.with_metaclass(ABCMeta, ProgressReporter, Loggable)):
         if self._logger_is_active(self._loglevel_DEBUG):
             self._logger.debug("clear memory")
         assert self.in_memory, "tried to delete in memory results which are not set"
+        filenames = [y.filename for y in self._Y or () if isinstance(y, np.memmap)] if self._in_memory_dir else ()
         self._Y = None
         self._Y_source = None
+        self._in_memory_dir = None
+        for f in filenames:
+            try:
+                os.unlink(f)
+            except EnvironmentError:
+                self._logger.warning("could not remove memory mapped file %s" % f)
 
     def _map_to_memory(self, stride=1):
         r"""Maps results to memory. Will be stored in attribute :attr:`_Y`."""
@@ -89,12 +164,12 @@ class Iterable(six.with_metaclass(ABCMeta, ProgressReporter, Loggable)):
             self._logger.debug("mapping to mem")
         assert self._in_memory
         self._mapping_to_mem_active = True
-        self._Y = self.get_output(stride=stride)
+        self._Y = self.get_output(stride=stride, memmap_dir=self._in_memory_dir)
         from pyemma.coordinates.data import DataInMemory
         self._Y_source = DataInMemory(self._Y)
         self._mapping_to_mem_active = False
 
-    def iterator(self, stride=1, lag=0, chunk=None, return_trajindex=True, cols=None, skip=0):
+    def iterator(self, stride=1, lag=0, chunk=None, return_trajindex=True, cols=None, skip=0, prefetch=0):
         """ creates an iterator to stream over the (transformed) data.
 
         If your data is too large to fit into memory and you want to incrementally compute
@@ -108,15 +183,21 @@ class Iterable(six.with_metaclass(ABCMeta, ProgressReporter, Loggable)):
             Take only every stride'th frame.
         lag: int, default=0
             how many frame to omit for each file.
-        chunk: int, default=None
+        chunk: int or 'auto', default=None
             How many frames to process at once. If not given obtain the chunk size
-            from the source.
+            from the source. If 'auto', the chunk size is determined from the size of a frame
+            and the time needed per chunk (see config.auto_chunk_size). This is also the case,
+            if the source has an automatic chunk size and its current value is given.
         return_trajindex: boolean, default=True
             a chunk of data if return_trajindex is False, otherwise a tuple of (trajindex, data).
         cols: array like, default=None
             return only the given columns.
         skip: int, default=0
             skip 'n' first frames of each trajectory.
+        prefetch: int, default=0
+            if larger than zero, a background thread reads (and transforms) up to this many
+            chunks ahead, while the current chunk is being processed. The order of the chunks
+            and the trajectory index and position reported by the iterator are not affected.
 
         Returns
         -------
@@ -144,23 +225,47 @@ class Iterable(six.with_metaclass(ABCMeta, ProgressReporter, Loggable)):
             return DataInMemory(self._Y).iterator(
                 lag=lag, chunk=chunk, stride=stride, return_trajindex=return_trajindex, skip=skip
             )
-        chunk = chunk if chunk is not None else self.default_chunksize
-        if 0 < lag <= chunk:
-            it = self._create_iterator(skip=skip, chunk=chunk, stride=1,
-                                       return_trajindex=return_trajindex, cols=cols)
-            it.return_traj_index = True
-            return _LaggedIterator(it, lag, return_trajindex, stride)
+        auto_chunksize = self._is_auto_chunksize(chunk if chunk is not None else self._default_chunksize)
+        if auto_chunksize:
+            chunk = self._auto_chunksize()
+        elif chunk is None:
+            chunk = self.default_chunksize
+        elif self._is_auto_chunksize(self._default_chunksize) and chunk == self._auto_chunksize():
+            # estimators and transformers pass the current automatic chunksize of their source.
+            auto_chunksize = True
+        # a single pass over the data with a stride dividing lag and stride reads at most twice
+        # as many frames as the two iterators of _LegacyLaggedIterator.
+        step = gcd(lag, stride) if lag > 0 and is_int(stride) else 0
+        if step > 0 and 2 * step >= stride:
+            it = self._create_iterator(skip=skip, chunk=chunk * (stride // step), stride=step,
+                                       return_trajindex=True, cols=cols)
+            # an output chunk is made of the frames of one chunk of the underlying iterator.
+            timed_it, frames_per_output = it, stride // step
+            it = _LaggedIterator(it, lag, return_trajindex, stride)
         elif lag > 0:
             it = self._create_iterator(skip=skip, chunk=chunk, stride=stride,
                                        return_trajindex=return_trajindex, cols=cols)
             it.return_traj_index = True
             it_lagged = self._create_iterator(skip=skip + lag, chunk=chunk, stride=stride,
                                               return_trajindex=True, cols=cols)
-            return _LegacyLaggedIterator(it, it_lagged, return_trajindex)
-        return self._create_iterator(skip=skip, chunk=chunk, stride=stride,
-                                     return_trajindex=return_trajindex, cols=cols)
-
-    def get_output(self, dimensions=slice(0, None), stride=1, skip=0, chunk=None):
+            # only the first iterator is timed, the lagged one reads as many frames.
+            timed_it, frames_per_output = it, 2
+            it = _LegacyLaggedIterator(it, it_lagged, return_trajindex)
+        else:
+            it = self._create_iterator(skip=skip, chunk=chunk, stride=stride,
+                                       return_trajindex=return_trajindex, cols=cols)
+            timed_it, frames_per_output = it, 1
+        if auto_chunksize and chunk > 0:
+            # the first chunks are timed to adapt the chunksize of following iterations.
+            timed_it._auto_tune_chunks = self._AUTO_TUNE_CHUNKS
+            timed_it._auto_tune_frames_per_output = frames_per_output
+        if prefetch > 0:
+            # resolve the file infos in the calling thread, before chunks are read in the background.
+            self.trajectory_lengths()
+            it = _PrefetchIterator(it, prefetch)
+        return it
+
+    def get_output(self, dimensions=slice(0, None), stride=1, skip=0, chunk=None, out=None, memmap_dir=None):
         """Maps all input data of this transformer and returns it as an array or list of arrays
 
         Parameters
@@ -174,13 +279,20 @@ class Iterable(six.with_metaclass(ABCMeta, ProgressReporter, Loggable)):
         chunk: int, default=None
             How many frames to process at once. If not given obtain the chunk size
             from the source.
+        out : list of ndarray(T_i, d), optional
+            arrays (eg. memory maps) to write the output of each trajectory to.
+        memmap_dir : str, optional
+            if given, the output of each trajectory is written to a memory mapped .npy file, which is
+            created in this directory. The caller is responsible to remove these files.
 
         Returns
         -------
         output : list of ndarray(T_i, d)
            the mapped data, where T is the number of time steps of the input data, or if stride > 1,
            floor(T_in / stride). d is the output dimension of this transformer.
-           If the input consists of a list of trajectories, Y will also be a corresponding list of trajectories
+           If the input consists of a list of trajectories, Y will also be a corresponding list of trajectories.
+           If out was given, it is returned. With memmap_dir, the arrays are of type numpy.memmap and
+           can be passed to pyemma.coordinates.source without copying them into memory.
 
         """
         if isinstance(dimensions, int):
@@ -208,15 +320,23 @@ class Iterable(six.with_metaclass(ABCMeta, ProgressReporter, Loggable)):
             it = self._create_iterator(skip=skip, chunk=chunk, stride=stride, return_trajindex=True)
 
         with it:
-            # allocate memory
-            try:
-                # TODO: avoid having a copy here, if Y is already filled
-                trajs = [np.empty((l, ndim), dtype=self.output_type())
-                         for l in it.trajectory_lengths()]
-            except MemoryError:
-                self._logger.exception("Could not allocate enough memory to map all data."
-                                       " Consider using a larger stride.")
-                return
+            shapes = [(l, ndim) for l in it.trajectory_lengths()]
+            if out is not None:
+                if [np.shape(y) for y in out] != shapes:
+                    raise ValueError("shapes of out (%s) do not match the shapes of the output (%s)"
+                                     % ([np.shape(y) for y in out], shapes))
+                trajs = out
+            elif memmap_dir is not None:
+                trajs = [self._open_output_memmap(memmap_dir, itraj, shape) for itraj, shape in enumerate(shapes)]
+            else:
+                # allocate memory
+                try:
+                    # TODO: avoid having a copy here, if Y is already filled
+                    trajs = [np.empty(shape, dtype=self.output_type()) for shape in shapes]
+                except MemoryError:
+                    self._logger.exception("Could not allocate enough memory to map all data."
+                                           " Consider using a larger stride or the memmap_dir argument.")
+                    return
 
             if self._logger_is_active(self._loglevel_DEBUG):
                 self._logger.debug("get_output(): dimensions=%s" % str(dimensions))
@@ -235,8 +355,21 @@ class Iterable(six.with_metaclass(ABCMeta, ProgressReporter, Loggable)):
                 # update progress
                 self._progress_update(1, stage=1)
 
+        if memmap_dir is not None and out is None:
+            for y in trajs:
+                if isinstance(y, np.memmap):
+                    y.flush()
         return trajs
 
+    def _open_output_memmap(self, memmap_dir, itraj, shape):
+        if shape[0] == 0:
+            # older numpy versions can not map empty files
+            return np.empty(shape, dtype=self.output_type())
+        fd, filename = tempfile.mkstemp(suffix='.npy', prefix='%s_traj%i_' % (self.__class__.__name__, itraj),
+                                        dir=memmap_dir)
+        os.close(fd)
+        return np.lib.format.open_memmap(filename, mode='w+', dtype=self.output_type(), shape=shape)
+
     def write_to_csv(self, filename=None, extension='.dat', overwrite=False,
                      stride=1, chunksize=100, **kw):
         """ write all data to csv with numpy.savetxt
@@ -328,6 +461,63 @@ class Iterable(six.with_metaclass(ABCMeta, ProgressReporter, Loggable)):
             f.close()
         self._progress_force_finish(0)
 
+    def write_to_store(self, path, stride=1, skip=0, chunksize=None, compression=None,
+                       block_size=4096, overwrite=False):
+        """ write all data to a binary store, which can be read again with a
+        :class:`StoreReader <pyemma.coordinates.data.store_reader.StoreReader>`.
+
+        The data is written chunk by chunk, so it does not need to fit into memory. The
+        trajectories are stored column-major, so the store supports random access and
+        reading selected columns without reading the other ones.
+
+        Parameters
+        ----------
+        path : str
+            directory of the store, it is created if it does not exist.
+        stride : int
+            omit every n'th frame
+        skip : int
+            skip the first n frames of every trajectory
+        chunksize: int, optional
+            how many frames to process at once
+        compression : None or 'zlib', default=None
+            if None, the trajectories are memory mapped when reading. Otherwise blocks of
+            block_size frames are compressed column-wise.
+        block_size : int, default=4096
+            number of frames compressed at once.
+        overwrite : bool, optional, default=False
+            shall an existing store be overwritten? If it exists, this method will raise.
+
+        Returns
+        -------
+        reader : StoreReader
+            reader of the written store.
+
+        Example
+        -------
+        >>> import numpy as np, pyemma
+        >>> import os
+        >>> from pyemma.util.files import TemporaryDirectory
+        >>> from pyemma.util.contexts import settings
+        >>> data = [np.random.random((10,3))] * 3
+        >>> reader = pyemma.coordinates.source(data)
+        >>> with TemporaryDirectory() as td, settings(show_progress_bars=False):
+        ...    stored = reader.write_to_store(os.path.join(td, 'store'))
+        ...    np.testing.assert_equal(stored.get_output()[0], data[0])
+        ...    print(stored.ra_itraj_cuboid[:, 2:4, 1].shape)
+        (3, 2)
+        """
+        from pyemma.coordinates.data.store_reader import StoreReader, StoreWriter
+        writer = StoreWriter(path, self.trajectory_lengths(stride=stride, skip=skip), self.ndim,
+                             compression=compression, block_size=block_size, overwrite=overwrite)
+        with writer, self.iterator(stride, chunk=chunksize, return_trajindex=True, skip=skip) as it:
+            self._progress_register(it.n_chunks, "saving to store")
+            for itraj, X in it:
+                writer.append(itraj, X)
+                self._progress_update(1, 0)
+        self._progress_force_finish(0)
+        return StoreReader(path)
+
     @abstractmethod
     def _create_iterator(self, skip=0, chunk=0, stride=1, return_trajindex=True, cols=None):
         """
@@ -348,15 +538,60 @@ class Iterable(six.with_metaclass(ABCMeta, ProgressReporter, Loggable)):
         return self.iterator()
 
 
+class _RingBuffer(object):
+    """ _RingBuffer holds the last frames of a trajectory, addressed by their position modulo the capacity.
+
+    If the buffer would exceed max_size bytes, it is backed by a memory map on a temporary file.
+
+    Parameters
+    ----------
+    capacity: int
+        number of frames to keep.
+    ndim: int
+        dimension of a frame.
+    dtype: numpy.dtype
+    max_size: int
+        maximum size in bytes to keep in memory.
+    """
+    def __init__(self, capacity, ndim, dtype, max_size):
+        self.capacity = capacity
+        self._file = None
+        shape = (capacity, ndim)
+        if capacity * ndim * np.dtype(dtype).itemsize > max_size:
+            self._file = tempfile.TemporaryFile(prefix='pyemma_lagged_')
+            self.data = np.memmap(self._file, dtype=dtype, mode='w+', shape=shape)
+        else:
+            self.data = np.empty(shape, dtype=dtype)
+
+    def get(self, positions):
+        return self.data[positions % self.capacity]
+
+    def put(self, start, X):
+        """ stores the frames X, which start at the given position of the trajectory. """
+        if len(X) > self.capacity:
+            start += len(X) - self.capacity
+            X = X[-self.capacity:]
+        self.data[(start + np.arange(len(X))) % self.capacity] = X
+
+    def close(self):
+        if self._file is not None:
+            del self.data
+            self._file.close()
+            self._file = None
+
+
 class _LaggedIterator(object):
-    """ _LaggedIterator
+    """ _LaggedIterator builds time-lagged chunks while reading every frame only once.
 
-    avoids double IO, by switching the chunksize on the given Iterable instance and
-    remember an overlap.
+    The given iterator streams with a stride dividing both the lag time and the actual stride. The frames
+    needed as instantaneous data for later time-lagged frames are kept in a ring buffer of lag frames, so
+    the lag time is not limited by the chunk size. As before, every chunk of a trajectory but the last
+    contains chunksize time-lagged frames, counted from the first time-lagged frame.
 
     Parameters
     ----------
-    it: instance of Iterable (stride=1)
+    it: DataSourceIterator (return_trajindex=True)
+        iterator with a stride dividing lag and actual_stride.
     lag : int
         lag time
     actual_stride: int
@@ -364,22 +599,39 @@ class _LaggedIterator(object):
     return_trajindex: bool
         whether to return the current trajectory index during iteration (itraj).
     """
+    MAX_BUFFER_SIZE = 256 * 1024**2
+
     def __init__(self, it, lag, return_trajindex, actual_stride):
+        assert is_int(lag)
         self._it = it
         self._lag = lag
-        assert is_int(lag)
         self._return_trajindex = return_trajindex
-        self._overlap = None
         self._actual_stride = actual_stride
-        self._sufficently_long_trajectories = [i for i, x in
-                                               enumerate(self._it._data_source.trajectory_lengths(1, 0))
-                                               if x > lag]
+        step = it.stride
+        assert lag % step == 0 and actual_stride % step == 0
+        # lag and stride in units of the underlying stride.
+        self._lag_steps = lag // step
+        self._stride_steps = actual_stride // step
+        self._buffer = None
+        self._itraj = None
+        self._pos = 0
+        # time-lagged pairs of the current trajectory, which have not been returned yet.
+        self._pending = []
+        self._n_pending = 0
+        self._traj_done = False
+        # chunk of the next trajectory, read while pairs of the current one were pending.
+        self._lookahead = None
+
+    @property
+    def _chunksize(self):
+        return self._it.chunksize // self._stride_steps
 
     @property
     def n_chunks(self):
-        cs = self._it.chunksize
-        n1 = self._it._data_source.n_chunks(cs, stride=self._actual_stride, skip=self._lag)
-        n2 = self._it._data_source.n_chunks(cs, stride=self._actual_stride, skip=0)
+        cs = self._chunksize
+        skip = self._it.skip
+        n1 = self._it._data_source.n_chunks(cs, stride=self._actual_stride, skip=skip + self._lag)
+        n2 = self._it._data_source.n_chunks(cs, stride=self._actual_stride, skip=skip)
         return min(n1, n2)
 
     def __len__(self):
@@ -394,51 +646,85 @@ class _LaggedIterator(object):
         return self.next()
 
     def next(self):
-        itraj_changed = False
-        while (self._it._itraj not in self._sufficently_long_trajectories
-               and self._it.number_of_trajectories() > self._it.current_trajindex):
-            self._it._itraj += 1
-            self._overlap = None
-            itraj_changed = True
-        # ensure file next handle gets opened.
-        if itraj_changed:
-            self._it._select_file(self._it._itraj)
-
-        if self._overlap is None:
-            with attribute(self._it, 'chunksize', self._lag):
-                _, self._overlap = self._it.next()
-                self._overlap = self._overlap[::self._actual_stride]
-
-        with attribute(self._it, 'chunksize', self._it.chunksize * self._actual_stride):
-
-            itraj, data_lagged = self._it.next()
-            frag = data_lagged[:min(self._it.chunksize - self._lag, len(data_lagged)), :]
-            data = np.concatenate((self._overlap, frag[(self._actual_stride - self._lag)
-                                                       % self._actual_stride::self._actual_stride]), axis=0)
-
-            offset = min(self._it.chunksize - self._lag, len(data_lagged))
-            self._overlap = data_lagged[offset::self._actual_stride, :]
-
-            data_lagged = data_lagged[::self._actual_stride]
-
-        if self._it._last_chunk_in_traj:
-            self._overlap = None
-
-        if data.shape[0] > data_lagged.shape[0]:
-            # data chunk is bigger, truncate it to match data_lagged's shape
-            data = data[:data_lagged.shape[0]]
-        elif data.shape[0] < data_lagged.shape[0]:
-            raise RuntimeError("chunk was smaller than time-lagged chunk (%s < %s), that should not happen!"
-                               % (data.shape[0], data_lagged.shape[0]))
-
+        while not self._ready():
+            if self._lookahead is not None:
+                itraj, chunk, last_in_traj = self._lookahead
+                self._lookahead = None
+            else:
+                try:
+                    itraj, chunk = self._it.next()
+                except StopIteration:
+                    if self._n_pending == 0:
+                        raise
+                    self._traj_done = True
+                    break
+                last_in_traj = self._it.last_chunk_in_traj
+            if itraj != self._itraj and self._n_pending > 0:
+                self._lookahead = (itraj, chunk, last_in_traj)
+                self._traj_done = True
+                break
+            self._add(itraj, chunk)
+            self._traj_done = last_in_traj
+        return self._emit()
+
+    def _ready(self):
+        cs = self._chunksize
+        return self._n_pending > 0 and (self._traj_done or 0 < cs <= self._n_pending)
+
+    def _add(self, itraj, chunk):
+        """ adds the time-lagged pairs of the given chunk to the pending ones. """
+        lag, stride = self._lag_steps, self._stride_steps
+        if itraj != self._itraj:
+            self._itraj = itraj
+            self._pos = 0
+        start, n = self._pos, len(chunk)
+        self._pos += n
+        if self._buffer is None:
+            self._buffer = _RingBuffer(lag, chunk.shape[1], chunk.dtype, self.MAX_BUFFER_SIZE)
+
+        # positions of the time-lagged frames within the current chunk (lag + k * stride).
+        first = lag + max(0, -(-(start - lag) // stride)) * stride
+        lagged_pos = np.arange(first, start + n, stride)
+        if len(lagged_pos) > 0:
+            data_lagged = chunk[lagged_pos - start]
+            pos = lagged_pos - lag
+            in_chunk = pos >= start
+            data = np.empty_like(data_lagged)
+            data[in_chunk] = chunk[pos[in_chunk] - start]
+            data[~in_chunk] = self._buffer.get(pos[~in_chunk])
+            self._pending.append((data, data_lagged))
+            self._n_pending += len(data)
+        self._buffer.put(start, chunk)
+
+    def _emit(self):
+        """ returns the next chunksize pending pairs, or all of them at the end of the trajectory. """
+        if len(self._pending) == 1:
+            data, data_lagged = self._pending[0]
+        else:
+            data = np.concatenate([p[0] for p in self._pending])
+            data_lagged = np.concatenate([p[1] for p in self._pending])
+        cs = self._chunksize
+        if 0 < cs < len(data):
+            self._pending = [(data[cs:], data_lagged[cs:])]
+            data, data_lagged = data[:cs], data_lagged[:cs]
+        else:
+            self._pending = []
+        self._n_pending -= len(data)
         if self._return_trajindex:
-            return itraj, data, data_lagged
+            return self._itraj, data, data_lagged
         return data, data_lagged
 
+    def close(self):
+        if self._buffer is not None:
+            self._buffer.close()
+            self._buffer = None
+
     def __enter__(self):
         self._it.__enter__()
+        return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
         self._it.__exit__(exc_type, exc_val, exc_tb)
 
 
@@ -497,3 +783,131 @@ class _LegacyLaggedIterator(object):
     def __exit__(self, exc_type, exc_val, exc_tb):
         self._it.__exit__(exc_type, exc_val, exc_tb)
         self._it_lagged.__exit__(exc_type, exc_val, exc_tb)
+
+
+class _PrefetchIterator(object):
+    """ _PrefetchIterator reads the chunks of the given iterator in a background thread.
+
+    The chunks are handed over in their original order through a queue of bounded size, together
+    with the state of the iterator (trajectory index, position) right after the chunk was read.
+    Exceptions raised while reading are re-raised in the consuming thread. All other attributes are
+    taken from the wrapped iterator.
+
+    Parameters
+    ----------
+    it: DataSourceIterator, _LaggedIterator or _LegacyLaggedIterator
+    prefetch: int
+        maximum number of chunks read ahead.
+    """
+    _STATE_ATTRS = ('pos', 'current_trajindex', 'last_chunk', 'last_chunk_in_traj')
+    _END = object()
+    _ERROR = object()
+
+    def __init__(self, it, prefetch):
+        self._it = it
+        self._prefetch = prefetch
+        self._queue = queue.Queue(maxsize=prefetch)
+        self._stop = threading.Event()
+        self._thread = None
+        self._state = {}
+        self._exhausted = False
+
+    def __getattr__(self, name):
+        # only invoked for attributes not found on this instance.
+        state = self.__dict__.get('_state', {})
+        if name in state:
+            return state[name]
+        return getattr(self.__dict__['_it'], name)
+
+    def __setattr__(self, name, value):
+        if name.startswith('_'):
+            object.__setattr__(self, name, value)
+        elif self._thread is not None:
+            raise RuntimeError('can not set "%s" while chunks are being prefetched.' % name)
+        else:
+            setattr(self._it, name, value)
+
+    def _put(self, item):
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def _produce(self):
+        try:
+            while not self._stop.is_set():
+                try:
+                    X = self._it.next()
+                except StopIteration:
+                    self._put((self._END, None))
+                    return
+                state = {}
+                for name in self._STATE_ATTRS:
+                    try:
+                        state[name] = getattr(self._it, name)
+                    except AttributeError:
+                        pass
+                self._put((X, state))
+        except BaseException:
+            self._put((self._ERROR, sys.exc_info()))
+
+    def _start(self):
+        self._thread = threading.Thread(target=self._produce, name='pyemma prefetch')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _shutdown(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        # unblock the producer, in case it waits for a free slot.
+        while True:
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                break
+        self._thread.join()
+        self._thread = None
+        self._stop.clear()
+        self._queue = queue.Queue(maxsize=self._prefetch)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return self.next()
+
+    def next(self):
+        if self._exhausted:
+            raise StopIteration
+        if self._thread is None:
+            self._start()
+        X, state = self._queue.get()
+        if X is self._END:
+            self._exhausted = True
+            raise StopIteration
+        if X is self._ERROR:
+            self._exhausted = True
+            six.reraise(*state)
+        self._state = state
+        return X
+
+    def reset(self):
+        self._shutdown()
+        self._it.reset()
+        self._state = {}
+        self._exhausted = False
+
+    def close(self):
+        self._shutdown()
+        self._it.close()
+
+    def __enter__(self):
+        self._it.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._shutdown()
+        return self._it.__exit__(exc_type, exc_val, exc_tb)
@@ -61,6 +61,9 @@ class StreamingEstimator(Estimator):
 
     @chunksize.setter
     def chunksize(self, size):
+        if Iterable._is_auto_chunksize(size):
+            self._chunksize = size
+            return
         if not size >= 0:
             raise ValueError("chunksize has to be positive")
 
@@ -114,7 +114,7 @@ class StreamingTransformer(Transformer, DataSource, NotifyOnChangesMixIn):
 
     Parameters
     ----------
-    chunksize : int (optional)
+    chunksize : int or 'auto' (optional)
         the chunksize used to batch process underlying data.
 
     """
@@ -180,11 +180,12 @@ class StreamingTransformer(Transformer, DataSource, NotifyOnChangesMixIn):
         return StreamingTransformerIterator(self, skip=skip, chunk=chunk, stride=stride,
                                             return_trajindex=return_trajindex, cols=cols)
 
-    def get_output(self, dimensions=slice(0, None), stride=1, skip=0, chunk=None):
+    def get_output(self, dimensions=slice(0, None), stride=1, skip=0, chunk=None, out=None, memmap_dir=None):
         if not self._estimated:
             self.estimate(self.data_producer, stride=stride)
 
-        return super(StreamingTransformer, self).get_output(dimensions, stride, skip, chunk)
+        return super(StreamingTransformer, self).get_output(dimensions, stride, skip, chunk,
+                                                            out=out, memmap_dir=memmap_dir)
 
     @deprecated('use fit or estimate')
     def parametrize(self, stride=1):
@@ -204,11 +205,24 @@ class StreamingTransformer(Transformer, DataSource, NotifyOnChangesMixIn):
 
     @chunksize.setter
     def chunksize(self, size):
+        if self._is_auto_chunksize(size):
+            # the chunksize of iterators over this transformer is adapted to all stages of the pipeline.
+            self._default_chunksize = size
+            self._tuned_chunksize = None
+            self.data_producer.chunksize = size
+            return
         if not size >= 0:
             raise ValueError("chunksize has to be positive")
 
         self.data_producer.chunksize = int(size)
 
+    def _bytes_per_frame(self):
+        # chunks pass all stages of the pipeline, so the largest frame determines the size of an automatic chunk.
+        bytes_per_frame = super(StreamingTransformer, self)._bytes_per_frame()
+        if self.data_producer is not None:
+            bytes_per_frame = max(bytes_per_frame, self.data_producer._bytes_per_frame())
+        return bytes_per_frame
+
     def number_of_trajectories(self):
         return self.data_producer.number_of_trajectories()
 
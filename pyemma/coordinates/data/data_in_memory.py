@@ -19,7 +19,6 @@
 from __future__ import absolute_import
 
 import functools
-import numbers
 
 import numpy as np
 
@@ -141,7 +140,45 @@ class DataInMemory(DataSource):
         return "[DataInMemory array shapes: %s]" % [np.shape(x) for x in self.data]
 
 
-class DataInMemoryCuboidRandomAccessStrategy(RandomAccessStrategy):
+def _map_to_traj_indices(frames, cumsum):
+    """ maps the given linear frame indices to arrays of trajectory indices and frame indices within these
+    trajectories, where cumsum are the cumulative trajectory lengths. """
+    frames = np.asarray(frames, dtype=int)
+    out_of_bounds = (frames < 0) | (frames >= cumsum[-1])
+    if np.any(out_of_bounds):
+        raise ValueError("Requested index %s was out of bounds [0,%s)" % (frames[out_of_bounds][0], cumsum[-1]))
+    itrajs = np.searchsorted(cumsum, frames, side='right')
+    offsets = cumsum - np.diff(np.concatenate(([0], cumsum)))
+    return itrajs, frames - offsets[itrajs]
+
+
+class DataInMemoryRandomAccessStrategy(RandomAccessStrategy):
+    """ base class of the random access strategies of sources, which hold their trajectories as (array like) data. """
+
+    def _trajectory_data(self, itraj):
+        return self._source.data[itraj]
+
+    def _select(self, itraj, frames, dims):
+        """ returns the given frames (index array) and dims (index array) of trajectory itraj. """
+        data = self._trajectory_data(itraj)
+        if isinstance(data, np.ndarray):
+            return data[np.ix_(frames, dims)]
+        # array like trajectories select frames and dims independently of each other.
+        return data[frames, dims]
+
+    def _gather(self, itrajs, frames, dims):
+        """ returns the frames (index array) of the trajectories itrajs (index array of same length) as one array,
+        reading all requested frames of a trajectory at once and in ascending order. """
+        data = np.empty((len(frames), len(dims)), dtype=self._source.output_type())
+        order = np.lexsort((frames, itrajs))
+        bounds = np.flatnonzero(np.diff(itrajs[order])) + 1
+        for group in np.split(order, bounds):
+            if len(group) > 0:
+                data[group] = self._select(itrajs[group[0]], frames[group], dims)
+        return data
+
+
+class DataInMemoryCuboidRandomAccessStrategy(DataInMemoryRandomAccessStrategy):
     def _handle_slice(self, idx):
         idx = np.index_exp[idx]
         itrajs, frames, dims = None, None, None
@@ -157,24 +194,22 @@ class DataInMemoryCuboidRandomAccessStrategy(RandomAccessStrategy):
         return self._get_itraj_random_accessible(itrajs, frames, dims)
 
     def _get_itraj_random_accessible(self, itrajs, frames, dims):
-        dims = [dims] if isinstance(dims, numbers.Integral) else dims
         itrajs = self._get_indices(itrajs, self._source.ntraj)
         frames = self._get_indices(frames, min(self._source.trajectory_lengths(1, 0)[itrajs]))
-        if isinstance(dims, (list, tuple)):
-            return np.array(
-                    [self._source.data[itraj][frames] for itraj in itrajs],
-                    dtype=self._source.output_type()
-            )[:, :, dims]
-        return np.array([self._source.data[itraj][frames, dims] for itraj in itrajs], dtype=self._source.output_type())
+        dims = np.atleast_1d(np.arange(self._source.ndim)[dims])
+        data = np.empty((len(itrajs), len(frames), len(dims)), dtype=self._source.output_type())
+        for i, itraj in enumerate(itrajs):
+            data[i] = self._select(itraj, frames, dims)
+        return data
 
 
 class DataInMemoryJaggedRandomAccessStrategy(DataInMemoryCuboidRandomAccessStrategy):
     def _get_itraj_random_accessible(self, itrajs, frames, dims):
         itrajs = self._get_indices(itrajs, self._source.ntraj)
-        return [self._source.data[itraj][frames, dims] for itraj in itrajs]
+        return [self._trajectory_data(itraj)[frames, dims] for itraj in itrajs]
 
 
-class DataInMemoryLinearRandomAccessStrategy(RandomAccessStrategy):
+class DataInMemoryLinearRandomAccessStrategy(DataInMemoryRandomAccessStrategy):
     def _handle_slice(self, idx):
         idx = np.index_exp[idx]
         frames, dims = None, None
@@ -191,16 +226,8 @@ class DataInMemoryLinearRandomAccessStrategy(RandomAccessStrategy):
             frames = self._get_indices(frames, cumsum[-1])
         dims = self._get_indices(dims, self._source.ndim)
 
-        nframes = len(frames)
-        ndims = len(dims)
-
-        data = np.empty((nframes, ndims), dtype=self._source.output_type())
-
-        from pyemma.coordinates.clustering import UniformTimeClustering
-        for i, x in enumerate(frames):
-            traj, idx = UniformTimeClustering._idx_to_traj_idx(x, cumsum)
-            data[i, :] = self._source.data[traj][idx, dims]
-        return data
+        itrajs, frames = _map_to_traj_indices(frames, cumsum)
+        return self._gather(itrajs, frames, dims)
 
 
 class DataInMemoryLinearItrajRandomAccessStrategy(DataInMemoryCuboidRandomAccessStrategy):
@@ -209,26 +236,13 @@ class DataInMemoryLinearItrajRandomAccessStrategy(DataInMemoryCuboidRandomAccess
         frames = self._get_indices(frames, sum(self._source.trajectory_lengths()[itrajs]))
         dims = self._get_indices(dims, self._source.ndim)
 
-        nframes = len(frames)
-        ndims = len(dims)
-
         if max(dims) > self._source.ndim:
             raise IndexError("Data only has %s dimensions, wanted to slice by dimension %s."
                              % (self._source.ndim, max(dims)))
 
         cumsum = np.cumsum(self._source.trajectory_lengths()[itrajs])
-        data = np.empty((nframes, ndims), dtype=self._source.output_type())
-
-        from pyemma.coordinates.clustering import UniformTimeClustering
-        for i, x in enumerate(frames):
-            traj, idx = self._map_to_absolute_traj_idx(UniformTimeClustering._idx_to_traj_idx(x, cumsum), itrajs)
-            data[i, :] = self._source.data[traj][idx, dims]
-
-        return data
-
-    @staticmethod
-    def _map_to_absolute_traj_idx(cumsum_idx, itrajs):
-        return itrajs[cumsum_idx[0]], cumsum_idx[1]
+        selected, frames = _map_to_traj_indices(frames, cumsum)
+        return self._gather(np.asarray(itrajs)[selected], frames, dims)
 
 
 class DataInMemoryIterator(DataSourceIterator):
@@ -242,6 +256,21 @@ class DataInMemoryIterator(DataSourceIterator):
     def close(self):
         pass
 
+    def _use_cols(self, X):
+        # the columns are selected in _select, before the frames are copied
+        return X
+
+    def _select(self, data, frames):
+        """ returns the given frames (slice or array of indices) of data restricted to the selected columns. """
+        cols = self.use_cols
+        if cols is None:
+            return data[frames]
+        if isinstance(cols, (list, tuple)):
+            cols = np.asarray(cols)
+        if isinstance(frames, slice):
+            return data[frames, cols]
+        return data[np.ix_(frames, np.arange(data.shape[1])[cols])]
+
     def _select_file(self, itraj):
         if itraj != self._selected_itraj:
             self._first_file_selected = True
@@ -262,24 +291,22 @@ class DataInMemoryIterator(DataSourceIterator):
         # complete trajectory mode
         if self.chunksize == 0:
             if not self.uniform_stride:
-                chunk = data[self.ra_indices_for_traj(self._itraj)]
+                chunk = self._select(data, self.ra_indices_for_traj(self._itraj))
                 self._itraj += 1
                 # skip trajs which are not included in stride
                 while self._itraj not in self.traj_keys and self._itraj < self.number_of_trajectories():
                     self._itraj += 1
             else:
-                chunk = data[skip::self.stride]
+                chunk = self._select(data, slice(skip, None, self.stride))
                 self._itraj += 1
             self._select_file(self._itraj)
             return chunk
         # chunked mode
         else:
             if not self.uniform_stride:
-                random_access_chunk = data[
-                    self.ra_indices_for_traj(self._itraj)[self._t:min(
-                            self._t + self.chunksize, self.ra_trajectory_length(self._itraj)
-                    )]
-                ]
+                random_access_chunk = self._select(data, self.ra_indices_for_traj(self._itraj)[self._t:min(
+                        self._t + self.chunksize, self.ra_trajectory_length(self._itraj)
+                )])
                 self._t += self.chunksize
                 if self._t >= self.ra_trajectory_length(self._itraj):
                     self._itraj += 1
@@ -296,7 +323,7 @@ class DataInMemoryIterator(DataSourceIterator):
             else:
                 upper_bound = min(skip + self._t + self.chunksize * self.stride, traj_len)
                 slice_x = slice(skip + self._t, upper_bound, self.stride)
-                chunk = data[slice_x]
+                chunk = self._select(data, slice_x)
 
                 self._t = upper_bound
 
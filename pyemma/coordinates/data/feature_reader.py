@@ -18,14 +18,19 @@
 
 from __future__ import absolute_import
 
+from collections import deque
+
 import mdtraj
 import numpy as np
 
+from pyemma._base.parallel import NJobsMixIn
 from pyemma.coordinates.data._base.datasource import DataSourceIterator, DataSource
 from pyemma.coordinates.data._base.random_accessible import RandomAccessStrategy
 from pyemma.coordinates.data.featurization.featurizer import MDFeaturizer
+from pyemma.coordinates.data.util.feature_cache import FeatureCache, featurizer_key
 from pyemma.coordinates.data.util.traj_info_cache import TrajInfo
 from pyemma.coordinates.util import patches
+from pyemma.util import config
 from pyemma.util.annotators import deprecated, fix_docs
 
 
@@ -34,7 +39,7 @@ __all__ = ['FeatureReader']
 
 
 @fix_docs
-class FeatureReader(DataSource):
+class FeatureReader(DataSource, NJobsMixIn):
     """
     Reads features from MD data.
 
@@ -55,6 +60,10 @@ class FeatureReader(DataSource):
     featurizer: MDFeaturizer
         a preconstructed featurizer
 
+    n_jobs: int or None, default=1
+        number of worker processes, which read and featurize frame ranges of the
+        trajectories in parallel. If None, all available CPUs will be used.
+
     Examples
     --------
     >>> from pyemma.datasets import get_bpti_test_data
@@ -84,11 +93,12 @@ class FeatureReader(DataSource):
     """
     SUPPORTED_RANDOM_ACCESS_FORMATS = (".h5", ".dcd", ".binpos", ".nc", ".xtc", ".trr")
 
-    def __init__(self, trajectories, topologyfile=None, chunksize=1000, featurizer=None):
+    def __init__(self, trajectories, topologyfile=None, chunksize=1000, featurizer=None, n_jobs=1):
         assert (topologyfile is not None) or (featurizer is not None), \
             "Needs either a topology file or a featurizer for instantiation"
 
         super(FeatureReader, self).__init__(chunksize=chunksize)
+        self.n_jobs = n_jobs
         self._is_reader = True
         self.topfile = topologyfile
         self.filenames = trajectories
@@ -137,6 +147,9 @@ class FeatureReader(DataSource):
         return TrajInfo(ndim, length, offsets)
 
     def _create_iterator(self, skip=0, chunk=0, stride=1, return_trajindex=True, cols=None):
+        if self.n_jobs > 1 and not self._return_traj_obj and DataSourceIterator.is_uniform_stride(stride):
+            return FeatureReaderParallelIterator(self, skip=skip, chunk=chunk, stride=stride,
+                                                 return_trajindex=return_trajindex, cols=cols)
         return FeatureReaderIterator(self, skip=skip, chunk=chunk, stride=stride,
                                      return_trajindex=return_trajindex, cols=cols)
 
@@ -300,13 +313,16 @@ class FeatureReaderLinearRandomAccessStrategy(RandomAccessStrategy):
 
 class FeatureReaderIterator(DataSourceIterator):
     def __init__(self, data_source, skip=0, chunk=0, stride=1, return_trajindex=False, cols=None):
-        # TODO: optimize cols access (eg. omit features, before calculating em
         super(FeatureReaderIterator, self).__init__(
                 data_source, skip=skip, chunk=chunk, stride=stride,
                 return_trajindex=return_trajindex,
                 cols=cols
         )
         self._selected_itraj = -1
+        self._featurizer_key = self._get_featurizer_key()
+        self._cached = None
+        self._cache_key = None
+        self._cache_writer = None
         self._select_file(0)
 
     @property
@@ -328,10 +344,21 @@ class FeatureReaderIterator(DataSourceIterator):
         self.state.skip = value
         if hasattr(self, '_mditer'):
             self._mditer._skip = value
+        if getattr(self, '_featurizer_key', None) is not None:
+            # the cache entry depends on skip % stride
+            self._open_feature_cache()
+
+    def _use_cols(self, X):
+        # the columns are selected during featurization
+        return X
 
     def close(self):
         if hasattr(self, '_mditer') and self._mditer is not None:
             self._mditer.close()
+        if getattr(self, '_cache_writer', None) is not None:
+            # trajectory has not been read completely
+            self._cache_writer.discard()
+            self._cache_writer = None
 
     def _select_file(self, itraj):
         if itraj != self._selected_itraj:
@@ -340,6 +367,26 @@ class FeatureReaderIterator(DataSourceIterator):
             self._itraj = itraj
             self._selected_itraj = itraj
             self._create_mditer()
+            self._open_feature_cache()
+
+    def _get_featurizer_key(self):
+        if (not config.use_feature_cache or self._data_source._return_traj_obj
+                or not self.uniform_stride or FeatureCache.instance() is None):
+            return None
+        return featurizer_key(self._data_source.featurizer)
+
+    def _open_feature_cache(self):
+        self._cached = None
+        self._cache_key = None
+        if self._featurizer_key is None or self._itraj >= self._data_source.ntraj:
+            return
+        cache = FeatureCache.instance()
+        try:
+            self._cache_key = cache.key(self._data_source.filenames[self._itraj], self._featurizer_key,
+                                        self.stride, self.skip)
+        except EnvironmentError:
+            return
+        self._cached = cache.get(self._cache_key)
 
     def _next_chunk(self):
         """
@@ -348,6 +395,12 @@ class FeatureReaderIterator(DataSourceIterator):
 
         :return: a feature mapped vector X, or (X, Y) if lag > 0
         """
+        if self._cached is not None:
+            return self._next_cached_chunk()
+
+        # only complete feature vectors are stored
+        if self._t == 0 and self._cache_key is not None and self.skip < self.stride and self.use_cols is None:
+            self._cache_writer = FeatureCache.instance().writer(self._cache_key, self.trajectory_length())
         try:
             chunk = next(self._mditer)
         except StopIteration as si:
@@ -361,10 +414,51 @@ class FeatureReaderIterator(DataSourceIterator):
             else:
                 raise
 
-        shape = chunk.xyz.shape
+        # 3 cases:
+        # --------
+        # 1. raw mdtraj.Trajectory objects
+        # 2. plain reshaped coordinates
+        # 3. extracted features
+        if self._data_source._return_traj_obj:
+            res = chunk
+        else:
+            res = _featurize(self._data_source.featurizer, chunk, self.use_cols)
+
+        self._t += chunk.xyz.shape[0]
+        if self._cache_writer is not None:
+            self._cache_writer.append(res)
+            if self._t >= self.trajectory_length():
+                self._cache_writer.commit()
+                self._cache_writer = None
 
-        self._t += shape[0]
+        self._advance()
+        return res
 
+    def _next_cached_chunk(self):
+        traj_len = self.trajectory_length()
+        if traj_len <= 0:
+            # too short trajectory
+            if self._itraj < self._data_source.ntraj - 1:
+                self._itraj += 1
+                self._select_file(self._itraj)
+                return ()
+            raise StopIteration("too short trajectory")
+        if self._t >= traj_len:
+            raise StopIteration("eof")
+        n = traj_len - self._t
+        if self.chunksize > 0:
+            n = min(n, self.chunksize)
+        start = self.skip // self.stride + self._t
+        if self.use_cols is not None:
+            res = self._cached[start:start + n][:, self.use_cols]
+        else:
+            res = np.array(self._cached[start:start + n])
+        self._t += n
+        self._advance()
+        return res
+
+    def _advance(self):
+        # select the next file, if the current one has been read completely.
         if self._t >= self.trajectory_length() and self._itraj < len(self._data_source.filenames) - 1:
             self._itraj += 1
             self._select_file(self._itraj)
@@ -376,29 +470,15 @@ class FeatureReaderIterator(DataSourceIterator):
         if self._t >= traj_len and self._itraj == len(self._data_source.filenames) - 1:
             self.close()
 
-        # 3 cases:
-        # --------
-        # 1. raw mdtraj.Trajectory objects
-        # 2. plain reshaped coordinates
-        # 3. extracted features
-        if self._data_source._return_traj_obj:
-            res = chunk
-        else:
-            # map data
-            if len(self._data_source.featurizer.active_features) == 0:
-                shape_2d = (shape[0], shape[1] * shape[2])
-                res = chunk.xyz.reshape(shape_2d)
-            else:
-                res = self._data_source.featurizer.transform(chunk)
-        return res
-
     def _create_mditer(self):
         if not self.uniform_stride:
             while self._itraj not in self.traj_keys and self._itraj < self.number_of_trajectories():
                 self._itraj += 1
             if self._itraj < self._data_source.ntraj:
+                offsets = self._data_source._trajectory_offsets(self._itraj)
                 self._mditer = self._create_patched_iter(
-                        self._data_source.filenames[self._itraj], stride=self.ra_indices_for_traj(self._itraj)
+                        self._data_source.filenames[self._itraj], stride=self.ra_indices_for_traj(self._itraj),
+                        offsets=offsets if len(offsets) > 0 else None
                 )
         else:
             self._mditer = self._create_patched_iter(
@@ -406,7 +486,149 @@ class FeatureReaderIterator(DataSourceIterator):
             )
         self._closed = False
 
-    def _create_patched_iter(self, filename, skip=0, stride=1, atom_indices=None):
+    def _create_patched_iter(self, filename, skip=0, stride=1, atom_indices=None, offsets=None):
         return patches.iterload(filename, chunk=self.chunksize, top=self._data_source.featurizer.topology,
-                                skip=skip, stride=stride, atom_indices=atom_indices)
+                                skip=skip, stride=stride, atom_indices=atom_indices, offsets=offsets)
+
+
+
+def _featurize(featurizer, chunk, cols=None):
+    # map data
+    if len(featurizer.active_features) == 0:
+        shape = chunk.xyz.shape
+        X = chunk.xyz.reshape((shape[0], shape[1] * shape[2]))
+        return X if cols is None else X[:, cols]
+    return featurizer.transform(chunk, cols=cols)
+
+
+# featurizer of a worker process, set once per process by _init_featurize_worker.
+_worker_featurizer = None
 
+
+def _init_featurize_worker(featurizer):
+    global _worker_featurizer
+    _worker_featurizer = featurizer
+
+
+def _featurize_frame_range(filename, skip, stride, n_frames, offsets, cols):
+    """ reads n_frames (strided) frames starting at frame skip and computes the given columns of their features."""
+    # depending on the format, a chunk of iterload contains chunk or chunk * stride strided frames,
+    # so we read chunks of n_frames / stride until we have got n_frames frames.
+    it = patches.iterload(filename, chunk=-(-n_frames // stride), top=_worker_featurizer.topology,
+                          skip=skip, stride=stride, offsets=offsets)
+    chunks = []
+    n = 0
+    with it:
+        for chunk in it:
+            chunks.append(chunk)
+            n += len(chunk)
+            if n >= n_frames:
+                break
+    chunk = chunks[0] if len(chunks) == 1 else mdtraj.join(chunks, check_topology=False)
+    return _featurize(_worker_featurizer, chunk[:n_frames], cols)
+
+
+class FeatureReaderParallelIterator(DataSourceIterator):
+    """ reads and featurizes the chunks of a FeatureReader in a pool of :attr:`FeatureReader.n_jobs` processes.
+
+    Each chunk is a frame range of a trajectory, which is opened and featurized by a worker process on its own.
+    The frames are returned in the same order as by :class:`FeatureReaderIterator`, but each chunk contains
+    exactly chunksize (strided) frames, regardless of the trajectory format. At most two chunks per
+    worker are read ahead; changing chunksize or skip during iteration discards these.
+    """
+    def __init__(self, data_source, skip=0, chunk=0, stride=1, return_trajindex=False, cols=None):
+        super(FeatureReaderParallelIterator, self).__init__(
+                data_source, skip=skip, chunk=chunk, stride=stride,
+                return_trajindex=return_trajindex,
+                cols=cols
+        )
+        self._pool = None
+        self._pending = deque()
+        # (itraj, t) of the next chunk to be submitted to the pool
+        self._next_submit = (0, 0)
+
+    @property
+    def chunksize(self):
+        return self.state.chunk
+
+    @chunksize.setter
+    def chunksize(self, value):
+        if value != self.state.chunk:
+            self.state.chunk = value
+            self._discard_pending()
+
+    @property
+    def skip(self):
+        return self.state.skip
+
+    @skip.setter
+    def skip(self, value):
+        if value != self.state.skip:
+            self.state.skip = value
+            self._discard_pending()
+
+    def _discard_pending(self):
+        # results of running tasks are dropped, we continue at the current position.
+        if hasattr(self, '_pending'):
+            self._pending.clear()
+            self._next_submit = (self._itraj, self._t)
+
+    def _use_cols(self, X):
+        # the columns are selected by the workers during featurization
+        return X
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = None
+        self._pending.clear()
+
+    def _select_file(self, itraj):
+        self._discard_pending()
+        self._itraj = itraj
+        self._t = 0
+        self._next_submit = (itraj, 0)
+
+    def _traj_length(self, itraj):
+        return max(0, self._data_source.trajectory_length(itraj, stride=self.stride, skip=self.skip))
+
+    def _submit(self):
+        max_pending = 2 * self._data_source.n_jobs
+        while len(self._pending) < max_pending:
+            itraj, t = self._next_submit
+            if itraj >= self._data_source.ntraj:
+                break
+            length = self._traj_length(itraj)
+            if t >= length:
+                self._next_submit = (itraj + 1, 0)
+                continue
+            n = length - t if self.chunksize == 0 else min(self.chunksize, length - t)
+            if self._pool is None:
+                from multiprocessing import Pool
+                self._pool = Pool(self._data_source.n_jobs, initializer=_init_featurize_worker,
+                                  initargs=(self._data_source.featurizer, ))
+            offsets = self._data_source._trajectory_offsets(itraj)
+            args = (self._data_source.filenames[itraj], self.skip + t * self.stride, self.stride, n,
+                    offsets if len(offsets) > 0 else None, self.use_cols)
+            self._pending.append((itraj, t, self._pool.apply_async(_featurize_frame_range, args)))
+            self._next_submit = (itraj, t + n)
+
+    def _next_chunk(self):
+        self._submit()
+        if not self._pending:
+            self.close()
+            raise StopIteration
+        itraj, t, result = self._pending[0]
+        if itraj != self._itraj:
+            # the trajectories in between are empty (eg. shorter than skip).
+            self._itraj = itraj
+            self._t = 0
+            return np.empty((0, self._data_source.ndim), dtype=self._data_source.output_type())
+        self._pending.popleft()
+        X = result.get()
+        self._t = t + len(X)
+        if self._t >= self._traj_length(itraj):
+            self._itraj = min(itraj + 1, self._data_source.ntraj)
+            self._t = 0
+        return X
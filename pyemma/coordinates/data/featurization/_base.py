@@ -37,5 +37,12 @@ class Feature(object):
     def map(self, traj):
         return self.transform(traj)
 
+    def _transform_cols(self, traj, cols):
+        """ computes only the given columns (ndarray of int) of this feature.
+
+        Features, which are able to compute a subset of their columns cheaper than all of them, override this.
+        """
+        return self.transform(traj)[:, cols]
+
     def __eq__(self, other):
         return self.__hash__() == other.__hash__()
@@ -49,6 +49,9 @@ class DistanceFeature(Feature):
     def transform(self, traj):
         return mdtraj.compute_distances(traj, self.distance_indexes, periodic=self.periodic)
 
+    def _transform_cols(self, traj, cols):
+        return mdtraj.compute_distances(traj, self.distance_indexes[cols], periodic=self.periodic)
+
     def __hash__(self):
         hash_value = _hash_numpy_array(self.distance_indexes)
         hash_value ^= hash_top(self.top)
@@ -68,6 +71,9 @@ class InverseDistanceFeature(DistanceFeature):
     def transform(self, traj):
         return 1.0 / mdtraj.compute_distances(traj, self.distance_indexes, periodic=self.periodic)
 
+    def _transform_cols(self, traj, cols):
+        return 1.0 / DistanceFeature._transform_cols(self, traj, cols)
+
     # does not need own hash impl, since we take prefix label into account
 
 
@@ -91,6 +97,10 @@ class ResidueMinDistanceFeature(DistanceFeature):
         self._dim = dummy_dist.shape[1]
         self.distance_indexes = dummy_pairs
 
+    def _transform_cols(self, traj, cols):
+        # the columns are not computed from distance_indexes
+        return Feature._transform_cols(self, traj, cols)
+
     def describe(self):
         labels = ["%s %s - %s" % (self.prefix_label,
                                   self.top.residue(pair[0]),
@@ -125,6 +135,10 @@ class GroupMinDistanceFeature(DistanceFeature):
         self.periodic = periodic
         self._dim = len(group_pairs) # TODO: validate
 
+    def _transform_cols(self, traj, cols):
+        # the columns are not computed from distance_indexes
+        return Feature._transform_cols(self, traj, cols)
+
     def describe(self):
         labels = ["%s %u--%u: [%s...%s]--[%s...%s]" % (self.prefix_label, pair[0], pair[1],
                                                        _describe_atom(self.top, self.group_definitions[pair[0]][0 ]),
@@ -182,6 +196,12 @@ class ContactFeature(DistanceFeature):
         else:
             return res
 
+    def _transform_cols(self, traj, cols):
+        if self.count_contacts:
+            return Feature._transform_cols(self, traj, cols)
+        dists = DistanceFeature._transform_cols(self, traj, cols)
+        return (dists <= self.threshold).astype(np.float32)
+
     def __hash__(self):
         hash_value = super(ContactFeature, self).__hash__()
         hash_value ^= hash(self.threshold)
@@ -705,7 +705,31 @@ class MDFeaturizer(Loggable):
         dim = sum(f.dimension for f in self.active_features)
         return dim
 
-    def transform(self, traj):
+    def _features_for_cols(self, cols):
+        """ determines the features contributing to the given columns of the output.
+
+        Returns
+        -------
+        selection : list of (feature, ndarray or None)
+            the active features containing a requested column together with the columns of
+            the feature to compute (None for all of them).
+        order : ndarray
+            indices to restore the requested order from the concatenated columns of selection.
+        """
+        cols, order = np.unique(cols, return_inverse=True)
+        selection = []
+        start = 0
+        for f in self.active_features:
+            stop = start + f.dimension
+            local = cols[(cols >= start) & (cols < stop)] - start
+            if len(local) == f.dimension:
+                selection.append((f, None))
+            elif len(local) > 0:
+                selection.append((f, local))
+            start = stop
+        return selection, order
+
+    def transform(self, traj, cols=None):
         """
         Maps an mdtraj Trajectory object to the selected output features
 
@@ -713,6 +737,9 @@ class MDFeaturizer(Loggable):
         ----------
         traj : mdtraj Trajectory
             Trajectory object used as an input
+        cols : array like of int, optional
+            compute only these columns of the output. Features, which do not
+            contribute to them, are not evaluated.
 
         Returns
         -------
@@ -721,6 +748,11 @@ class MDFeaturizer(Loggable):
             a vector with all n output features selected.
 
         """
+        if cols is not None:
+            if isinstance(cols, (list, tuple)):
+                cols = np.asarray(cols)
+            cols = np.atleast_1d(np.arange(self.dimension() if self.active_features
+                                           else traj.xyz.shape[1] * 3)[cols])
         # if there are no features selected, return given trajectory
         if len(self.active_features) == 0:
             if not self._showed_warning_empty_feature_list:
@@ -729,18 +761,24 @@ class MDFeaturizer(Loggable):
                 self._showed_warning_empty_feature_list = True
             s = traj.xyz.shape
             new_shape = (s[0], s[1] * s[2])
-            return traj.xyz.reshape(new_shape)
+            res = traj.xyz.reshape(new_shape)
+            return res if cols is None else res[:, cols]
 
         # handle empty chunks (which might occur due to time lagged access
         if traj.xyz.shape[0] == 0:
-            return np.empty((0, self.dimension()))
+            return np.empty((0, self.dimension() if cols is None else len(cols)))
+
+        if cols is None:
+            selection = [(f, None) for f in self.active_features]
+        else:
+            selection, order = self._features_for_cols(cols)
 
         # otherwise build feature vector.
         feature_vec = []
 
         # TODO: consider parallel evaluation computation here, this effort is
         # only worth it, if computation time dominates memory transfers
-        for f in self.active_features:
+        for f, local_cols in selection:
             # perform sanity checks for custom feature input
             if isinstance(f, CustomFeature):
                 # NOTE: casting=safe raises in numpy>=1.9
@@ -763,8 +801,12 @@ class MDFeaturizer(Loggable):
                                      % (str(f.describe()),
                                         traj.xyz.shape[0],
                                         vec.shape[0]))
-            else:
+                if local_cols is not None:
+                    vec = vec[:, local_cols]
+            elif local_cols is None:
                 vec = f.transform(traj).astype(np.float32)
+            else:
+                vec = f._transform_cols(traj, local_cols).astype(np.float32)
             feature_vec.append(vec)
 
         if len(feature_vec) > 1:
@@ -772,4 +814,6 @@ class MDFeaturizer(Loggable):
         else:
             res = feature_vec[0]
 
+        if cols is not None:
+            res = res[:, order]
         return res
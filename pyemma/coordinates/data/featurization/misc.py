@@ -153,6 +153,9 @@ class SelectionFeature(Feature):
         newshape = (traj.xyz.shape[0], 3 * self.indexes.shape[0])
         return np.reshape(traj.xyz[:, self.indexes, :], newshape)
 
+    def _transform_cols(self, traj, cols):
+        return traj.xyz[:, self.indexes[cols // 3], cols % 3]
+
     def __hash__(self):
         hash_value = hash(self.prefix_label)
         hash_value ^= hash_top(self.top)
@@ -41,6 +41,8 @@ class _FragmentedTrajectoryIterator(object):
         self._lengths = [sum(self._reader_lengths)]
         # mapping reader_index -> cumulative length
         self._cumulative_lengths = np.cumsum(self._reader_lengths)
+        # mapping reader_index -> global index of the reader's first frame
+        self._fragment_offsets = self._cumulative_lengths - self._reader_lengths
         # current reader index
         self._reader_at = 0
         self._done = False
@@ -205,25 +207,25 @@ class _FragmentedTrajectoryIterator(object):
 
     def __get_ifrag_ra_indices(self, fragment_indices, ifrag):
         assert ifrag < len(self._readers)
-        offset = self._cumulative_lengths[ifrag - 1] if ifrag > 0 else 0
-        frag_inds = fragment_indices[ifrag]
-        ra = self.ra_indices[frag_inds] - offset
-        indices = np.zeros((len(ra), 2), dtype=int)
-        indices[:, 1] = ra.squeeze()
-        return indices
+        return fragment_indices[ifrag]
 
     def __get_ra_index_indices(self):
         """
-        Returns a list containing indices of the ra_index array, which correspond to the separate trajectory fragments,
-        i.e., ra_indices[fragment_indices[itraj]] are the ra indices for itraj (plus some offset by
-        cumulative length)
+        Returns a list containing the ra indices of the separate trajectory fragments, i.e., fragment_indices[ifrag]
+        are the ra indices falling into fragment ifrag (in their original order), shifted into the fragment and in
+        the (N, 2)-shaped stride format accepted by the fragment's reader.
         """
+        ra_indices = np.asarray(self.ra_indices, dtype=int).reshape(-1)
+        ifrags = np.searchsorted(self._cumulative_lengths, ra_indices, side='right')
+        # stable sort keeps the order of the ra indices within each fragment
+        order = np.argsort(ifrags, kind='mergesort')
+        bounds = np.searchsorted(ifrags[order], np.arange(len(self._readers) + 1))
         fragment_indices = []
-        for idx, cumlen in enumerate(self._cumulative_lengths):
-            cumlen_prev = self._cumulative_lengths[idx - 1] if idx > 0 else 0
-            fragment_indices.append([np.argwhere(
-                np.logical_and(self.ra_indices >= cumlen_prev, self.ra_indices < cumlen)
-            )])
+        for ifrag in range(len(self._readers)):
+            selection = order[bounds[ifrag]:bounds[ifrag + 1]]
+            indices = np.zeros((len(selection), 2), dtype=int)
+            indices[:, 1] = ra_indices[selection] - self._fragment_offsets[ifrag]
+            fragment_indices.append(indices)
         return fragment_indices
 
     def _traj_lengths(self, stride):
@@ -382,6 +384,9 @@ class FragmentedTrajectoryReader(DataSource):
         self._lengths = [sum(self._reader_lengths[itraj]) for itraj in range(0, self._ntraj)]
         # mapping reader_index -> cumulative length
         self._cumulative_lengths = [np.cumsum(self._reader_lengths[itraj]) for itraj in range(0, self._ntraj)]
+        # mapping reader_index -> global index of the reader's first frame
+        self._fragment_offsets = [self._cumulative_lengths[itraj] - self._reader_lengths[itraj]
+                                  for itraj in range(0, self._ntraj)]
         # store trajectory files
         self._trajectories = trajectories
         self._filenames = trajectories
@@ -414,15 +419,21 @@ class FragmentedTrajectoryReader(DataSource):
         """
         Accepts an index parameter in [0, sum(reader_lenghts)) and returns a tuple (reader_index, local_index),
         where the tuple (reader_index, local_index) corresponds to the global frame index of the fragmented trajectory.
+        The index may also be an array of indices, in which case arrays of reader and local indices are returned.
         :param index: the global index
         :return: a tuple (reader_index, local_index)
         """
-        prev_len = 0
-        for readerIndex, length in enumerate(self._cumulative_lengths[itraj]):
-            if prev_len <= index < length:
-                return readerIndex, index - prev_len
-            prev_len = length
-        raise ValueError("Requested index %s was out of bounds [0,%s)" % (index, self._cumulative_lengths[itraj][-1]))
+        cumulative_lengths = self._cumulative_lengths[itraj]
+        index = np.asarray(index)
+        out_of_bounds = (index < 0) | (index >= cumulative_lengths[-1])
+        if np.any(out_of_bounds):
+            raise ValueError("Requested index %s was out of bounds [0,%s)"
+                             % (index[out_of_bounds] if index.ndim else index, cumulative_lengths[-1]))
+        reader_index = np.searchsorted(cumulative_lengths, index, side='right')
+        local_index = index - self._fragment_offsets[itraj][reader_index]
+        if index.ndim == 0:
+            return int(reader_index), int(local_index)
+        return reader_index, local_index
 
     def _get_traj_info(self, filename):
         # get info for a fragment from specific reader
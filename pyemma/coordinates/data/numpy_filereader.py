@@ -27,7 +27,11 @@ import functools
 import numpy as np
 
 from pyemma.coordinates.data._base.datasource import DataSourceIterator, DataSource
-from pyemma.coordinates.data.data_in_memory import DataInMemoryIterator
+from pyemma.coordinates.data.data_in_memory import (DataInMemoryIterator,
+                                                     DataInMemoryCuboidRandomAccessStrategy,
+                                                     DataInMemoryJaggedRandomAccessStrategy,
+                                                     DataInMemoryLinearRandomAccessStrategy,
+                                                     DataInMemoryLinearItrajRandomAccessStrategy)
 from pyemma.coordinates.data.util.traj_info_cache import TrajInfo
 from pyemma.util.annotators import fix_docs
 
@@ -51,6 +55,12 @@ class NumPyFileReader(DataSource):
     def __init__(self, filenames, chunksize=1000, mmap_mode='r'):
         super(NumPyFileReader, self).__init__(chunksize=chunksize)
         self._is_reader = True
+        self._is_random_accessible = True
+
+        self._ra_cuboid = NumPyFileCuboidRandomAccessStrategy(self, 3)
+        self._ra_jagged = NumPyFileJaggedRandomAccessStrategy(self, 3)
+        self._ra_linear_strategy = NumPyFileLinearRandomAccessStrategy(self, 2)
+        self._ra_linear_itraj_strategy = NumPyFileLinearItrajRandomAccessStrategy(self, 3)
 
         if not isinstance(filenames, (list, tuple)):
             filenames = [filenames]
@@ -109,6 +119,29 @@ class NumPyFileReader(DataSource):
         return TrajInfo(ndim, length)
 
 
+class _NumPyFileRandomAccessMixIn(object):
+    # the trajectories are memory mapped (according to mmap_mode) on access.
+    def _trajectory_data(self, itraj):
+        return self._source._load_file(itraj)
+
+
+class NumPyFileCuboidRandomAccessStrategy(_NumPyFileRandomAccessMixIn, DataInMemoryCuboidRandomAccessStrategy):
+    pass
+
+
+class NumPyFileJaggedRandomAccessStrategy(_NumPyFileRandomAccessMixIn, DataInMemoryJaggedRandomAccessStrategy):
+    pass
+
+
+class NumPyFileLinearRandomAccessStrategy(_NumPyFileRandomAccessMixIn, DataInMemoryLinearRandomAccessStrategy):
+    pass
+
+
+class NumPyFileLinearItrajRandomAccessStrategy(_NumPyFileRandomAccessMixIn,
+                                               DataInMemoryLinearItrajRandomAccessStrategy):
+    pass
+
+
 class NPYIterator(DataInMemoryIterator):
 
     def __init__(self, data_source, skip=0, chunk=0, stride=1, return_trajindex=False, cols=False):
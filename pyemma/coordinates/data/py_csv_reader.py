@@ -24,146 +24,228 @@ from __future__ import absolute_import
 
 import csv
 import os
+import warnings
+from collections import deque
 from math import ceil
 
 import numpy as np
 import six
 from six.moves import range
 
+from pyemma._base.parallel import NJobsMixIn
 from pyemma.coordinates.data._base.datasource import DataSourceIterator, DataSource
 from pyemma.coordinates.data.util.traj_info_cache import TrajInfo
 from pyemma.util.annotators import fix_docs
 
 
+# neighbouring lines, which are at most this many bytes apart, are read at once.
+_MAX_GAP = 1 << 16
+
+
+def _read_lines(filename, lines, starts, ends, delimiter, quotechar, ndim, dialect_str, cols=None):
+    """ reads the lines with the given byte ranges of a file and parses them to an array of shape (len(lines), ndim).
+
+    If cols is given, only these fields of every line are converted to float.
+
+    Parameters
+    ----------
+    filename : str
+    lines : ndarray
+        line numbers (used in error messages)
+    starts, ends : ndarray
+        sorted byte ranges of the lines. A range may additionally contain empty lines.
+    delimiter, quotechar : bytes
+    ndim : int
+        number of columns
+    dialect_str : str
+        description of the csv dialect for error messages
+    cols : ndarray, optional
+        columns to return
+    """
+    starts = starts.tolist()
+    ends = ends.tolist()
+    rows = []
+    with open(filename, 'rb') as fh:
+        i = 0
+        while i < len(starts):
+            # coalesce neighbouring lines into one read
+            j = i + 1
+            while j < len(starts) and starts[j] - ends[j - 1] <= _MAX_GAP:
+                j += 1
+            base = starts[i]
+            fh.seek(base)
+            buf = fh.read(ends[j - 1] - base)
+            rows.extend(buf[s - base:e - base] for s, e in zip(starts[i:j], ends[i:j]))
+            i = j
+
+    text = b' '.join(rows)
+    if delimiter.strip():
+        text = text.replace(delimiter, b' ')
+    if quotechar:
+        text = text.replace(quotechar, b' ')
+    if cols is not None:
+        fields = text.split()
+        if len(fields) == len(rows) * ndim:
+            try:
+                return np.array(fields).reshape(len(rows), ndim)[:, cols].astype(float)
+            except ValueError:
+                pass
+        _raise_parse_error(filename, lines, rows, delimiter, quotechar, ndim, dialect_str)
+    try:
+        with warnings.catch_warnings():
+            # older numpy versions warn and return the values parsed so far.
+            warnings.simplefilter('ignore', DeprecationWarning)
+            values = np.fromstring(text, sep=' ')
+    except ValueError:
+        values = None
+    if values is None or values.size != len(rows) * ndim:
+        _raise_parse_error(filename, lines, rows, delimiter, quotechar, ndim, dialect_str)
+    return values.reshape(len(rows), ndim)
+
+
+def _raise_parse_error(filename, lines, rows, delimiter, quotechar, ndim, dialect_str):
+    msg = str("Invalid entry in file {fn}, line {line}: {error}."
+              " Used dialect to parse: {dialect}")
+    for line, row in zip(lines, rows):
+        if delimiter.strip():
+            row = row.replace(delimiter, b' ')
+        if quotechar:
+            row = row.replace(quotechar, b' ')
+        values = row.split()
+        for value in values:
+            try:
+                float(value)
+            except ValueError as ve:
+                raise ValueError(msg.format(fn=filename, line=line, error=repr(ve), dialect=dialect_str))
+        if len(values) != ndim:
+            error = 'expected %i columns, but got %i' % (ndim, len(values))
+            raise ValueError(msg.format(fn=filename, line=line, error=error, dialect=dialect_str))
+    raise ValueError('could not parse lines %s of file %s' % (lines, filename))
+
+
 class PyCSVIterator(DataSourceIterator):
+    """ reads the chunks of a PyCSVReader.
+
+    The lines of a chunk are located by the byte offsets of the lines (see :meth:`PyCSVReader._calc_offsets`),
+    so only the requested lines are read and parsed at once. If :attr:`PyCSVReader.n_jobs` is larger than one,
+    the chunks are parsed by a pool of processes, which read up to two chunks per worker ahead.
+    """
     def __init__(self, data_source, skip=0, chunk=0, stride=1, return_trajindex=False, cols=None):
         # do not pass cols, because we want to handle in this impl, not in DataSourceIterator
         super(PyCSVIterator, self).__init__(data_source, skip=skip, chunk=chunk,
                                             stride=stride,
                                             return_trajindex=return_trajindex)
+        if isinstance(cols, (list, tuple)):
+            cols = np.asarray(cols)
         self._custom_cols = cols
-        self._open_file()
-        if isinstance(self._skip_rows, int):
-            self._skip_rows = np.arange(self._skip_rows)
-        self._skip_rows = (np.empty(0) if self._skip_rows is None
-                           else np.unique(self._skip_rows))
-        self.line = 0
-        self._reader = csv.reader(self._file_handle,
-                                  dialect=self._data_source._get_dialect(self._itraj))
+        self._pool = None
+        self._pending = deque()
+        # (itraj, t) of the next chunk to be submitted
+        self._next_submit = (0, 0)
+
+    @property
+    def chunksize(self):
+        return self.state.chunk
+
+    @chunksize.setter
+    def chunksize(self, value):
+        if value != self.state.chunk:
+            self.state.chunk = value
+            self._discard_pending()
+
+    @property
+    def skip(self):
+        return self.state.skip
+
+    @skip.setter
+    def skip(self, value):
+        if value != self.state.skip:
+            self.state.skip = value
+            self._discard_pending()
+
+    def _discard_pending(self):
+        # results of running tasks are dropped, we continue at the current position.
+        if hasattr(self, '_pending'):
+            self._pending.clear()
+            self._next_submit = (self._itraj, self._t)
 
     def close(self):
-        if self._file_handle is not None:
-            self._file_handle.close()
-
-    def _next_chunk(self):
-        if not self._file_handle or self._itraj >= self.number_of_trajectories():
-            self.close()
-            raise StopIteration()
-
-        traj_len = self.trajectory_length()
-        lines = []
-        for row in self._reader:
-            if self.line in self._skip_rows:
-                self.line += 1
-                continue
-
-            self.line += 1
-            if not self.uniform_stride:
-                for _ in range(0, self.ra_indices_for_traj(self._itraj).tolist().count(self.line - 1)):
-                    lines.append(row)
-            else:
-                lines.append(row)
-            if self.chunksize != 0 and len(lines) % self.chunksize == 0:
-                result = self._convert_to_np_chunk(lines)
-                del lines[:]  # free some space
-                if self._t >= traj_len:
-                    self._itraj += 1
-                    self._select_file(self._itraj)
-                return result
-
-        self._itraj += 1
-        self._select_file(self._itraj)
-        # last chunk
-        if len(lines) > 0:
-            result = self._convert_to_np_chunk(lines)
-            return result
-
-        self.close()
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = None
+        self._pending.clear()
 
     def _select_file(self, itraj):
+        self._discard_pending()
         self._itraj = itraj
-        while not self.uniform_stride and self._itraj not in self.traj_keys \
-                and self._itraj < self.number_of_trajectories():
-            self._itraj += 1
-        if self._itraj < self.number_of_trajectories():
-            # close current file handle
-            self._file_handle.close()
-            # open next one
-            self._open_file()
-            # reset line counter
-            self.line = 0
-            # reset time counter
-            self._t = 0
-            # get new reader
-            self._reader = csv.reader(self._file_handle,
-                                      dialect=self._data_source._get_dialect(self._itraj))
-
-    def _convert_to_np_chunk(self, list_of_strings):
-        # filter empty strings
-        list_of_strings = list(filter(bool, list_of_strings))
-        stack_of_strings = np.vstack(list_of_strings)
-        if self._custom_cols:
-            stack_of_strings = stack_of_strings[:, self._custom_cols]
-        try:
-            result = stack_of_strings.astype(float)
-        except ValueError:
-            fn = self._file_handle.name
-            dialect_str = _dialect_to_str(self._reader.dialect)
-            for idx, line in enumerate(list_of_strings):
-                for value in line:
-                    try:
-                        float(value)
-                    except ValueError as ve:
-                        s = str("Invalid entry in file {fn}, line {line}: {error}."
-                                " Used dialect to parse: {dialect}").format(fn=fn, line=self._t + idx,
-                                                                            error=repr(ve),
-                                                                            dialect=dialect_str)
-                        raise ValueError(s)
-        self._t += len(list_of_strings)
-        return result
-
-    def _open_file(self):
-        # only apply _skip property at the beginning of the trajectory
-        skip = self._data_source._skip[self._itraj] + self.skip if self._t == 0 else 0
-        nt = self._data_source._skip[self._itraj] + self._data_source._lengths[self._itraj]
-
-        # calculate an index set, which rows to skip (includes stride)
-        skip_rows = np.empty(0)
-
-        if skip > 0:
-            skip_rows = np.zeros(nt)
-            skip_rows[:skip] = np.arange(skip)
-
-        if not self.uniform_stride:
-            all_frames = np.arange(nt)
-            skip_rows = np.setdiff1d(all_frames, self.ra_indices_for_traj(self._itraj), assume_unique=True)
-        elif self.stride > 1:
-            all_frames = np.arange(nt)
-            if skip_rows is not None:
-                wanted_frames = np.arange(skip, nt, self.stride)
+        self._t = 0
+        self._next_submit = (itraj, 0)
+
+    def _traj_length(self, itraj):
+        if self.uniform_stride:
+            return max(0, self._data_source.trajectory_length(itraj, stride=self.stride, skip=self.skip))
+        return self.ra_trajectory_length(itraj)
+
+    def _task(self, itraj, frames):
+        """ arguments of _read_lines for the given frames and the indices to restore their order. """
+        frames, inverse = np.unique(frames, return_inverse=True)
+        # line numbers with respect to the header
+        offsets = np.asarray(self._data_source._trajectory_offsets(itraj))
+        lines = frames + self._data_source._skip[itraj]
+        dialect = self._data_source._get_dialect(itraj)
+        quotechar = dialect.quotechar.encode('ascii') if dialect.quotechar else b''
+        args = (self._data_source.filenames[itraj], lines, offsets[lines], offsets[lines + 1],
+                dialect.delimiter.encode('ascii'), quotechar, self._data_source.ndim,
+                _dialect_to_str(dialect), self._custom_cols)
+        return args, inverse
+
+    def _submit(self):
+        n_jobs = self._data_source.n_jobs
+        max_pending = 2 * n_jobs if n_jobs > 1 else 1
+        while len(self._pending) < max_pending:
+            itraj, t = self._next_submit
+            if itraj >= self._data_source.ntraj:
+                break
+            length = self._traj_length(itraj)
+            if t >= length:
+                self._next_submit = (itraj + 1, 0)
+                continue
+            n = length - t if self.chunksize == 0 else min(self.chunksize, length - t)
+            if self.uniform_stride:
+                frames = self.skip + self.stride * np.arange(t, t + n)
             else:
-                wanted_frames = np.arange(0, nt, self.stride)
-            skip_rows = np.setdiff1d(
-                all_frames, wanted_frames, assume_unique=True)
+                frames = self.ra_indices_for_traj(itraj)[t:t + n]
+            args, inverse = self._task(itraj, frames)
+            if n_jobs > 1:
+                if self._pool is None:
+                    from multiprocessing import Pool
+                    self._pool = Pool(n_jobs)
+                result = self._pool.apply_async(_read_lines, args)
+            else:
+                result = None
+            self._pending.append((itraj, t, args, inverse, result))
+            self._next_submit = (itraj, t + n)
 
-        self._skip_rows = skip_rows
-        try:
-            fh = open(self._data_source.filenames[self._itraj],
-                      mode=self._data_source.DEFAULT_OPEN_MODE)
-            self._file_handle = fh
-        except EnvironmentError:
-            self._logger.exception()
-            raise
+    def _next_chunk(self):
+        self._submit()
+        if not self._pending:
+            self.close()
+            raise StopIteration
+        itraj, t, args, inverse, result = self._pending[0]
+        if itraj != self._itraj:
+            # the trajectories in between are empty (eg. shorter than skip).
+            self._itraj = itraj
+            self._t = 0
+            return np.empty((0, self._data_source.ndim))
+        self._pending.popleft()
+        X = result.get() if result is not None else _read_lines(*args)
+        X = X[inverse]
+        self._t = t + len(X)
+        if self._t >= self._traj_length(itraj):
+            self._itraj = min(itraj + 1, self._data_source.ntraj)
+            self._t = 0
+        return X
 
 
 def _dialect_to_str(dialect):
@@ -184,7 +266,7 @@ def _dialect_to_str(dialect):
 
 
 @fix_docs
-class PyCSVReader(DataSource):
+class PyCSVReader(DataSource, NJobsMixIn):
     r""" Reader for tabulated ASCII data
 
     This class uses numpy to interpret string data to array data.
@@ -213,6 +295,10 @@ class PyCSVReader(DataSource):
         provide a default value for missing data:
         ``converters = {3: lambda s: float(s.strip() or 0)}``.
 
+    n_jobs: int or None, default=1
+        number of worker processes, which parse the chunks of the files in parallel.
+        If None, all available CPUs will be used.
+
     Notes
     -----
     For reading files with only one column, one needs to specify a delimter...
@@ -220,9 +306,10 @@ class PyCSVReader(DataSource):
     DEFAULT_OPEN_MODE = 'r'  # read in text-mode
 
     def __init__(self, filenames, chunksize=1000, delimiters=None, comments='#',
-                 converters=None, **kwargs):
+                 converters=None, n_jobs=1, **kwargs):
         super(PyCSVReader, self).__init__(chunksize=chunksize)
         self._is_reader = True
+        self.n_jobs = n_jobs
 
         if isinstance(filenames, (tuple, list)):
             n = len(filenames)
@@ -256,6 +343,7 @@ class PyCSVReader(DataSource):
                              return_trajindex=return_trajindex, cols=cols)
 
     def _get_dialect(self, itraj):
+        self._resolve_traj_infos(itraj)
         fn_idx = self.filenames.index(self.filenames[itraj])
         return self._dialects[fn_idx]
 
@@ -0,0 +1,427 @@
+
+# This file is part of PyEMMA.
+#
+# Copyright (c) 2016 Computational Molecular Biology Group, Freie Universitaet Berlin (GER)
+#
+# PyEMMA is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+Binary storage of (transformed) trajectories.
+
+A store is a directory containing an index file (index.json) and one file per trajectory. Trajectories
+are stored column-major, so single columns can be read without touching the others:
+
+* uncompressed: a Fortran ordered .npy file, which is memory mapped.
+* compressed: the frames are split into blocks of block_size frames. Every column of a block is compressed
+  separately with zlib and appended to a .blk file. The byte offsets of these pieces are stored in a .npy
+  file next to it, so the block containing a frame is found in constant time.
+
+Stores are written by :meth:`Iterable.write_to_store <pyemma.coordinates.data._base.iterable.Iterable.write_to_store>`
+and read by :class:`StoreReader`.
+'''
+
+from __future__ import absolute_import
+
+import errno
+import json
+import os
+import zlib
+
+import numpy as np
+
+from pyemma.coordinates.data.data_in_memory import (DataInMemoryIterator,
+                                                    DataInMemoryCuboidRandomAccessStrategy,
+                                                    DataInMemoryJaggedRandomAccessStrategy,
+                                                    DataInMemoryLinearRandomAccessStrategy,
+                                                    DataInMemoryLinearItrajRandomAccessStrategy)
+from pyemma.coordinates.data._base.datasource import DataSource
+from pyemma.util.annotators import fix_docs
+
+__all__ = ('StoreReader', 'StoreWriter', 'is_store')
+
+_INDEX_FILE = 'index.json'
+_VERSION = 1
+_COMPRESSIONS = (None, 'zlib')
+
+
+def is_store(path):
+    """ :returns True, if the given path is a directory written by :class:`StoreWriter`."""
+    return os.path.isfile(os.path.join(path, _INDEX_FILE))
+
+
+def _traj_filename(itraj, compression):
+    return 'traj_%05i%s' % (itraj, '.npy' if compression is None else '.blk')
+
+
+def _offsets_filename(filename):
+    return os.path.splitext(filename)[0] + '.idx.npy'
+
+
+class StoreWriter(object):
+    """ writes the chunks of trajectories to a store.
+
+    Parameters
+    ----------
+    path : str
+        directory of the store. It is created, if it does not exist.
+    lengths : list of int
+        number of frames of each trajectory.
+    ndim : int
+        dimension of the trajectories.
+    compression : None or 'zlib'
+        compress blocks of block_size frames column-wise.
+    block_size : int
+        number of frames compressed at once.
+    overwrite : bool
+        if False, raise if the path already contains a store.
+
+    Notes
+    -----
+    The chunks of every trajectory have to be appended in order. The index file is written on
+    :meth:`close`, so an interrupted store is never read.
+    """
+
+    def __init__(self, path, lengths, ndim, compression=None, block_size=4096, compression_level=6,
+                 overwrite=False):
+        if compression not in _COMPRESSIONS:
+            raise ValueError('compression has to be one of %s, but was %s' % (_COMPRESSIONS, compression))
+        if block_size <= 0:
+            raise ValueError('block_size has to be positive')
+        if is_store(path):
+            if not overwrite:
+                raise OSError(errno.EEXIST, 'store already exists', path)
+            # an interrupted write must not leave a readable store of mixed contents
+            os.unlink(os.path.join(path, _INDEX_FILE))
+        from pyemma.util.files import mkdir_p
+        mkdir_p(path)
+
+        self.path = path
+        self.lengths = [int(l) for l in lengths]
+        self.ndim = int(ndim)
+        self.compression = compression
+        self.block_size = int(block_size)
+        self.compression_level = compression_level
+        self.dtype = None
+
+        self._itraj = -1
+        self._pos = 0
+        # uncompressed: memory map of the current trajectory
+        self._array = None
+        # compressed: file handle, byte offsets and not yet compressed frames of the current trajectory
+        self._fh = None
+        self._offsets = None
+        self._pending = []
+
+    def _filename(self, itraj):
+        return os.path.join(self.path, _traj_filename(itraj, self.compression))
+
+    def append(self, itraj, X):
+        """ appends the chunk X to trajectory itraj. """
+        X = np.asarray(X)
+        if X.ndim != 2 or X.shape[1] != self.ndim:
+            raise ValueError('expected chunk with %i columns, got shape %s' % (self.ndim, X.shape))
+        if self.dtype is None:
+            self.dtype = X.dtype
+        if itraj != self._itraj:
+            if itraj < self._itraj:
+                raise ValueError('trajectories have to be written in order')
+            self._finish_traj()
+            self._itraj = itraj
+            self._pos = 0
+            self._open_traj()
+        if self._pos + len(X) > self.lengths[itraj]:
+            raise ValueError('trajectory %i exceeds its length of %i frames' % (itraj, self.lengths[itraj]))
+
+        if self.compression is None:
+            self._array[self._pos:self._pos + len(X)] = X
+        else:
+            self._pending.append(X.astype(self.dtype, copy=False))
+            n_pending = self._pos % self.block_size + len(X)
+            if n_pending >= self.block_size:
+                pending = np.concatenate(self._pending)
+                n_full = n_pending - n_pending % self.block_size
+                for start in range(0, n_full, self.block_size):
+                    self._write_block(pending[start:start + self.block_size])
+                self._pending = [pending[n_full:]]
+        self._pos += len(X)
+
+    def _open_traj(self):
+        filename = self._filename(self._itraj)
+        if self.compression is None:
+            self._array = np.lib.format.open_memmap(filename, mode='w+', dtype=self.dtype,
+                                                    shape=(self.lengths[self._itraj], self.ndim),
+                                                    fortran_order=True)
+        else:
+            self._fh = open(filename, 'wb')
+            self._offsets = [0]
+            self._pending = []
+
+    def _write_block(self, block):
+        for c in range(self.ndim):
+            data = zlib.compress(np.ascontiguousarray(block[:, c]).tobytes(), self.compression_level)
+            self._fh.write(data)
+            self._offsets.append(self._offsets[-1] + len(data))
+
+    def _finish_traj(self):
+        if self._itraj < 0:
+            return
+        if self._pos != self.lengths[self._itraj]:
+            raise ValueError('trajectory %i is incomplete: %i of %i frames written'
+                             % (self._itraj, self._pos, self.lengths[self._itraj]))
+        if self.compression is None:
+            self._array.flush()
+            self._array = None
+        else:
+            pending = np.concatenate(self._pending) if self._pending else ()
+            if len(pending):
+                self._write_block(pending)
+            self._pending = []
+            self._fh.close()
+            self._fh = None
+            np.save(_offsets_filename(self._filename(self._itraj)), np.array(self._offsets, dtype=np.int64))
+
+    def _write_empty(self, itraj):
+        filename = self._filename(itraj)
+        if self.compression is None:
+            np.save(filename, np.empty((0, self.ndim), dtype=self.dtype), allow_pickle=False)
+        else:
+            open(filename, 'wb').close()
+            np.save(_offsets_filename(filename), np.zeros(1, dtype=np.int64))
+
+    def close(self):
+        """ finishes the last trajectory and writes the index. """
+        self._finish_traj()
+        self._itraj = len(self.lengths)
+        if self.dtype is None:
+            self.dtype = np.dtype(np.float32)
+        for itraj, length in enumerate(self.lengths):
+            if length == 0:
+                self._write_empty(itraj)
+            elif not os.path.exists(self._filename(itraj)):
+                raise ValueError('trajectory %i has not been written' % itraj)
+        index = {'version': _VERSION,
+                 'dtype': np.dtype(self.dtype).str,
+                 'ndim': self.ndim,
+                 'lengths': self.lengths,
+                 'compression': self.compression,
+                 'block_size': self.block_size,
+                 'filenames': [_traj_filename(i, self.compression) for i in range(len(self.lengths))],
+                 }
+        tmp = os.path.join(self.path, _INDEX_FILE + '.tmp')
+        with open(tmp, 'w') as fh:
+            json.dump(index, fh)
+        getattr(os, 'replace', os.rename)(tmp, os.path.join(self.path, _INDEX_FILE))
+
+    def discard(self):
+        """ aborts writing, the store stays unreadable. """
+        self._array = None
+        if self._fh is not None:
+            self._fh.close()
+            self._fh = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
+
+
+class _StoreTrajectory(object):
+    """ read only, array like access to a trajectory of a store.
+
+    Indexing with [frames, dims] selects frames and dims independently of each other (like numpy.ix_).
+    """
+
+    def __init__(self, filename, length, ndim, dtype):
+        self.filename = filename
+        self.shape = (length, ndim)
+        self.dtype = dtype
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __getitem__(self, idx):
+        if isinstance(idx, tuple):
+            if len(idx) != 2:
+                raise IndexError('too many indices for trajectory: %s' % (idx, ))
+            frames, dims = idx
+        else:
+            frames, dims = idx, slice(None)
+        cols = np.arange(self.shape[1])[dims]
+        if isinstance(frames, slice):
+            rows = frames
+            n_rows = len(range(*frames.indices(self.shape[0])))
+        else:
+            rows = np.arange(self.shape[0])[frames]
+            n_rows = rows.size
+        result = self._read(rows if isinstance(rows, slice) else np.atleast_1d(rows), np.atleast_1d(cols), n_rows)
+        if np.ndim(cols) == 0:
+            result = result[:, 0]
+        if not isinstance(rows, slice) and np.ndim(rows) == 0:
+            result = result[0]
+        return result
+
+    def _read(self, rows, cols, n_rows):
+        raise NotImplementedError()
+
+
+class _MappedTrajectory(_StoreTrajectory):
+
+    def __init__(self, filename, length, ndim, dtype):
+        super(_MappedTrajectory, self).__init__(filename, length, ndim, dtype)
+        self._array = None
+
+    @property
+    def array(self):
+        if self._array is None:
+            # older numpy versions can not map empty files
+            self._array = np.load(self.filename, mmap_mode='r' if self.shape[0] > 0 else None)
+        return self._array
+
+    def _read(self, rows, cols, n_rows):
+        if isinstance(rows, slice):
+            result = self.array[rows, cols]
+        else:
+            result = self.array[np.ix_(rows, cols)]
+        return np.ascontiguousarray(result)
+
+
+class _CompressedTrajectory(_StoreTrajectory):
+
+    def __init__(self, filename, length, ndim, dtype, block_size):
+        super(_CompressedTrajectory, self).__init__(filename, length, ndim, dtype)
+        self.block_size = block_size
+        self._offsets = None
+        # decompressed columns of the last read, consecutive chunks mostly share a block.
+        self._blocks = {}
+
+    @property
+    def offsets(self):
+        if self._offsets is None:
+            self._offsets = np.load(_offsets_filename(self.filename))
+        return self._offsets
+
+    def _column(self, fh, block, col):
+        key = (block, col)
+        if key in self._blocks:
+            return self._blocks[key]
+        k = block * self.shape[1] + col
+        start, stop = self.offsets[k], self.offsets[k + 1]
+        fh.seek(start)
+        return np.frombuffer(zlib.decompress(fh.read(stop - start)), dtype=self.dtype)
+
+    def _read(self, rows, cols, n_rows):
+        if isinstance(rows, slice):
+            rows = np.arange(*rows.indices(self.shape[0]))
+        result = np.empty((n_rows, len(cols)), dtype=self.dtype)
+        if n_rows == 0:
+            return result
+        blocks = rows // self.block_size
+        order = np.argsort(blocks, kind='mergesort')
+        unique_blocks, starts = np.unique(blocks[order], return_index=True)
+        used = {}
+        with open(self.filename, 'rb') as fh:
+            for block, idx in zip(unique_blocks, np.split(order, starts[1:])):
+                local = rows[idx] - block * self.block_size
+                for j, c in enumerate(cols):
+                    column = self._column(fh, block, c)
+                    used[(block, c)] = column
+                    result[idx, j] = column[local]
+        self._blocks = used
+        return result
+
+
+@fix_docs
+class StoreReader(DataSource):
+    r"""
+    reads trajectories stored by :meth:`write_to_store <pyemma.coordinates.data._base.iterable.Iterable.write_to_store>`.
+
+    Parameters
+    ----------
+    path : str
+        directory of the store.
+    chunksize : int
+        how many frames are read at once.
+
+    Notes
+    -----
+    Selected columns (cols argument of the iterator and random access with dimensions) are read without
+    reading the other columns.
+    """
+
+    def __init__(self, path, chunksize=5000):
+        super(StoreReader, self).__init__(chunksize=chunksize)
+        self._is_reader = True
+        self._is_random_accessible = True
+
+        self._ra_cuboid = StoreCuboidRandomAccessStrategy(self, 3)
+        self._ra_jagged = DataInMemoryJaggedRandomAccessStrategy(self, 3)
+        self._ra_linear_strategy = DataInMemoryLinearRandomAccessStrategy(self, 2)
+        self._ra_linear_itraj_strategy = DataInMemoryLinearItrajRandomAccessStrategy(self, 3)
+
+        try:
+            with open(os.path.join(path, _INDEX_FILE)) as fh:
+                index = json.load(fh)
+        except EnvironmentError:
+            raise ValueError('"%s" is not a store' % path)
+        if index.get('version') != _VERSION:
+            raise ValueError('unsupported version of store "%s": %s' % (path, index.get('version')))
+
+        self.path = path
+        self.compression = index['compression']
+        self.block_size = index['block_size']
+        dtype = np.dtype(index['dtype'])
+        self._ndim = index['ndim']
+        self._lengths = index['lengths']
+        self._ntraj = len(self._lengths)
+        self._filenames = [os.path.join(path, f) for f in index['filenames']]
+        if self.compression is None:
+            self._data = [_MappedTrajectory(f, l, self._ndim, dtype)
+                          for f, l in zip(self._filenames, self._lengths)]
+        else:
+            self._data = [_CompressedTrajectory(f, l, self._ndim, dtype, self.block_size)
+                          for f, l in zip(self._filenames, self._lengths)]
+        self._dtype = dtype
+
+    @property
+    def data(self):
+        """ list of read only, array like trajectories. """
+        return self._data
+
+    def output_type(self):
+        return self._dtype
+
+    def _create_iterator(self, skip=0, chunk=0, stride=1, return_trajindex=False, cols=None):
+        return StoreReaderIterator(self, skip=skip, chunk=chunk, stride=stride,
+                                   return_trajindex=return_trajindex, cols=cols)
+
+    def describe(self):
+        return "[StoreReader %s with %i trajectories, compression=%s]" % (self.path, self.ntraj, self.compression)
+
+
+class StoreCuboidRandomAccessStrategy(DataInMemoryCuboidRandomAccessStrategy):
+    def _get_itraj_random_accessible(self, itrajs, frames, dims):
+        itrajs = self._get_indices(itrajs, self._source.ntraj)
+        frames = self._get_indices(frames, min(self._source.trajectory_lengths(1, 0)[itrajs]))
+        return np.array([self._source.data[itraj][frames, dims] for itraj in itrajs],
+                        dtype=self._source.output_type())
+
+
+class StoreReaderIterator(DataInMemoryIterator):
+
+    def _select(self, data, frames):
+        # the trajectories select frames and columns independently of each other.
+        return data[frames, slice(None) if self.use_cols is None else self.use_cols]
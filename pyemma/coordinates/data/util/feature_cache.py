@@ -0,0 +1,242 @@
+
+# This file is part of PyEMMA.
+#
+# Copyright (c) 2016 Computational Molecular Biology Group, Freie Universitaet Berlin (GER)
+#
+# PyEMMA is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+Persistent storage of featurized trajectories.
+
+The output of a :class:`FeatureReader <pyemma.coordinates.data.feature_reader.FeatureReader>` for a whole
+trajectory is stored as a .npy file under a key built from the file hash (see
+:class:`TrajectoryInfoCache <pyemma.coordinates.data.util.traj_info_cache.TrajectoryInfoCache>`), the
+featurizer and the stride. Later reads with the same key are served from a memory map of this file.
+If the file or the features change, so does the key.
+'''
+
+from __future__ import absolute_import
+
+import hashlib
+import os
+import tempfile
+from logging import getLogger
+
+import numpy as np
+
+from pyemma.util import config
+from pyemma.util.numeric import _NotHashable, _update_hash
+
+logger = getLogger(__name__)
+
+__all__ = ('FeatureCache', 'featurizer_key')
+
+
+def _topology_key(top):
+    hasher = hashlib.md5()
+    _update_hash(hasher, [top.n_atoms, [str(a) for a in top.atoms]])
+    return hasher.hexdigest()
+
+
+def featurizer_key(featurizer):
+    """ computes a key of the given featurizer, which is stable across processes.
+
+    The key is built from the topology and the class and attributes of every active feature.
+
+    Returns
+    -------
+    key : str or None
+        The key or None, if a feature has attributes, which can not be hashed reliably
+        (e.g. custom functions or reference trajectories).
+    """
+    import mdtraj
+    hasher = hashlib.md5()
+    top_key = _topology_key(featurizer.topology)
+    _update_hash(hasher, top_key)
+    try:
+        for f in featurizer.active_features:
+            _update_hash(hasher, f.__class__.__name__)
+            attrs = {k: (top_key if isinstance(v, mdtraj.Topology) else v) for k, v in vars(f).items()}
+            _update_hash(hasher, attrs)
+    except _NotHashable as e:
+        logger.debug('features of %s can not be cached: %s' % (featurizer, e))
+        return None
+    return hasher.hexdigest()
+
+
+class FeatureCache(object):
+
+    """ stores featurized trajectories as .npy files in the given directory.
+
+    Parameters
+    ----------
+    directory : str
+        the featurized trajectories are stored as one .npy file per key in this directory.
+
+    Notes
+    -----
+    The cache is bounded by config.feature_cache_max_size (MB). If it grows larger, the least recently
+    used entries are removed. Do not instantiate this yourself, but use the instance provided by
+    :meth:`instance`.
+
+    """
+    _instance = None
+
+    @staticmethod
+    def instance():
+        """ :returns the FeatureCache singleton instance or None, if there is no configuration directory."""
+        if FeatureCache._instance is None:
+            # if we do not have a configuration director yet, we do not want to store
+            if not config.cfg_dir:
+                return None
+            FeatureCache._instance = FeatureCache(os.path.join(config.cfg_dir, 'feature_cache'))
+
+        return FeatureCache._instance
+
+    def __init__(self, directory):
+        from pyemma.util.files import mkdir_p
+        self.directory = directory
+        mkdir_p(directory)
+        # total size in bytes, determined on first write
+        self._size = None
+
+    @staticmethod
+    def key(filename, featurizer_key, stride, skip):
+        """ key of the featurized trajectory in given file, read with given stride.
+
+        Since the frames skip, skip + stride, ... are stored for the phase skip % stride, reads with skips
+        of the same phase share an entry.
+        """
+        from pyemma.coordinates.data.util.traj_info_cache import TrajectoryInfoCache
+        hasher = hashlib.md5()
+        file_hash = TrajectoryInfoCache.instance()._get_file_hash_v2(filename)
+        _update_hash(hasher, [file_hash, featurizer_key, int(stride), int(skip) % int(stride)])
+        return hasher.hexdigest()
+
+    @property
+    def max_size(self):
+        """ maximum size of the cache in bytes. """
+        return config.feature_cache_max_size * 1024**2
+
+    @property
+    def num_entries(self):
+        return len(self._files())
+
+    def _filename(self, key):
+        return os.path.join(self.directory, key + '.npy')
+
+    def _files(self):
+        return [os.path.join(self.directory, f) for f in os.listdir(self.directory) if f.endswith('.npy')]
+
+    def get(self, key):
+        """ returns the featurized trajectory stored under key as a read only memory map or None. """
+        filename = self._filename(key)
+        try:
+            data = np.load(filename, mmap_mode='r')
+        except EnvironmentError:
+            return None
+        except ValueError as e:
+            logger.warning('could not read cached features "%s": %s' % (filename, e))
+            self._remove(filename)
+            return None
+        # the modification time is the time stamp of the last usage
+        try:
+            os.utime(filename, None)
+        except EnvironmentError:
+            pass
+        return data
+
+    def writer(self, key, n_frames):
+        """ creates a :class:`FeatureCacheWriter` for a trajectory of n_frames (strided) frames. """
+        return FeatureCacheWriter(self, key, n_frames)
+
+    def _commit(self, tmp, key):
+        getattr(os, 'replace', os.rename)(tmp, self._filename(key))
+        if self._size is None:
+            self._size = sum(os.stat(f).st_size for f in self._files())
+        else:
+            self._size += os.stat(self._filename(key)).st_size
+        if self._size > self.max_size:
+            self._clean()
+
+    def _remove(self, filename):
+        try:
+            os.unlink(filename)
+        except EnvironmentError:
+            pass
+
+    def _clean(self):
+        """ removes the least recently used entries, until the cache is smaller than 3/4 of its max size. """
+        entries = []
+        for f in self._files():
+            try:
+                stat = os.stat(f)
+            except EnvironmentError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, f))
+        entries.sort()
+        self._size = sum(e[1] for e in entries)
+        logger.info('Cleaning feature cache, because it is too large. Size: %.2fMB. Max_size: %sMB'
+                    % (self._size / 1024.**2, config.feature_cache_max_size))
+        for _, size, f in entries:
+            if self._size <= 0.75 * self.max_size:
+                break
+            self._remove(f)
+            self._size -= size
+
+    def clear(self):
+        for f in self._files():
+            self._remove(f)
+        self._size = None
+
+
+class FeatureCacheWriter(object):
+    """ writes the chunks of one trajectory to a temporary file, which becomes the cache entry on :meth:`commit`.
+
+    The file is allocated on the first chunk, since only then the dtype and dimension are known.
+    """
+    def __init__(self, cache, key, n_frames):
+        self._cache = cache
+        self._key = key
+        self._n_frames = n_frames
+        self._pos = 0
+        self._array = None
+        self._tmp = None
+
+    def append(self, X):
+        if self._array is None:
+            fd, self._tmp = tempfile.mkstemp(dir=self._cache.directory, suffix='.tmp')
+            os.close(fd)
+            self._array = np.lib.format.open_memmap(self._tmp, mode='w+', dtype=X.dtype,
+                                                    shape=(self._n_frames, X.shape[1]))
+        self._array[self._pos:self._pos + len(X)] = X
+        self._pos += len(X)
+
+    def commit(self):
+        if self._array is None:
+            return
+        complete = self._pos == self._n_frames
+        self._array.flush()
+        self._array = None
+        if complete:
+            try:
+                self._cache._commit(self._tmp, self._key)
+                return
+            except EnvironmentError:
+                logger.exception('could not store features in cache "%s"' % self._cache.directory)
+        self._cache._remove(self._tmp)
+
+    def discard(self):
+        if self._array is not None:
+            self._array = None
+            self._cache._remove(self._tmp)
@@ -17,9 +17,16 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 from __future__ import absolute_import
 
+import functools
 import itertools
+import os
+import shutil
+import tempfile
 from logging import getLogger
+from multiprocessing import cpu_count
+from multiprocessing.pool import ThreadPool
 
+import mdtraj as md
 import numpy as np
 
 from pyemma.coordinates import source
@@ -29,12 +36,13 @@ from pyemma.coordinates.data.util.reader_utils import (copy_traj_attributes as _
                                                        preallocate_empty_trajectory as _preallocate_empty_trajectory,
                                                        enforce_top as _enforce_top)
 
-__all__ = ['frames_from_files']
+__all__ = ['frames_from_files', 'frames_to_files']
 
 log = getLogger(__name__)
 
 
-def frames_from_files(files, top, frames, chunksize=1000, stride=1, verbose=False, copy_not_join=None, reader=None):
+def frames_from_files(files, top, frames, chunksize=1000, stride=1, verbose=False, copy_not_join=None, reader=None,
+                      n_jobs=None):
     """
     Constructs a Trajectory object out of given frames collected from files (or given reader).
 
@@ -46,6 +54,8 @@ def frames_from_files(files, top, frames, chunksize=1000, stride=1, verbose=Fals
     :param verbose:
     :param copy_not_join: not used
     :param reader: if a reader is given, ignore files and top param!
+    :param n_jobs: number of threads reading different trajectories concurrently.
+        If None, one thread per trajectory, but at most the number of CPUs, is used.
     :return: mdtra.Trajectory consisting out of frames indices.
     """
     # Enforce topology to be a md.Topology object
@@ -53,14 +63,7 @@ def frames_from_files(files, top, frames, chunksize=1000, stride=1, verbose=Fals
         top = _enforce_top(top)
         reader_given = False
     else:
-        if not reader.number_of_trajectories():
-            raise ValueError("need at least one trajectory file in reader.")
-        if isinstance(reader, FragmentedTrajectoryReader):
-            top = reader._readers[0][0].featurizer.topology
-        elif isinstance(reader, FeatureReader):
-            top = reader.featurizer.topology
-        else:
-            raise ValueError("unsupported reader (only md readers).")
+        top = _reader_topology(reader)
         reader_given = True
 
     stride = int(stride)
@@ -94,12 +97,166 @@ def frames_from_files(files, top, frames, chunksize=1000, stride=1, verbose=Fals
             mask = sorted_inds[:, 0] == itraj
             sorted_inds[mask, 0] = c
 
-        inds_to_check = np.arange(len(file_inds_unique))
+    _check_frame_indices(reader, sorted_inds, stride)
+
+    try:
+        # If the reader got passed in, it could have the data already mapped to memory.
+        # In this case, we cannot force it to return trajectory objects, so we have to re-create it.
+        if reader.in_memory:
+            reader = source(reader.filenames, top=top, chunk_size=chunksize)
+        # we want the FeatureReader to return mdtraj.Trajectory objects
+        _set_return_traj_objects(reader, True)
+        # read the frames of each trajectory on its own, concurrently for several trajectories.
+        inds_by_traj = np.split(sorted_inds, np.flatnonzero(np.diff(sorted_inds[:, 0])) + 1)
+        collected_frames = _map_threaded(functools.partial(_read_frames, reader, chunksize), inds_by_traj, n_jobs)
+        collected_frames = itertools.chain.from_iterable(collected_frames)
+        dest = _preallocate_empty_trajectory(top, len(frames))
+        t = 0
+        for chunk in collected_frames:
+            _copy_traj_attributes(dest, chunk, t)
+            t += len(chunk)
+        # reshuffle the indices of the final trajectory object to obtain the desired order
+        dest = dest.slice(sort_inds.argsort(), copy=False)
+    finally:
+        # in any case we want to reset the reader to its previous state (return features, instead of md.Trajectory)
+        if reader_given:
+            _set_return_traj_objects(reader, False)
+    return dest
+
+
+def frames_to_files(reader, frames, outfiles, chunksize=1000, stride=1, n_jobs=None):
+    """
+    Writes sets of frames of the given reader to trajectory files, streaming over the input only once.
+
+    Every needed frame is read once and routed to temporary memory maps of all output trajectories containing it.
+    Afterwards the output files are written chunk-wise from these, so the memory usage is bounded by the chunk size.
+
+    :param reader: FeatureReader or FragmentedTrajectoryReader
+    :param frames: list of index arrays (T_i, 2), one per output file
+    :param outfiles: list of output filenames, the format is determined by the extension.
+    :param chunksize:
+    :param stride:
+    :param n_jobs: number of threads reading different trajectories concurrently.
+        If None, one thread per trajectory, but at most the number of CPUs, is used.
+    """
+    top = _reader_topology(reader)
+    frames = [np.array(f, dtype=int) for f in frames]
+    for f in frames:
+        f[:, 1] *= int(stride)
+    lengths = [len(f) for f in frames]
+    all_inds = np.vstack(frames)
+    out_ids = np.repeat(np.arange(len(frames)), lengths)
+    out_pos = np.concatenate([np.arange(n) for n in lengths])
+
+    # sort by file and frame index and read frames requested by several outputs only once.
+    sort_inds = np.lexsort((all_inds[:, 1], all_inds[:, 0]))
+    sorted_inds = all_inds[sort_inds]
+    out_ids, out_pos = out_ids[sort_inds], out_pos[sort_inds]
+    is_first = np.ones(len(sorted_inds), dtype=bool)
+    is_first[1:] = np.any(sorted_inds[1:] != sorted_inds[:-1], axis=1)
+    unique_inds = sorted_inds[is_first]
+    # rows of the sorted indices, which request the unique frames [first_row[u], first_row[u + 1])
+    first_row = np.append(np.flatnonzero(is_first), len(sorted_inds))
+
+    _check_frame_indices(reader, unique_inds, stride)
+
+    tmp_dir = tempfile.mkdtemp(prefix='pyemma_frames_to_files_')
+    buffers = [_FrameBuffer(os.path.join(tmp_dir, str(i)), n, top.n_atoms) for i, n in enumerate(lengths)]
+
+    def route(span):
+        start, stop = span
+        it = reader.iterator(chunk=chunksize, stride=unique_inds[start:stop], return_trajindex=False)
+        with it:
+            for chunk in it:
+                rows = slice(first_row[start], first_row[start + len(chunk)])
+                local = np.repeat(np.arange(len(chunk)), np.diff(first_row[start:start + len(chunk) + 1]))
+                for out_id in np.unique(out_ids[rows]):
+                    mask = out_ids[rows] == out_id
+                    buffers[out_id].put(out_pos[rows][mask], chunk, local[mask])
+                start += len(chunk)
+
+    reader_in_memory = reader.in_memory
+    try:
+        if reader_in_memory:
+            reader = source(reader.filenames, top=top, chunk_size=chunksize)
+        _set_return_traj_objects(reader, True)
+        bounds = np.append(np.flatnonzero(np.diff(unique_inds[:, 0])) + 1, [0, len(unique_inds)])
+        bounds.sort()
+        _map_threaded(route, [(a, b) for a, b in zip(bounds[:-1], bounds[1:]) if b > a], n_jobs)
+        for buffer, outfile in zip(buffers, outfiles):
+            buffer.write(outfile, top, chunksize)
+    finally:
+        if not reader_in_memory:
+            _set_return_traj_objects(reader, False)
+        buffers = None
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+class _FrameBuffer(object):
+    """ memory mapped coordinates, time and unit cell of an output trajectory. """
+
+    def __init__(self, prefix, n_frames, n_atoms):
+        self.n_frames = n_frames
+
+        def allocate(name, shape):
+            if n_frames == 0:
+                return np.zeros(shape, dtype=np.float32)
+            return np.memmap(prefix + name, dtype=np.float32, mode='w+', shape=shape)
+        self.xyz = allocate('xyz', (n_frames, n_atoms, 3))
+        self.time = allocate('time', (n_frames, ))
+        self.unitcell_lengths = allocate('lengths', (n_frames, 3))
+        self.unitcell_angles = allocate('angles', (n_frames, 3))
+
+    def put(self, positions, traj, frames):
+        self.xyz[positions] = traj.xyz[frames]
+        self.time[positions] = traj.time[frames]
+        if traj.unitcell_lengths is not None:
+            self.unitcell_lengths[positions] = traj.unitcell_lengths[frames]
+            self.unitcell_angles[positions] = traj.unitcell_angles[frames]
+
+    def trajectory(self, top, start=0, stop=None):
+        frames = slice(start, stop)
+        return md.Trajectory(np.array(self.xyz[frames]), top, time=np.array(self.time[frames]),
+                             unitcell_lengths=np.array(self.unitcell_lengths[frames]),
+                             unitcell_angles=np.array(self.unitcell_angles[frames]))
+
+    def write(self, filename, top, chunksize):
+        """ writes the buffered frames to the given file, chunk-wise for formats supporting it. """
+        if os.path.splitext(filename)[1].lower() not in ('.xtc', '.trr', '.dcd'):
+            self.trajectory(top).save(filename)
+            return
+        if chunksize == 0:
+            chunksize = max(self.n_frames, 1)
+        with md.open(filename, 'w') as f:
+            for start in range(0, self.n_frames, chunksize):
+                _write_chunk(f, self.trajectory(top, start, start + chunksize))
+
+
+def _write_chunk(f, traj):
+    from mdtraj.formats import DCDTrajectoryFile
+    from mdtraj.utils import in_units_of
+    unit = md.Trajectory._distance_unit
+    xyz = in_units_of(traj.xyz, unit, f.distance_unit)
+    if isinstance(f, DCDTrajectoryFile):
+        f.write(xyz, cell_lengths=in_units_of(traj.unitcell_lengths, unit, f.distance_unit),
+                cell_angles=traj.unitcell_angles)
     else:
-        inds_to_check = file_inds_unique
+        f.write(xyz=xyz, time=traj.time, box=in_units_of(traj.unitcell_vectors, unit, f.distance_unit))
+
+
+def _reader_topology(reader):
+    if not reader.number_of_trajectories():
+        raise ValueError("need at least one trajectory file in reader.")
+    if isinstance(reader, FragmentedTrajectoryReader):
+        return reader._readers[0][0].featurizer.topology
+    elif isinstance(reader, FeatureReader):
+        return reader.featurizer.topology
+    raise ValueError("unsupported reader (only md readers).")
+
 
+def _check_frame_indices(reader, sorted_inds, stride):
     # sanity check of indices
-    for itraj in inds_to_check:
+    for itraj in np.unique(sorted_inds[:, 0]):
         inds_by_traj = sorted_inds[sorted_inds[:, 0] == itraj][:, 1]
         assert inds_by_traj.ndim == 1
         largest_ind_in_traj = np.max(inds_by_traj)
@@ -114,37 +271,35 @@ def frames_from_files(files, top, frames, chunksize=1000, stride=1, verbose=Fals
                                 filename=reader.filenames[itraj],
                                 length=length))
 
-    def set_reader_return_traj_objects(reader, flag):
-        if isinstance(reader, FeatureReader):
-            reader._return_traj_obj = flag
-        elif isinstance(reader, FragmentedTrajectoryReader):
-            for file in reader.filenames_flat:
-                r = reader.reader_by_filename(file)
-                if isinstance(r, FeatureReader):
-                    r = [r]
-                for _r in r:
-                    _r._return_traj_obj = flag
 
-    try:
-        # If the reader got passed in, it could have the data already mapped to memory.
-        # In this case, we cannot force it to return trajectory objects, so we have to re-create it.
-        if reader.in_memory:
-            reader = source(reader.filenames, top=top, chunk_size=chunksize)
-        # we want the FeatureReader to return mdtraj.Trajectory objects
-        set_reader_return_traj_objects(reader, True)
-        it = reader.iterator(chunk=chunksize, stride=sorted_inds, return_trajindex=False)
+def _set_return_traj_objects(reader, flag):
+    if isinstance(reader, FeatureReader):
+        reader._return_traj_obj = flag
+    elif isinstance(reader, FragmentedTrajectoryReader):
+        for file in reader.filenames_flat:
+            r = reader.reader_by_filename(file)
+            if isinstance(r, FeatureReader):
+                r = [r]
+            for _r in r:
+                _r._return_traj_obj = flag
 
-        with it:
-            collected_frames = [f for f in it]
-        dest = _preallocate_empty_trajectory(top, len(frames))
-        t = 0
-        for chunk in collected_frames:
-            _copy_traj_attributes(dest, chunk, t)
-            t += len(chunk)
-        # reshuffle the indices of the final trajectory object to obtain the desired order
-        dest = dest.slice(sort_inds.argsort(), copy=False)
+
+def _map_threaded(func, args, n_jobs):
+    # maps func over args in a pool of n_jobs threads (None: number of CPUs).
+    if n_jobs is None:
+        n_jobs = cpu_count()
+    n_jobs = min(n_jobs, len(args))
+    if n_jobs <= 1:
+        return [func(a) for a in args]
+    pool = ThreadPool(n_jobs)
+    try:
+        return pool.map(func, args)
     finally:
-        # in any case we want to reset the reader to its previous state (return features, instead of md.Trajectory)
-        if reader_given:
-            set_reader_return_traj_objects(reader, False)
-    return dest
+        pool.terminate()
+        pool.join()
+
+
+def _read_frames(reader, chunksize, inds):
+    it = reader.iterator(chunk=chunksize, stride=inds, return_trajindex=False)
+    with it:
+        return [f for f in it]
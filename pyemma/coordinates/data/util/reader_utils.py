@@ -26,7 +26,7 @@ import os
 from six import string_types
 
 
-def create_file_reader(input_files, topology, featurizer, chunk_size=1000, **kw):
+def create_file_reader(input_files, topology, featurizer, chunk_size=1000, n_jobs=1, **kw):
     r"""
     Creates a (possibly featured) file reader by a number of input files and either a topology file or a featurizer.
     Parameters
@@ -39,12 +39,19 @@ def create_file_reader(input_files, topology, featurizer, chunk_size=1000, **kw)
         A featurizer. If given, the topology file can be None.
     :param chunk_size:
         The chunk size with which the corresponding reader gets initialized.
+    :param n_jobs:
+        The number of worker processes of trajectory and csv readers.
     :return: Returns the reader.
     """
     from pyemma.coordinates.data.numpy_filereader import NumPyFileReader
     from pyemma.coordinates.data.py_csv_reader import PyCSVReader
     from pyemma.coordinates.data import FeatureReader
     from pyemma.coordinates.data.fragmented_trajectory_reader import FragmentedTrajectoryReader
+    from pyemma.coordinates.data.store_reader import StoreReader, is_store
+
+    # stores written by Iterable.write_to_store
+    if isinstance(input_files, string_types) and is_store(input_files):
+        return StoreReader(input_files, chunksize=chunk_size)
 
     # fragmented trajectories
     if (isinstance(input_files, (list, tuple)) and len(input_files) > 0 and
@@ -98,13 +105,13 @@ def create_file_reader(input_files, topology, featurizer, chunk_size=1000, **kw)
                                          "featurizer or a topology file.")
 
                     reader = FeatureReader(input_list, featurizer=featurizer, topologyfile=topology,
-                                           chunksize=chunk_size)
+                                           chunksize=chunk_size, n_jobs=n_jobs)
                 else:
                     if suffix in ['.npy', '.npz']:
                         reader = NumPyFileReader(input_list, chunksize=chunk_size)
                     # otherwise we assume that given files are ascii tabulated data
                     else:
-                        reader = PyCSVReader(input_list, chunksize=chunk_size, **kw)
+                        reader = PyCSVReader(input_list, chunksize=chunk_size, n_jobs=n_jobs, **kw)
         else:
             raise ValueError("Not all elements in the input list were of the type %s!" % suffix)
     else:
@@ -56,6 +56,20 @@ class AbstractDB(object):
         # should raise KeyError in case of non existent key
         pass
 
+    def get_many(self, keys):
+        # returns a dict of the values of all existing keys
+        result = {}
+        for key in keys:
+            try:
+                result[key] = self.get(key)
+            except KeyError:
+                pass
+        return result
+
+    def set_many(self, values):
+        for value in values:
+            self.set(value)
+
     @property
     def db_version(self):
         pass
@@ -120,7 +134,7 @@ class SqliteDB(AbstractDB):
         sqlite3.register_converter("NPARRAY", convert_array)
         self._database = sqlite3.connect(filename if filename is not None else ":memory:",
                                          detect_types=sqlite3.PARSE_DECLTYPES, timeout=1000*1000,
-                                         isolation_level=None)
+                                         isolation_level=None, check_same_thread=False)
         self.filename = filename
 
         try:
@@ -204,17 +218,43 @@ class SqliteDB(AbstractDB):
         self._database.commit()
 
         self._update_time_stamp(hash_value=traj_info.hash_value)
-
-        if self.filename is not None:
+        self._clean_if_needed()
+
+    def set_many(self, traj_infos):
+        """ stores the given TrajInfo objects in a single transaction. """
+        infos = list({info.hash_value: info for info in traj_infos}.values())
+        values = [(info.hash_value, info.length, info.ndim, np.array(info.offsets), info.abs_path,
+                   TrajectoryInfoCache.DB_VERSION, self._database_from_key(info.hash_value))
+                  for info in infos]
+        self._database.execute("BEGIN")
+        with self._database:
+            self._database.executemany("INSERT OR REPLACE INTO traj_info "
+                                       "(hash, length, ndim, offsets, abs_path, version, lru_db)"
+                                       "VALUES (?, ?, ?, ?, ?, ?, ?)", values)
+        self._update_time_stamps([info.hash_value for info in infos])
+        self._clean_if_needed()
+
+    def _clean_if_needed(self):
+        # after a bulk insert, several cleaning rounds may be needed to get below the limits.
+        if self.filename is None:
+            return
+        while True:
+            num_entries = self.num_entries
             current_size = os.stat(self.filename).st_size
-            if (self.num_entries >= config.traj_info_max_entries or
-                    # current_size is in bytes, while traj_info_max_size is in MB
-                    1.*current_size / 1024**2 >= config.traj_info_max_size):
-                logger.info("Cleaning database because it has too much entries or is too large.\n"
-                            "Entries: %s. Size: %.2fMB. Configured max_entires: %s. Max_size: %sMB"
-                            % (self.num_entries, (current_size*1.0 / 1024**2),
-                               config.traj_info_max_entries, config.traj_info_max_size))
-                self._clean(n=self.clean_n_entries)
+            # current_size is in bytes, while traj_info_max_size is in MB
+            too_large = 1.*current_size / 1024**2 >= config.traj_info_max_size
+            if num_entries == 0 or not (num_entries >= config.traj_info_max_entries or too_large):
+                break
+            logger.info("Cleaning database because it has too much entries or is too large.\n"
+                        "Entries: %s. Size: %.2fMB. Configured max_entires: %s. Max_size: %sMB"
+                        % (num_entries, (current_size*1.0 / 1024**2),
+                           config.traj_info_max_entries, config.traj_info_max_size))
+            self._clean(n=self.clean_n_entries)
+            if self.num_entries == num_entries:
+                break
+            if too_large:
+                # the pages of deleted entries are only reused by later inserts, so shrink the file.
+                self._database.execute("VACUUM")
 
     def get(self, key):
         cursor = self._database.execute("SELECT * FROM traj_info WHERE hash=?", (key,))
@@ -225,6 +265,26 @@ class SqliteDB(AbstractDB):
         self._update_time_stamp(key)
         return info
 
+    # sqlite limits the number of parameters per statement to 999 by default.
+    _MAX_QUERY_PARAMS = 900
+
+    def get_many(self, keys):
+        """ returns a dict of the TrajInfo objects of all contained keys. Rows, which can not be interpreted,
+        are omitted. """
+        keys = list(set(keys))
+        result = {}
+        for start in range(0, len(keys), SqliteDB._MAX_QUERY_PARAMS):
+            batch = keys[start:start + SqliteDB._MAX_QUERY_PARAMS]
+            cursor = self._database.execute("SELECT * FROM traj_info WHERE hash IN (%s)"
+                                            % ', '.join('?' * len(batch)), batch)
+            for row in cursor.fetchall():
+                try:
+                    result[row[0]] = self._create_traj_info(row)
+                except UnknownDBFormatException:
+                    pass
+        self._update_time_stamps(list(result.keys()))
+        return result
+
     def _database_from_key(self, key):
         """
         gets the database name for the given key. Should ensure a uniform spread
@@ -253,24 +313,23 @@ class SqliteDB(AbstractDB):
     def _update_time_stamp(self, hash_value):
         """ timestamps are being stored distributed over several lru databases.
         The timestamp is a time.time() snapshot (float), which are seconds since epoch."""
-        db_name = self._database_from_key(hash_value)
-        if not db_name:
-            db_name=':memory:'
+        self._update_time_stamps([hash_value])
 
+    def _update_time_stamps(self, hash_values):
+        """ updates the timestamps of all given hash values with one transaction per lru database. """
         import sqlite3
-
-        with sqlite3.connect(db_name) as conn:
-            """ last_read is a result of time.time()"""
-            conn.execute('CREATE TABLE IF NOT EXISTS usage '
-                         '(hash VARCHAR(32), last_read FLOAT)')
-            conn.commit()
-            cur = conn.execute('select * from usage where hash=?', (hash_value,))
-            row = cur.fetchone()
-            if not row:
-                conn.execute("insert into usage(hash, last_read) values(?, ?)", (hash_value, time.time()))
-            else:
-                conn.execute("update usage set last_read=? where hash=?", (time.time(), hash_value))
-            conn.commit()
+        by_db = {}
+        for hash_value in hash_values:
+            by_db.setdefault(self._database_from_key(hash_value) or ':memory:', []).append(hash_value)
+
+        now = time.time()
+        for db_name, values in by_db.items():
+            with sqlite3.connect(db_name) as conn:
+                """ last_read is a result of time.time()"""
+                conn.execute('CREATE TABLE IF NOT EXISTS usage '
+                             '(hash VARCHAR(32), last_read FLOAT)')
+                conn.executemany("delete from usage where hash=?", [(v, ) for v in values])
+                conn.executemany("insert into usage(hash, last_read) values(?, ?)", [(v, now) for v in values])
 
     @staticmethod
     def _create_traj_info(row):
@@ -340,7 +399,8 @@ class SqliteDB(AbstractDB):
         age_by_hash.sort(key=itemgetter(1))
         if len(age_by_hash)>=2:
             assert[age_by_hash[-1] > age_by_hash[-2]]
-        ids = map(itemgetter(0), age_by_hash[:num_delete])
+        deleted = age_by_hash[:num_delete]
+        ids = map(itemgetter(0), deleted)
         ids = tuple(map(str, ids))
 
         sql_compatible_ids = SqliteDB._format_tuple_for_sql(ids)
@@ -351,8 +411,8 @@ class SqliteDB(AbstractDB):
         assert cur.rowcount == len(ids), "deleted not as many rows(%s) as desired(%s)" %(cur.rowcount, len(ids))
 
         # iterate over all LRU databases and delete those ids, we've just deleted from the main db.
-        age_by_hash.sort(key=itemgetter(2))
-        for db, values in itertools.groupby(age_by_hash, key=itemgetter(2)):
+        deleted.sort(key=itemgetter(2))
+        for db, values in itertools.groupby(deleted, key=itemgetter(2)):
             values = tuple(v[0] for v in values)
             with sqlite3.connect(db, timeout=self.lru_timeout) as conn:
                     stmnt = "DELETE FROM usage WHERE hash IN (%s)" \
@@ -25,6 +25,7 @@ from __future__ import absolute_import
 import hashlib
 import os
 import sys
+import threading
 import warnings
 from io import BytesIO
 from logging import getLogger
@@ -132,17 +133,20 @@ class TrajectoryInfoCache(object):
     """
     _instance = None
     DB_VERSION = 2
+    # serializes the creation of the instance and the access to the database, which is shared by all threads.
+    _lock = threading.RLock()
 
     @staticmethod
     def instance():
         """ :returns the TrajectoryInfoCache singleton instance"""
-        if TrajectoryInfoCache._instance is None:
-            # if we do not have a configuration director yet, we do not want to store
-            if not config.cfg_dir:
-                filename = None
-            else:
-                filename = os.path.join(config.cfg_dir, "traj_info.sqlite3")
-            TrajectoryInfoCache._instance = TrajectoryInfoCache(filename)
+        with TrajectoryInfoCache._lock:
+            if TrajectoryInfoCache._instance is None:
+                # if we do not have a configuration director yet, we do not want to store
+                if not config.cfg_dir:
+                    filename = None
+                else:
+                    filename = os.path.join(config.cfg_dir, "traj_info.sqlite3")
+                TrajectoryInfoCache._instance = TrajectoryInfoCache(filename)
 
         return TrajectoryInfoCache._instance
 
@@ -164,11 +168,13 @@ class TrajectoryInfoCache(object):
 
     @property
     def current_db_version(self):
-        return self._database.db_version
+        with self._lock:
+            return self._database.db_version
 
     @property
     def num_entries(self):
-        return self._database.num_entries
+        with self._lock:
+            return self._database.num_entries
 
     def _handle_csv(self, reader, filename, length):
         # this is maybe a bit ugly, but so far we do not store the dialect of csv files in
@@ -183,30 +189,113 @@ class TrajectoryInfoCache(object):
         filename, reader = filename_reader_tuple
         abs_path = os.path.abspath(filename)
         key = self._get_file_hash_v2(filename)
-        try:
-            info = self._database.get(key)
-            if not isinstance(info, TrajInfo):
-                raise KeyError()
-            self._handle_csv(reader, filename, info.length)
-            # if path has changed, update it
-            if not info.abs_path == abs_path:
+        with self._lock:
+            try:
+                info = self._database.get(key)
+                if not isinstance(info, TrajInfo):
+                    raise KeyError()
+                self._handle_csv(reader, filename, info.length)
+                # if path has changed, update it
+                if not info.abs_path == abs_path:
+                    info.abs_path = abs_path
+                    self._database.update(info)
+            # handle cache misses and not interpretable results by re-computation.
+            # Note: this also handles UnknownDBFormatExceptions!
+            except KeyError:
+                info = reader._get_traj_info(filename)
+                info.hash_value = key
                 info.abs_path = abs_path
-                self._database.update(info)
-        # handle cache misses and not interpretable results by re-computation.
-        # Note: this also handles UnknownDBFormatExceptions!
-        except KeyError:
-            info = reader._get_traj_info(filename)
-            info.hash_value = key
-            info.abs_path = abs_path
-            # store info in db
-            self.__setitem__(info)
-
-            # save forcefully now
-            if hasattr(self._database, 'sync'):
-                self._database.sync()
+                # store info in db
+                self.__setitem__(info)
+
+                # save forcefully now
+                if hasattr(self._database, 'sync'):
+                    self._database.sync()
 
         return info
 
+    def get_many(self, filenames, reader, n_jobs=None, callback=None):
+        """ looks up the TrajInfo objects of all given files at once.
+
+        The files are hashed concurrently and all hashes are resolved with one database query. The infos of
+        files not contained in the cache are computed by a pool of threads and stored in a single transaction.
+
+        Parameters
+        ----------
+        filenames : list of str
+            files read by the given reader.
+        reader : DataSource
+            reader used to compute the infos of files not contained in the cache.
+        n_jobs : int or None
+            number of threads, if None the number of CPUs is used.
+        callback : callable or None
+            called with the number of files, which have been resolved since the last call.
+
+        Returns
+        -------
+        infos : list of TrajInfo
+            the infos in the order of the given files.
+        """
+        if not filenames:
+            return []
+        from pyemma.coordinates.data import PyCSVReader
+        unknown = set(filenames).difference(reader.filenames)
+        if unknown:
+            raise ValueError('%s does not read the files %s' % (reader.__class__.__name__, sorted(unknown)))
+        if n_jobs is None:
+            from multiprocessing import cpu_count
+            n_jobs = cpu_count()
+        from multiprocessing.pool import ThreadPool
+        pool = ThreadPool(max(1, min(n_jobs, len(filenames))))
+        try:
+            keys = pool.map(self._get_file_hash_v2, filenames)
+            infos = [None] * len(filenames)
+            with self._lock:
+                found = self._database.get_many(keys)
+                for i, (filename, key) in enumerate(zip(filenames, keys)):
+                    info = found.get(key)
+                    if not isinstance(info, TrajInfo):
+                        continue
+                    self._handle_csv(reader, filename, info.length)
+                    # if path has changed, update it
+                    abs_path = os.path.abspath(filename)
+                    if not info.abs_path == abs_path:
+                        info.abs_path = abs_path
+                        self._database.update(info)
+                    infos[i] = info
+            if callback is not None:
+                callback(len(filenames) - infos.count(None))
+
+            # handle cache misses and not interpretable results by re-computation.
+            def compute(i):
+                info = reader._get_traj_info(filenames[i])
+                info.hash_value = keys[i]
+                info.abs_path = os.path.abspath(filenames[i])
+                return info
+            # files given several times are only computed once.
+            misses = {}
+            for i, info in enumerate(infos):
+                if info is None:
+                    misses.setdefault(keys[i], []).append(i)
+            misses = list(misses.values())
+            # the csv reader stores the dialect of each file while computing its info, so it is not thread safe.
+            compute_map = map if isinstance(reader, PyCSVReader) else pool.imap
+            for indices, info in zip(misses, compute_map(compute, [indices[0] for indices in misses])):
+                for i in indices:
+                    infos[i] = info
+                if callback is not None:
+                    callback(len(indices))
+        finally:
+            pool.terminate()
+            pool.join()
+
+        if misses:
+            with self._lock:
+                self._database.set_many([infos[indices[0]] for indices in misses])
+                if hasattr(self._database, 'sync'):
+                    self._database.sync()
+        return infos
+
     def _get_file_hash(self, filename):
         statinfo = os.stat(filename)
 
@@ -240,11 +329,14 @@ class TrajectoryInfoCache(object):
         return hasher.hexdigest()
 
     def __setitem__(self, traj_info):
-        self._database.set(traj_info)
+        with self._lock:
+            self._database.set(traj_info)
 
     def clear(self):
-        self._database.clear()
+        with self._lock:
+            self._database.clear()
 
     def close(self):
         """ you most likely never want to call this! """
-        self._database.close()
+        with self._lock:
+            self._database.close()
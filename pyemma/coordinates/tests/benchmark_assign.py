@@ -0,0 +1,59 @@
+from __future__ import absolute_import
+from __future__ import print_function
+
+import time
+import numpy as np
+
+from pyemma.coordinates.clustering.center_index import BruteForceIndex, KDTreeIndex
+
+
+def genX(L, N, n_states=20):
+    """ Generates L points in N dimensions, distributed around n_states metastable states (like TICA output) """
+    means = 5 * np.random.randn(n_states, N)
+    states = np.random.randint(0, n_states, size=L)
+    return (means[states] + np.random.randn(L, N)).astype(np.float32)
+
+
+def mytime_assign(index, X, n_jobs=1, nrep=3):
+    t1 = time.time()
+    for r in range(nrep):
+        index.assign(X, n_jobs)
+    t2 = time.time()
+    # return mean time
+    return (t2-t1)/float(nrep)
+
+
+def benchmark_assign(L=100000, K=5000, nrep=3, n_jobs=1):
+    Ns = [2, 3, 4, 6, 8, 10]
+    rows = ['L, frames', 'K, centers', 'N, dimensions', 'time brute force', 'time kd-tree', 'speed-up']
+    table = np.zeros((6, len(Ns)))
+    for k, N in enumerate(Ns):
+        X = genX(L, N)
+        centers = X[np.random.choice(L, K, replace=False)]
+        brute_force = BruteForceIndex(centers)
+        kdtree = KDTreeIndex(centers)
+        assert np.all(brute_force.assign(X, n_jobs) == kdtree.assign(X, n_jobs))
+        table[:3, k] = L, K, N
+        table[3, k] = mytime_assign(brute_force, X, n_jobs=n_jobs, nrep=nrep)
+        table[4, k] = mytime_assign(kdtree, X, n_jobs=n_jobs, nrep=nrep)
+    table[5, :] = table[3] / table[4]
+
+    print('assign\tn_jobs = ' + str(n_jobs))
+    print(rows[0] + ('\t%i' * table.shape[1]) % tuple(table[0]))
+    print(rows[1] + ('\t%i' * table.shape[1]) % tuple(table[1]))
+    print(rows[2] + ('\t%i' * table.shape[1]) % tuple(table[2]))
+    print(rows[3] + ('\t%.3f' * table.shape[1]) % tuple(table[3]))
+    print(rows[4] + ('\t%.3f' * table.shape[1]) % tuple(table[4]))
+    print(rows[5] + ('\t%.3f' * table.shape[1]) % tuple(table[5]))
+    print()
+
+
+def main():
+    LKs = [(100000, 500, 5), (100000, 2000, 3), (100000, 5000, 3), (100000, 20000, 1)]
+    for L, K, nrep in LKs:
+        benchmark_assign(L=L, K=K, nrep=nrep, n_jobs=1)
+        benchmark_assign(L=L, K=K, nrep=nrep, n_jobs=4)
+
+
+if __name__ == "__main__":
+    main()
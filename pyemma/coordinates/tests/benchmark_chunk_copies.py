@@ -0,0 +1,64 @@
+from __future__ import absolute_import
+from __future__ import print_function
+
+import os
+import time
+import numpy as np
+
+from pyemma.coordinates import source
+from pyemma.coordinates.clustering import regspatial
+from pyemma.util.files import TemporaryDirectory
+
+
+def converted_copy(X):
+    """ the float32 copy of a chunk, which had to be made before the kernels accepted float64 and strided rows """
+    return np.require(X, dtype=np.float32, requirements='C')
+
+
+def assign_chunks(reader, centers, stride, convert, n_jobs=1):
+    """ assigns all chunks of reader and returns the time and the number of bytes of conversion copies """
+    copied_bytes = 0
+    t1 = time.time()
+    with reader.iterator(stride=stride, return_trajindex=False) as it:
+        for X in it:
+            if convert:
+                Y = converted_copy(X)
+                if Y is not X:
+                    copied_bytes += Y.nbytes
+                X = Y
+            dtraj = np.empty(len(X), dtype=np.int32)
+            regspatial.assign(X, centers, dtraj, 'euclidean', n_jobs)
+    t2 = time.time()
+    return t2 - t1, copied_bytes
+
+
+def benchmark_chunk_copies(L=500000, N=10, K=200, chunksize=10000, nrep=3):
+    dtypes = [np.float32, np.float64]
+    strides = [1, 2, 5]
+    print('NumPyFileReader: %i frames, %i dimensions, %i centers, chunksize %i' % (L, N, K, chunksize))
+    print('dtype\tstride\ttime (copy)\ttime (no copy)\tMB saved')
+    with TemporaryDirectory() as td:
+        for dtype in dtypes:
+            fn = os.path.join(td, 'data_%s.npy' % np.dtype(dtype).name)
+            X = np.random.randn(L, N).astype(dtype)
+            np.save(fn, X)
+            centers = X[np.random.choice(L, K, replace=False)].astype(np.float32)
+            reader = source(fn, chunk_size=chunksize)
+            for stride in strides:
+                t_copy = min(assign_chunks(reader, centers, stride, convert=True)[0] for _ in range(nrep))
+                t_no_copy = min(assign_chunks(reader, centers, stride, convert=False)[0] for _ in range(nrep))
+                saved = assign_chunks(reader, centers, stride, convert=True)[1]
+                print('%s\t%i\t%.3f\t\t%.3f\t\t%.1f' % (np.dtype(dtype).name, stride, t_copy, t_no_copy,
+                                                       saved / 1024. ** 2))
+            del reader
+    print()
+
+
+def main():
+    benchmark_chunk_copies(N=3)
+    benchmark_chunk_copies(N=10)
+    benchmark_chunk_copies(N=100, L=100000)
+
+
+if __name__ == "__main__":
+    main()
@@ -107,8 +107,9 @@ class TestApiSourceFileReader(unittest.TestCase):
         self.assertTrue(isinstance(reader, CSVReader), "Should be a CSVReader.")
 
     def test_bullshit_csv(self):
-        # this file is not parseable as tabulated float file
-        self.assertRaises(ValueError, api.source, self.bs)
+        # this file is not parseable as tabulated float file, which is noticed when its info is resolved.
+        reader = api.source(self.bs)
+        self.assertRaises(ValueError, reader.trajectory_lengths)
 
 import pkg_resources
 class TestApiSourceFeatureReader(unittest.TestCase):
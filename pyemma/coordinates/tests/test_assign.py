@@ -248,6 +248,105 @@ class TestClusterAssign(unittest.TestCase):
 
         np.testing.assert_equal(assignment_mp, assignment_sp)
 
+    def test_assignment_ties(self):
+        # duplicated centers have to be resolved to the smallest index, like a brute force search does.
+        centers = np.array([[0, 0], [1, 1], [0, 0], [1, 1], [2, 2]], dtype=np.float32)
+        X = np.array([[0, 0], [1, 1], [0.5, 0.5], [2, 2], [1.5, 1.5]], dtype=np.float32)
+        dtraj = coor.assign_to_centers(X, centers, n_jobs=1)[0]
+        np.testing.assert_equal(dtraj, [0, 1, 0, 4, 1])
+
+    def test_assignment_blocked_vs_brute_force(self):
+        # many frames and centers, so that several frame blocks are processed.
+        np.random.seed(0)
+        X = np.random.random((20000, 5)).astype(np.float32)
+        centers = X[np.random.choice(len(X), 500, replace=False)]
+        dtraj = coor.assign_to_centers(X, centers, n_jobs=2, chunk_size=5000)[0]
+
+        expected = np.empty(len(X), dtype=int)
+        for i in range(0, len(X), 1000):
+            diff = X[i:i + 1000, np.newaxis, :].astype(np.float64) - centers[np.newaxis, :, :]
+            expected[i:i + 1000] = np.argmin(np.sum(diff * diff, axis=2), axis=1)
+        np.testing.assert_equal(dtraj, expected)
+
+    def test_index_methods_identical(self):
+        from pyemma.coordinates.clustering.center_index import KDTreeIndex, BruteForceIndex
+        np.random.seed(1)
+        X = np.round(np.random.randn(10000, 3), 2).astype(np.float32)
+        centers = X[np.random.choice(len(X), 1500)].copy()
+        # duplicated centers and frames lying exactly on centers
+        centers[10] = centers[20]
+        X[:100] = centers[:100]
+        X[200, 1] = np.nan
+
+        c = coor.assign_to_centers(X, centers, return_dtrajs=False, n_jobs=1)
+        self.assertIsInstance(c.center_index, KDTreeIndex)
+        dtraj_kdtree = c.dtrajs[0]
+        c.index_method = 'brute_force'
+        self.assertIsInstance(c.center_index, BruteForceIndex)
+        np.testing.assert_equal(c.transform(X)[:, 0], dtraj_kdtree)
+        self.assertEqual(dtraj_kdtree[200], -1)
+
+    def test_index_rebuilt_on_new_centers(self):
+        c = coor.assign_to_centers(self.X, self.centers, return_dtrajs=False, n_jobs=1)
+        index = c.center_index
+        self.assertIs(c.center_index, index)
+        c.clustercenters = self.centers[::-1]
+        self.assertIsNot(c.center_index, index)
+        np.testing.assert_equal(c.transform(self.centers)[:, 0], np.arange(len(self.centers))[::-1])
+
+    def test_minrmsd_precentered_centers(self):
+        from pyemma.coordinates.clustering import regspatial
+        np.random.seed(2)
+        X = np.random.randn(1000, 30).astype(np.float32)
+        centers = X[np.random.choice(len(X), 50, replace=False)]
+        expected = np.empty(len(X), dtype=np.int32)
+        regspatial.assign(X, centers, expected, 'minRMSD', 1)
+
+        precentered, traces = regspatial.precenter(centers)
+        dtraj = np.empty(len(X), dtype=np.int32)
+        regspatial.assign(X, precentered, dtraj, 'minRMSD', 2, traces)
+        np.testing.assert_equal(dtraj, expected)
+
+        # the clustering object centers once per set of cluster centers
+        c = coor.assign_to_centers(X, centers, return_dtrajs=False, n_jobs=1, chunk_size=100, metric='minRMSD')
+        np.testing.assert_equal(c.center_index._traces, traces)
+        np.testing.assert_equal(c.dtrajs[0], expected)
+
+    def test_assignment_float64_strided(self):
+        # float64 and strided chunks are read by the kernels without conversion, with identical results
+        from pyemma.coordinates.clustering import regspatial
+        np.random.seed(3)
+        X = np.random.randn(2000, 7) * 10
+        centers = np.random.randn(50, 3).astype(np.float32) * 10
+        for metric in ('euclidean', 'minRMSD'):
+            for chunk in (X[:, :3], X[::3, 2:5], X[:, 1:4].astype(np.float32), np.asfortranarray(X[:, :3])):
+                expected = np.empty(len(chunk), dtype=np.int32)
+                regspatial.assign(np.require(chunk, dtype=np.float32, requirements='C'), centers, expected, metric, 1)
+                dtraj = np.empty(len(chunk), dtype=np.int32)
+                regspatial.assign(chunk, centers, dtraj, metric, 2)
+                np.testing.assert_equal(dtraj, expected)
+
+    def test_assign_workers(self):
+        expected = coor.assign_to_centers(self.X, self.centers, n_jobs=1, chunk_size=100)
+        c = coor.assign_to_centers(self.X, self.centers, return_dtrajs=False, n_jobs=2, chunk_size=100)
+        c.assign_workers = 3
+        dtrajs = c.assign(stride=1)
+        self.assertEqual(len(dtrajs), len(expected))
+        for d, e in zip(dtrajs, expected):
+            np.testing.assert_equal(d, e)
+        with self.assertRaises(ValueError):
+            c.assign_workers = 0
+
+    def test_index_method_invalid(self):
+        c = coor.assign_to_centers(self.X, self.centers, return_dtrajs=False, n_jobs=1)
+        c.index_method = 'does not exist'
+        with self.assertRaises(ValueError):
+            c.transform(self.X)
+        c = coor.assign_to_centers(self.X, self.centers, return_dtrajs=False, n_jobs=1, metric='minRMSD')
+        c.index_method = 'kdtree'
+        with self.assertRaises(ValueError):
+            c.transform(self.X)
+
     def test_min_rmsd(self):
         import pyemma.datasets as data
         d = data.get_bpti_test_data()
@@ -179,6 +179,56 @@ class TestCoordinatesIterator(unittest.TestCase):
             for a, e in zip(actual, expected):
                 np.testing.assert_allclose(a, e)
 
+    def test_prefetch(self):
+        from pyemma.coordinates import source
+        data = [np.random.random((100, 3)).astype(np.float32) for _ in range(3)]
+        with TemporaryDirectory() as td:
+            fns = [os.path.join(td, '%i.npy' % i) for i in range(len(data))]
+            for x, fn in zip(data, fns):
+                np.save(fn, x)
+            for r in (DataInMemory(data), source(fns)):
+                for prefetch in (1, 2, 5):
+                    it = r.iterator(chunk=17, prefetch=prefetch)
+                    t = 0
+                    expected_itraj = 0
+                    with it:
+                        for itraj, X in it:
+                            self.assertEqual(itraj, expected_itraj)
+                            self.assertEqual(it.current_trajindex, itraj)
+                            self.assertEqual(it.pos, t)
+                            np.testing.assert_equal(X, data[itraj][t:t + len(X)])
+                            t += len(X)
+                            if it.last_chunk_in_traj:
+                                self.assertEqual(t, len(data[itraj]))
+                                t = 0
+                                expected_itraj += 1
+                    self.assertEqual(expected_itraj, len(data))
+
+    def test_prefetch_lagged(self):
+        r = DataInMemory(self.d)
+        for lag in (5, 30):
+            expected = list(r.iterator(lag=lag, chunk=17))
+            actual = list(r.iterator(lag=lag, chunk=17, prefetch=2))
+            self.assertEqual(len(actual), len(expected))
+            for (itraj_a, a, a_lagged), (itraj_e, e, e_lagged) in zip(actual, expected):
+                self.assertEqual(itraj_a, itraj_e)
+                np.testing.assert_equal(a, e)
+                np.testing.assert_equal(a_lagged, e_lagged)
+
+    def test_prefetch_exception(self):
+        from pyemma.coordinates.data._base.datasource import InvalidDataInStreamException
+        d = [np.random.random((100, 3)) for _ in range(3)]
+        d[1][50] = np.nan
+        r = DataInMemory(d, chunksize=5)
+        with settings(coordinates_check_output=True):
+            it = r.iterator(prefetch=3)
+            with self.assertRaises(InvalidDataInStreamException):
+                for itraj, X in it:
+                    self.assertLess(itraj, 2)
+            with self.assertRaises(StopIteration):
+                next(it)
+            it.close()
+
     def test_invalid_data_in_input_nan(self):
         self.d[0][-1] = np.nan
         r = DataInMemory(self.d)
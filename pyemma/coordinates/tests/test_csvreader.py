@@ -301,6 +301,29 @@ class TestCSVReader(unittest.TestCase):
             result = reader.get_output()[0]
             np.testing.assert_allclose(result, desired)
 
+    def test_parallel(self):
+        reader = CSVReader((self.file_with_header, self.filename2), chunksize=7, n_jobs=2)
+        for stride, skip in ((1, 0), (3, 5)):
+            output = reader.get_output(stride=stride, skip=skip)
+            for x in output:
+                np.testing.assert_equal(x, self.data[skip::stride])
+
+    def test_random_access_stride(self):
+        reader = CSVReader((self.filename1, self.file_with_header), chunksize=2)
+        stride = np.array([[0, 5], [0, 5], [0, 299], [1, 0], [1, 17], [1, 200]])
+        output = reader.get_output(stride=stride)
+        np.testing.assert_equal(output[0], self.data[[5, 5, 299]])
+        np.testing.assert_equal(output[1], self.data[[0, 17, 200]])
+
+    def test_invalid_entry(self):
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.dat', delete=False) as f:
+            f.write("1 2 3\n4 5 6\n7 x 9\n")
+            f.close()
+            reader = CSVReader(f.name, delimiters=" ")
+            with self.assertRaises(ValueError) as cm:
+                reader.get_output()
+            self.assertIn('line 2', str(cm.exception))
+
     def test_reset(self):
         reader = CSVReader((self.filename1, self.filename2))
         it = reader.iterator()
@@ -175,14 +175,14 @@ class TestDataInMemory(unittest.TestCase):
     def test_lagged_iterator_1d_legacy(self):
         n = 30
         chunksize = 5
-        lag = 9
-        stride = 2
+        lag = 10
+        stride = 3
 
         data = [np.arange(n), np.arange(50), np.arange(33)]
         input_lens = [x.shape[0] for x in data]
         reader = DataInMemory(data, chunksize=chunksize)
         it = reader.iterator(chunk=chunksize, stride=stride, lag=lag)
-        # lag > chunksize, so we expect a LegacyLaggedIter
+        # stride is more than twice gcd(lag, stride), so we expect a LegacyLaggedIter
         from pyemma.coordinates.data._base.iterable import _LegacyLaggedIterator
         self.assertIsInstance(it, _LegacyLaggedIterator)
         assert reader.chunksize == chunksize
@@ -222,7 +222,7 @@ class TestDataInMemory(unittest.TestCase):
         input_lens = [x.shape[0] for x in data]
         reader = DataInMemory(data, chunksize=chunksize)
         it = reader.iterator(chunk=chunksize, stride=stride, lag=lag)
-        # lag < chunksize, so we expect a LaggedIter
+        # gcd(lag, stride) = 1 and stride = 2, so we expect a LaggedIter
         from pyemma.coordinates.data._base.iterable import _LaggedIterator
         self.assertIsInstance(it, _LaggedIterator)
         assert reader.chunksize == chunksize
@@ -252,6 +252,30 @@ class TestDataInMemory(unittest.TestCase):
             np.testing.assert_equal(traj.T.squeeze(), input_traj[lag::stride].squeeze(),
                                     err_msg="failed for traj=%s" % idx)
 
+    def test_lagged_iterator_lag_exceeds_chunksize(self):
+        from pyemma.coordinates.data._base.iterable import _LaggedIterator
+        data = [np.random.random((n, 3)) for n in (30, 50, 8, 133)]
+        reader = DataInMemory(data)
+        for lag, stride, chunk in ((40, 1, 7), (9, 3, 2), (25, 2, 10), (100, 4, 3)):
+            for max_buffer_size in (_LaggedIterator.MAX_BUFFER_SIZE, 0):
+                it = reader.iterator(lag=lag, stride=stride, chunk=chunk)
+                self.assertIsInstance(it, _LaggedIterator)
+                it.MAX_BUFFER_SIZE = max_buffer_size
+                X = [[] for _ in data]
+                Y = [[] for _ in data]
+                with it:
+                    for itraj, x, y in it:
+                        self.assertLessEqual(len(x), chunk)
+                        X[itraj].append(x)
+                        Y[itraj].append(y)
+                for x, y, traj in zip(X, Y, data):
+                    # all chunks but the last of each trajectory are full
+                    self.assertTrue(all(len(c) == chunk for c in y[:-1]))
+                    expected = traj[lag::stride]
+                    np.testing.assert_equal(np.concatenate(y) if y else np.empty((0, 3)), expected)
+                    np.testing.assert_equal(np.concatenate(x) if x else np.empty((0, 3)),
+                                            traj[::stride][:len(expected)])
+
     def test_lagged_stridden_access(self):
         data = np.random.random((1000, 2))
         reader = DataInMemory(data)
@@ -271,5 +295,62 @@ class TestDataInMemory(unittest.TestCase):
         for x in reader.iterator(chunk=0, return_trajindex=False, cols=cols):
             np.testing.assert_equal(x, self.d[:, cols])
 
+        chunks = [x for x in reader.iterator(chunk=7, stride=3, return_trajindex=False, cols=[1])]
+        np.testing.assert_equal(np.vstack(chunks), self.d[::3, [1]])
+
+        ra_stride = np.array([[0, 1], [0, 4], [0, 4], [0, 9]])
+        chunks = [x for x in reader.iterator(chunk=3, stride=ra_stride, return_trajindex=False, cols=cols)]
+        np.testing.assert_equal(np.vstack(chunks), self.d[[1, 4, 4, 9]][:, cols])
+
+    def test_auto_chunksize(self):
+        import itertools
+        import mock
+        from pyemma.util.contexts import settings
+        data = np.random.random((1000, 8))
+        with self.assertRaises(ValueError):
+            DataInMemory(data, chunksize='large')
+        reader = DataInMemory(data, chunksize='auto')
+        with settings(auto_chunk_size=1):
+            # 8 single precision floats per frame
+            self.assertEqual(reader.chunksize, 1024 * 1024 // 32)
+
+            # slow chunks reduce the chunksize of following iterations
+            reader._tune_auto_chunksize(100, 10.)
+            self.assertEqual(reader.chunksize, 10)
+
+            # fast chunks increase it again, each chunk takes 1/1024 seconds here
+            with mock.patch('pyemma.coordinates.data._base.datasource.time') as time:
+                time.time.side_effect = itertools.count(0, 1. / 1024)
+                chunks = [x for x in reader.iterator(return_trajindex=False)]
+            np.testing.assert_equal(np.vstack(chunks), data)
+            self.assertEqual(reader.chunksize, 10240)
+
+    def test_get_output_out_of_core(self):
+        import os
+        from pyemma.util.files import TemporaryDirectory
+        data = [np.random.random((100, 3)), np.random.random((20, 3))]
+        reader = DataInMemory(data, chunksize=7)
+
+        out = [np.empty((100, 1), dtype=np.float32), np.empty((20, 1), dtype=np.float32)]
+        self.assertIs(reader.get_output(dimensions=[1], out=out), out)
+        for y, d in zip(out, data):
+            np.testing.assert_allclose(y, d[:, [1]].astype(np.float32))
+        with self.assertRaises(ValueError):
+            reader.get_output(out=out)
+
+        with TemporaryDirectory() as td:
+            output = reader.get_output(memmap_dir=td)
+            for y, d in zip(output, data):
+                self.assertIsInstance(y, np.memmap)
+                np.testing.assert_allclose(np.load(y.filename), d.astype(np.float32))
+            # memory maps are passed to a new source without copying them
+            self.assertIs(DataInMemory(output).data[0], output[0])
+
+            reader.in_memory = td
+            self.assertEqual(len(os.listdir(td)), 4)
+            np.testing.assert_allclose(reader.get_output()[1], data[1].astype(np.float32))
+            reader.in_memory = False
+            self.assertEqual(len(os.listdir(td)), 2)
+
 if __name__ == "__main__":
     unittest.main()
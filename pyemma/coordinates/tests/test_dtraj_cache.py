@@ -0,0 +1,144 @@
+
+# This file is part of PyEMMA.
+#
+# Copyright (c) 2016 Computational Molecular Biology Group, Freie Universitaet Berlin (GER)
+#
+# PyEMMA is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+from __future__ import absolute_import
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+from mock import patch
+
+import pyemma.coordinates as coor
+from pyemma.coordinates.clustering.dtraj_cache import DtrajCache, dtraj_key
+from pyemma.coordinates.clustering.interface import AbstractClustering
+from pyemma.util.contexts import settings
+
+
+class TestDtrajCache(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.old_instance = DtrajCache._instance
+
+    @classmethod
+    def tearDownClass(cls):
+        DtrajCache._instance = cls.old_instance
+
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp('dtraj_cache_test')
+        self.cache = DtrajCache(os.path.join(self.work_dir, 'cache'))
+        DtrajCache._instance = self.cache
+
+        self.files = []
+        for i in range(3):
+            fn = os.path.join(self.work_dir, '%i.npy' % i)
+            np.save(fn, np.random.random((100 + i, 2)).astype(np.float32))
+            self.files.append(fn)
+        self.centers = np.random.random((5, 2))
+
+    def tearDown(self):
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
+    def test_hit(self):
+        reader = coor.source(self.files)
+        with settings(use_dtraj_cache=True):
+            expected = coor.assign_to_centers(reader, self.centers)
+            self.assertEqual(self.cache.num_entries, 1)
+            with patch.object(AbstractClustering, 'get_output', side_effect=AssertionError('not cached')):
+                actual = coor.assign_to_centers(coor.source(self.files), self.centers)
+        self.assertEqual(len(actual), len(expected))
+        for a, e in zip(actual, expected):
+            np.testing.assert_equal(a, e)
+
+    def test_key_changes(self):
+        reader = coor.source(self.files)
+        assign = coor.assign_to_centers(reader, self.centers, return_dtrajs=False)
+        key = dtraj_key(assign)
+        self.assertIsNotNone(key)
+        self.assertEqual(key, dtraj_key(assign))
+        self.assertNotEqual(key, dtraj_key(assign, stride=2))
+        self.assertNotEqual(key, dtraj_key(assign, skip=1))
+
+        other = coor.assign_to_centers(reader, self.centers + 1, return_dtrajs=False)
+        self.assertNotEqual(key, dtraj_key(other))
+
+        tica = coor.tica(reader, lag=1)
+        assign_tica = coor.assign_to_centers(tica, self.centers, return_dtrajs=False)
+        self.assertNotEqual(key, dtraj_key(assign_tica))
+
+        # modified input file
+        np.save(self.files[0], np.random.random((100, 2)).astype(np.float32))
+        os.utime(self.files[0], (0, 0))
+        self.assertNotEqual(key, dtraj_key(assign))
+
+    def test_disabled(self):
+        reader = coor.source(self.files)
+        with settings(use_dtraj_cache=False):
+            coor.assign_to_centers(reader, self.centers)
+        self.assertEqual(self.cache.num_entries, 0)
+
+    def test_unhashable_reader_not_cached(self):
+        reader = coor.source(self.files)
+        assign = coor.assign_to_centers(reader, self.centers, return_dtrajs=False)
+        with patch('pyemma.coordinates.clustering.dtraj_cache._hash_file', side_effect=RuntimeError('broken')):
+            self.assertIsNone(dtraj_key(assign))
+
+    def test_in_memory_data_not_cached(self):
+        data = [np.random.random((100, 2))]
+        assign = coor.assign_to_centers(data, self.centers, return_dtrajs=False)
+        self.assertIsNone(dtraj_key(assign))
+
+    def test_lru_eviction(self):
+        dtrajs = [np.zeros(1024**2 // 4, dtype=np.int32)]  # 1MB
+        with settings(dtraj_cache_max_size=4):
+            for key in ('a', 'b', 'c'):
+                self.cache[key] = dtrajs
+            # touch 'a', so 'b' is the least recently used entry
+            os.utime(self.cache._filename('b'), (0, 0))
+            self.cache['a']
+            self.cache['d'] = dtrajs
+        self.assertLessEqual(self.cache.num_entries, 3)
+        with self.assertRaises(KeyError):
+            self.cache['b']
+        np.testing.assert_equal(self.cache['d'][0], dtrajs[0])
+
+    def test_in_memory_lru_eviction(self):
+        cache = DtrajCache()
+        dtrajs = [np.zeros(1024**2 // 4, dtype=np.int32)]  # 1MB
+        with settings(dtraj_cache_max_size=2):
+            cache['a'] = dtrajs
+            cache['b'] = dtrajs
+            cache['a']
+            cache['c'] = dtrajs
+        self.assertEqual(cache.num_entries, 2)
+        with self.assertRaises(KeyError):
+            cache['b']
+
+    def test_corrupted_entry(self):
+        with open(self.cache._filename('a'), 'w') as fh:
+            fh.write('garbage')
+        with self.assertRaises(KeyError):
+            self.cache['a']
+        self.assertEqual(self.cache.num_entries, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
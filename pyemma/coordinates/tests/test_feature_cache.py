@@ -0,0 +1,128 @@
+
+# This file is part of PyEMMA.
+#
+# Copyright (c) 2016 Computational Molecular Biology Group, Freie Universitaet Berlin (GER)
+#
+# PyEMMA is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+from __future__ import absolute_import
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+import pkg_resources
+from mock import patch
+
+from pyemma.coordinates.data.feature_reader import FeatureReader
+from pyemma.coordinates.data.util.feature_cache import FeatureCache, featurizer_key
+from pyemma.coordinates.tests.util import create_traj
+from pyemma.util.contexts import settings
+
+
+class TestFeatureCache(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.old_instance = FeatureCache._instance
+        cls.topfile = pkg_resources.resource_filename(__name__, 'data/test.pdb')
+
+    @classmethod
+    def tearDownClass(cls):
+        FeatureCache._instance = cls.old_instance
+
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp('feature_cache_test')
+        self.cache = FeatureCache(os.path.join(self.work_dir, 'cache'))
+        FeatureCache._instance = self.cache
+        self.trajs = [create_traj(top=self.topfile, length=l, dir=self.work_dir)[0] for l in (10, 57, 130)]
+
+    def tearDown(self):
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
+    def _reader(self):
+        reader = FeatureReader(self.trajs, self.topfile)
+        reader.featurizer.add_distances([[0, 1], [1, 2]])
+        return reader
+
+    def test_cached_output(self):
+        with settings(use_feature_cache=True):
+            # entries are written for skip < stride and serve all skips of the same phase.
+            for stride, skip_write, skip, chunk in ((1, 0, 0, 0), (1, 0, 0, 7), (3, 0, 0, 7),
+                                                    (3, 1, 7, 5), (2, 1, 5, 100)):
+                self._reader().get_output(stride=stride, skip=skip_write, chunk=chunk)
+                with patch('pyemma.coordinates.data.feature_reader._featurize',
+                           side_effect=AssertionError('not cached')):
+                    actual = self._reader().get_output(stride=stride, skip=skip, chunk=chunk)
+                with settings(use_feature_cache=False):
+                    expected = self._reader().get_output(stride=stride, skip=skip, chunk=chunk)
+                for a, e in zip(actual, expected):
+                    np.testing.assert_allclose(a, e)
+
+    def test_disabled(self):
+        with settings(use_feature_cache=False):
+            self._reader().get_output()
+        self.assertEqual(self.cache.num_entries, 0)
+
+    def test_incomplete_read_not_stored(self):
+        with settings(use_feature_cache=True):
+            it = self._reader().iterator(chunk=5)
+            with it:
+                next(it)
+        self.assertEqual(self.cache.num_entries, 0)
+        self.assertEqual(len([f for f in os.listdir(self.cache.directory) if f.endswith('.tmp')]), 0)
+
+    def test_invalidation(self):
+        reader = self._reader()
+        key = featurizer_key(reader.featurizer)
+        self.assertIsNotNone(key)
+        self.assertEqual(key, featurizer_key(self._reader().featurizer))
+
+        other = FeatureReader(self.trajs, self.topfile)
+        other.featurizer.add_distances([[0, 1], [1, 2]], periodic=False)
+        self.assertNotEqual(key, featurizer_key(other.featurizer))
+
+        custom = FeatureReader(self.trajs, self.topfile)
+        custom.featurizer.add_custom_func(lambda x: x.xyz[:, 0, :], dim=3)
+        self.assertIsNone(featurizer_key(custom.featurizer))
+
+        file_key = FeatureCache.key(self.trajs[0], key, 1, 0)
+        self.assertEqual(file_key, FeatureCache.key(self.trajs[0], key, 1, 0))
+        self.assertNotEqual(file_key, FeatureCache.key(self.trajs[0], key, 2, 0))
+        # same phase of skip and stride
+        self.assertEqual(FeatureCache.key(self.trajs[0], key, 3, 1), FeatureCache.key(self.trajs[0], key, 3, 4))
+        self.assertNotEqual(FeatureCache.key(self.trajs[0], key, 3, 1), FeatureCache.key(self.trajs[0], key, 3, 2))
+        os.utime(self.trajs[0], (0, 0))
+        self.assertNotEqual(file_key, FeatureCache.key(self.trajs[0], key, 1, 0))
+
+    def test_lru_eviction(self):
+        frames = 1024**2 // 4  # 1MB of float32
+        with settings(feature_cache_max_size=4):
+            for key in ('a', 'b', 'c'):
+                w = self.cache.writer(key, frames)
+                w.append(np.zeros((frames, 1), dtype=np.float32))
+                w.commit()
+            os.utime(self.cache._filename('b'), (0, 0))
+            w = self.cache.writer('d', frames)
+            w.append(np.zeros((frames, 1), dtype=np.float32))
+            w.commit()
+        self.assertLessEqual(self.cache.num_entries, 3)
+        self.assertIsNone(self.cache.get('b'))
+        self.assertIsNotNone(self.cache.get('d'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -263,5 +263,63 @@ class TestFeatureReader(unittest.TestCase):
         self.assertNotIn(0, res)
         self.assertIn(1, res)
 
+    def test_parallel(self):
+        from pyemma.coordinates.data.feature_reader import FeatureReaderParallelIterator
+        top = self.topfile
+        trajs = [create_traj(top=top, length=l, format='.xtc', dir=self.tmpdir)[0] for l in (10, 57, 130)]
+        serial = FeatureReader(trajs, top)
+        serial.featurizer.add_distances([[0, 1], [1, 2]])
+        parallel = source(trajs, features=serial.featurizer, n_jobs=2)
+        self.assertIsInstance(parallel.iterator(), FeatureReaderParallelIterator)
+
+        for chunk in (0, 7, 100):
+            for stride, skip in ((1, 0), (3, 0), (5, 0), (2, 5), (3, 7)):
+                expected = serial.get_output(stride=stride, skip=skip, chunk=chunk)
+                actual = parallel.get_output(stride=stride, skip=skip, chunk=chunk)
+                self.assertEqual(len(actual), len(expected))
+                for a, e in zip(actual, expected):
+                    np.testing.assert_allclose(a, e, err_msg='stride=%s, skip=%s, chunk=%s' % (stride, skip, chunk))
+
+                if stride > 1:
+                    # depending on the format, serial chunks contain up to chunk * stride frames,
+                    # while the parallel iterator returns chunks of exactly chunk frames.
+                    continue
+                positions = [(itraj, it_pos) for it in [serial.iterator(stride=stride, skip=skip, chunk=chunk)]
+                             for itraj, it_pos in ((i, it.pos) for i, _ in it)]
+                positions_parallel = [(itraj, it_pos) for it in [parallel.iterator(stride=stride, skip=skip,
+                                                                                   chunk=chunk)]
+                                      for itraj, it_pos in ((i, it.pos) for i, _ in it)]
+                self.assertEqual(positions_parallel, positions)
+
+        for lag in (3, 11):
+            expected = [x for x in serial.iterator(lag=lag, chunk=7)]
+            actual = [x for x in parallel.iterator(lag=lag, chunk=7)]
+            self.assertEqual(len(actual), len(expected))
+            for (itraj_a, a, a_lagged), (itraj_e, e, e_lagged) in zip(actual, expected):
+                self.assertEqual(itraj_a, itraj_e)
+                np.testing.assert_allclose(a, e)
+                np.testing.assert_allclose(a_lagged, e_lagged)
+
+    def test_cols_pushdown(self):
+        # the columns are selected during featurization, the result has to match the full output
+        top = self.topfile
+        trajs = [create_traj(top=top, length=l, format='.xtc', dir=self.tmpdir)[0] for l in (10, 57)]
+        reader = FeatureReader(trajs, top)
+        reader.featurizer.add_distances([[0, 1], [1, 2], [0, 2]])
+        reader.featurizer.add_selection([0, 1])
+        expected = reader.get_output()
+        cols = [7, 0, 2]
+        for n_jobs in (1, 2):
+            reader.n_jobs = n_jobs
+            for chunk in (0, 7):
+                chunks = [[] for _ in trajs]
+                with reader.iterator(chunk=chunk, cols=cols) as it:
+                    for itraj, X in it:
+                        self.assertEqual(X.shape[1], len(cols))
+                        chunks[itraj].append(X)
+                for c, e in zip(chunks, expected):
+                    np.testing.assert_allclose(np.vstack(c), e[:, cols], rtol=1e-6)
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -31,6 +31,7 @@ from pyemma.coordinates.data.featurization.featurizer import MDFeaturizer, Custo
 from pyemma.coordinates.data.featurization.util import _parse_pairwise_input, _describe_atom
 from six.moves import range
 import pkg_resources
+from mock import patch
 
 path = pkg_resources.resource_filename(__name__, 'data') + os.path.sep
 xtcfile = os.path.join(path, 'bpti_mini.xtc')
@@ -605,6 +606,29 @@ class TestFeaturizer(unittest.TestCase):
         assert np.allclose(D.squeeze(), Dref)
         assert len(self.feat.describe())==self.feat.dimension()
 
+    def test_transform_cols(self):
+        pairs = [[0, 1], [1, 2], [2, 3], [3, 4]]
+        self.feat.add_selection([0, 2])
+        self.feat.add_distances(pairs)
+        self.feat.add_inverse_distances(pairs)
+        self.feat.add_contacts(pairs, threshold=0.5)
+        self.feat.add_contacts(pairs, count_contacts=True)
+        self.feat.add_angles([[0, 1, 2], [1, 2, 3]], cossin=True)
+        self.feat.add_custom_func(lambda t: t.xyz[:, 0, :], dim=3)
+        expected = self.feat.transform(self.traj)
+
+        for cols in ([0], [5, 1, 3], (6, 7, 8, 9), [21, 20, 6], np.arange(self.feat.dimension())[::-3],
+                     [self.feat.dimension() - 1, 22], slice(10, 30, 4)):
+            np.testing.assert_allclose(self.feat.transform(self.traj, cols=cols), expected[:, cols])
+
+    def test_transform_cols_omits_features(self):
+        self.feat.add_distances([[0, 1], [1, 2]])
+        custom = CustomFeature(lambda t: t.xyz[:, 0, :], dim=3)
+        self.feat.add_custom_feature(custom)
+        with patch.object(custom, 'transform', side_effect=AssertionError('evaluated')):
+            D = self.feat.transform(self.traj, cols=[1])
+        np.testing.assert_allclose(D[:, 0], mdtraj.compute_distances(self.traj, [[1, 2]])[:, 0])
+
 
 class TestFeaturizerNoDubs(unittest.TestCase):
 
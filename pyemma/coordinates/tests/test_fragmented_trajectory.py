@@ -161,6 +161,21 @@ class TestFragmentedTrajectory(unittest.TestCase):
         with self.assertRaises(ValueError):
             reader._index_to_reader_index(200, 0)
 
+    def test_index_to_reader_index_array(self):
+        reader = FragmentedTrajectoryReader([self.d, self.d, self.d])
+        reader_index, local_index = reader._index_to_reader_index(np.array([0, 99, 100, 250, 299]), 0)
+        np.testing.assert_equal(reader_index, [0, 0, 1, 2, 2])
+        np.testing.assert_equal(local_index, [0, 99, 0, 50, 99])
+        with self.assertRaises(ValueError):
+            reader._index_to_reader_index(np.array([0, 300]), 0)
+
+    def test_chunks_spanning_fragments_kept_by_caller(self):
+        # chunks assembled from several fragments stay valid, if they are kept or prefetched
+        reader = FragmentedTrajectoryReader([self.d] * 5)
+        for prefetch in (0, 3):
+            chunks = list(reader.iterator(chunk=30, return_trajindex=False, prefetch=prefetch))
+            np.testing.assert_equal(np.vstack(chunks), np.vstack([self.d] * 5))
+
     def test_cols(self):
         dim = 5
         arr = np.arange(60).reshape(-1, dim)
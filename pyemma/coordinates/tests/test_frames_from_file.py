@@ -171,5 +171,36 @@ class TestFramesFromFile(unittest.TestCase):
         inds = np.vstack((np.random.randint(0,1),  np.random.randint(0, 100))).T
         traj_test = _frames_from_file(reader.filenames, self.pdbfile, inds, reader=reader)
 
+    def test_scattered_frames_multiple_files(self):
+        import shutil
+        import tempfile
+        # the reader removes duplicate file names, so we need distinct copies.
+        tmpdir = tempfile.mkdtemp()
+        try:
+            files = [os.path.join(tmpdir, '%i.xtc' % i) for i in range(3)]
+            for f in files:
+                shutil.copy(self.trajfiles, f)
+            inds = np.vstack((randint(0, 3, size=200), randint(0, 100, size=200))).T
+            traj_ref = md.load(self.trajfiles, top=self.pdbfile)
+            for n_jobs in (1, 3, None):
+                traj_test = _frames_from_file(files, self.pdbfile, inds, chunksize=self.chunksize, n_jobs=n_jobs)
+                np.testing.assert_allclose(traj_test.xyz, traj_ref.xyz[inds[:, 1]])
+                np.testing.assert_allclose(traj_test.unitcell_lengths, traj_ref.unitcell_lengths[inds[:, 1]])
+        finally:
+            shutil.rmtree(tmpdir, ignore_errors=True)
+
+    def test_plan_reads(self):
+        from pyemma.coordinates.util.patches import _plan_reads
+        frames = np.array([1, 2, 3, 10, 50, 50, 51, 200])
+        reads = list(_plan_reads(frames, chunksize=0, max_gap=16))
+        self.assertEqual(len(reads), 1)
+        self.assertEqual([(start, n) for start, n, _ in reads[0]], [(1, 10), (50, 2), (200, 1)])
+        np.testing.assert_equal(reads[0][0][2], [0, 1, 2, 9])
+        np.testing.assert_equal(reads[0][1][2], [0, 0, 1])
+
+        reads = list(_plan_reads(frames, chunksize=3, max_gap=0))
+        self.assertEqual([sum(len(sel) for _, _, sel in r) for r in reads], [3, 3, 2])
+        self.assertEqual([(start, n) for start, n, _ in reads[1]], [(10, 1), (50, 1)])
+
 if __name__ == "__main__":
     unittest.main()
@@ -25,6 +25,8 @@ from __future__ import absolute_import
 import os
 import unittest
 
+from mock import patch
+
 from pyemma.coordinates.api import cluster_kmeans
 from pyemma.util.files import TemporaryDirectory
 
@@ -178,5 +180,102 @@ class TestKmeans(unittest.TestCase):
     def test_skip(self):
         cluster_kmeans(np.random.rand(100, 3), skip=42)
 
+    def test_bounds_same_result(self):
+        X = [np.random.randn(1000, 2) + c for c in (-3, 0, 3)]
+        km = cluster_kmeans(X, k=50, max_iter=20, fixed_seed=True, tolerance=0)
+        km_bounds = cluster_kmeans(X, k=50, max_iter=20, fixed_seed=True, tolerance=0, use_bounds=True)
+        np.testing.assert_equal(km_bounds.clustercenters, km.clustercenters)
+        np.testing.assert_equal(km_bounds.dtrajs, km.dtrajs)
+
+    def test_n_jobs_same_result(self):
+        X = np.random.randn(5000, 3)
+        km1 = cluster_kmeans(X, k=20, max_iter=10, fixed_seed=True, n_jobs=1)
+        km2 = cluster_kmeans(X, k=20, max_iter=10, fixed_seed=True, n_jobs=3)
+        np.testing.assert_equal(km2.clustercenters, km1.clustercenters)
+
+    def test_streaming(self):
+        from pyemma.coordinates.clustering.kmeans import KmeansClustering
+        X = [np.random.randn(1000, 2) + c for c in (-3, 0, 3)]
+        with patch.object(KmeansClustering, '_calculate_required_memory', return_value=2 ** 60):
+            km_stream = cluster_kmeans(X, k=20, max_iter=10, fixed_seed=True, init_strategy='uniform',
+                                       oom_strategy='stream', chunk_size=300)
+        km = cluster_kmeans(X, k=20, max_iter=10, fixed_seed=True, init_strategy='uniform', chunk_size=300)
+        np.testing.assert_allclose(km_stream.clustercenters, km.clustercenters, rtol=1e-5, atol=1e-5)
+
+    def test_streaming_kmeanspp(self):
+        from pyemma.coordinates.clustering.kmeans import KmeansClustering
+        X = [np.random.randn(1000, 2) + c for c in (-3, 0, 3)]
+        with patch.object(KmeansClustering, '_calculate_required_memory', return_value=2 ** 60):
+            km = cluster_kmeans(X, k=10, max_iter=10, oom_strategy='stream', chunk_size=300)
+        cc = km.clustercenters
+        self.assertEqual(cc.shape, (10, 2))
+        assert np.any(cc < -2.0)
+        assert np.any((cc > -1.0) * (cc < 1.0))
+        assert np.any(cc > 2.0)
+
+    def test_streaming_same_iterations(self):
+        from pyemma.coordinates.clustering.kmeans import KmeansClustering
+        X = [np.random.randn(1000, 2) + c for c in (-3, 0, 3)]
+
+        def n_iterations(**kw):
+            with patch.object(KmeansClustering, '_progress_update') as update, \
+                    patch.object(KmeansClustering, '_progress_force_finish') as finish:
+                cluster_kmeans(X, k=20, max_iter=100, tolerance=1e-3, fixed_seed=True, init_strategy='uniform',
+                               chunk_size=300, **kw)
+            # converged before max_iter
+            self.assertIn({'stage': 1}, [c[1] for c in finish.call_args_list])
+            return sum(1 for c in update.call_args_list if c[1].get('stage') == 1)
+        with patch.object(KmeansClustering, '_calculate_required_memory', return_value=2 ** 60):
+            n_stream = n_iterations(oom_strategy='stream')
+        self.assertEqual(n_stream, n_iterations())
+
+    def test_streaming_init_sample_memory(self):
+        from pyemma.coordinates import source
+        from pyemma.coordinates.clustering.kmeans import KmeansClustering
+        km = KmeansClustering(n_clusters=10, init_strategy='kmeans++')
+        km.data_producer = source(np.random.randn(100, 3))
+        # drawing the sample must not allocate an index array of the size of the data
+        km._init_streaming_sample(2 ** 62)
+        indices = km._init_sample_indices
+        self.assertEqual(len(indices), 10 * km._streaming_init_samples_per_center)
+        self.assertEqual(len(np.unique(indices)), len(indices))
+        assert np.all(np.diff(indices) > 0)
+        self.assertEqual(km._init_sample.shape, (len(indices), 3))
+
+    def test_kmeans_parallel_init(self):
+        from pyemma.coordinates.clustering.kmeans import KmeansClustering
+        X = [np.random.randn(1000, 2) + c for c in (-3, 0, 3)]
+        km = cluster_kmeans(X, k=10, max_iter=0, init_strategy='kmeans||', fixed_seed=True)
+        cc = km.clustercenters
+        self.assertEqual(cc.shape, (10, 2))
+        self.assertEqual(len(np.unique(cc, axis=0)), 10)
+        assert np.any(cc < -2.0)
+        assert np.any((cc > -1.0) * (cc < 1.0))
+        assert np.any(cc > 2.0)
+        # deterministic with a fixed seed, also when streaming over the data
+        with patch.object(KmeansClustering, '_calculate_required_memory', return_value=2 ** 60):
+            km_stream = cluster_kmeans(X, k=10, max_iter=0, init_strategy='kmeans||', fixed_seed=True,
+                                       oom_strategy='stream')
+        np.testing.assert_equal(km_stream.clustercenters, cc)
+
+    def test_kmeans_parallel_init_nan(self):
+        X = np.random.randn(500, 3)
+        X[::7] = np.nan
+        km = cluster_kmeans(X, k=5, max_iter=0, init_strategy='kmeans||')
+        assert np.all(np.isfinite(km.clustercenters))
+
+    def test_lloyd_step(self):
+        from pyemma.coordinates.clustering import kmeans_clustering
+        X = np.random.randn(300, 3).astype(np.float32)
+        centers = X[:7].copy()
+        d = ((X[:, np.newaxis, :].astype(np.float64) - centers[np.newaxis]) ** 2).sum(axis=-1)
+        dtraj = d.argmin(axis=1)
+        expected = np.array([X[dtraj == i].mean(axis=0) for i in range(len(centers))])
+        new_centers, cost = kmeans_clustering.cluster(X, centers, 'euclidean', 2)
+        np.testing.assert_allclose(new_centers, expected, rtol=1e-5, atol=1e-6)
+        # the cost refers to the updated centers
+        expected_cost = ((X.astype(np.float64) - expected[dtraj]) ** 2).sum()
+        np.testing.assert_allclose(cost, expected_cost, rtol=1e-5)
+
 if __name__ == "__main__":
     unittest.main()
@@ -205,8 +205,10 @@ class TestNumPyFileReader(unittest.TestCase):
             myfiles = self.files2d[:]
             myfiles.insert(1, f.name)
 
+            # the dimensions are checked, when the infos of the files are resolved.
+            reader = NumPyFileReader(myfiles)
             with self.assertRaises(ValueError) as cm:
-                NumPyFileReader(myfiles)
+                reader.trajectory_lengths()
             self.assertIn("different dimensions", cm.exception.args[0])
 
 
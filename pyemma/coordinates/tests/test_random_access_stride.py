@@ -350,6 +350,29 @@ class TestRandomAccessStride(TestCase):
                 except EnvironmentError:
                     pass
 
+    def test_numpy_filereader_random_access_strategies(self):
+        tmpfiles = [tempfile.mktemp(suffix='.npy') for _ in range(0, len(self.data))]
+        try:
+            for idx, tmp in enumerate(tmpfiles):
+                np.save(tmp, self.data[idx])
+            reader = coor.source(tmpfiles)
+            assert reader.is_random_accessible
+            data = np.concatenate(self.data)
+            frames = np.random.randint(0, len(data), size=500)
+            np.testing.assert_equal(reader.ra_linear[frames], data[frames])
+            np.testing.assert_equal(reader.ra_linear[frames, 1:3], data[frames, 1:3])
+            np.testing.assert_equal(reader.ra_itraj_linear[[1, 2], :30], np.concatenate(self.data[1:])[:30])
+            np.testing.assert_equal(reader.ra_itraj_cuboid[:, ::3, -1],
+                                    np.array([d[:20:3, -1:] for d in self.data]))
+            for X, d in zip(reader.ra_itraj_jagged[:, ::-3], self.data):
+                np.testing.assert_equal(X, d[::-3])
+        finally:
+            for tmp in tmpfiles:
+                try:
+                    os.unlink(tmp)
+                except EnvironmentError:
+                    pass
+
     def test_transformer_iterator_random_access(self):
         kmeans = coor.cluster_kmeans(self.data, k=2)
         kmeans.in_memory = True
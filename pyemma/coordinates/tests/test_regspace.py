@@ -133,5 +133,34 @@ class TestRegSpaceClustering(unittest.TestCase):
             assert len(out) == self.clustering.number_of_trajectories()
             assert len(out[0]) == self.clustering.trajectory_lengths()[0]
 
+    def test_same_result_as_sequential(self):
+        # the parallel, grid based implementation has to pick exactly the same centers
+        # as comparing the frames one after another with all centers found so far.
+        np.random.seed(42)
+        data = np.random.randn(3000, 4).astype(np.float32)
+        data[::500] = np.nan
+        dmin = 0.7
+        expected = []
+        for x in data:
+            if not any(np.linalg.norm(x - c) <= dmin for c in expected):
+                expected.append(x)
+        expected = np.array(expected)
+
+        for n_jobs, chunksize in ((1, 1000), (4, 7), (2, 0)):
+            cl = cluster_regspace(data, dmin=dmin, max_centers=10000, n_jobs=n_jobs, chunk_size=chunksize)
+            np.testing.assert_array_equal(cl.clustercenters, expected)
+
+    def test_centers_buffer_growth(self):
+        from pyemma.coordinates.clustering import regspatial
+        data = np.arange(100, dtype=np.float32).reshape(-1, 1)
+        centers = np.empty((1, 1), dtype=np.float32)
+        centers, n, max_reached = regspatial.cluster(data[:50], centers, 0, 0.5, 'euclidean', 1000, 1)
+        self.assertEqual(n, 50)
+        self.assertFalse(max_reached)
+        centers, n, max_reached = regspatial.cluster(data, centers, n, 0.5, 'euclidean', 80, 1)
+        self.assertEqual(n, 80)
+        self.assertTrue(max_reached)
+        np.testing.assert_array_equal(centers[:n], data[:80])
+
 if __name__ == "__main__":
     unittest.main()
@@ -31,6 +31,7 @@ import os
 import shutil
 import tempfile
 
+import mdtraj as md
 import numpy as np
 import pyemma.coordinates as coor
 from pyemma.coordinates.data.util.reader_utils import single_traj_from_n_files, save_traj_w_md_load_frame, \
@@ -158,6 +159,18 @@ class TestSaveTrajs(unittest.TestCase):
             (found_diff, errmsg) = compare_coords_md_trajectory_objects(traj_1_pass, traj_ref, atom=0)
             self.assertFalse(found_diff, errmsg)
 
+    def test_save_SaveTrajs_multipass_shared_frames(self):
+        # frames requested by several outputs are routed to all of them
+        sets = [self.sets[0], self.sets[0][::-1], np.vstack((self.sets[1], self.sets[0]))]
+        outfiles = [self.subdir + 'shared.set_%06u.%s' % (ii, fmt) for ii, fmt in enumerate(('xtc', 'dcd', 'pdb'))]
+        for n_jobs in (1, 3):
+            save_trajs(self.reader, sets, outfiles=outfiles, n_jobs=n_jobs)
+            for outfile, frames in zip(outfiles, sets):
+                traj = md.load(outfile, top=self.pdbfile)
+                traj_ref = save_traj_w_md_load_frame(self.reader, [frames])
+                (found_diff, errmsg) = compare_coords_md_trajectory_objects(traj, traj_ref, atom=0)
+                self.assertFalse(found_diff, errmsg)
+
     def test_out_of_bound_indexes(self):
         # assert ValueError with index info is raised for faulty input
         self.sets[0][:,1] *= 100000
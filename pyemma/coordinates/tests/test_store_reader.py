@@ -0,0 +1,120 @@
+
+# This file is part of PyEMMA.
+#
+# Copyright (c) 2016 Computational Molecular Biology Group, Freie Universitaet Berlin (GER)
+#
+# PyEMMA is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+from __future__ import absolute_import
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+from mock import patch
+
+import pyemma.coordinates as coor
+from pyemma.coordinates.data.store_reader import StoreReader, StoreWriter
+from pyemma.util.contexts import settings
+
+
+class TestStoreReader(unittest.TestCase):
+
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp('store_reader_test')
+        self.data = [np.random.random((n, 4)).astype(np.float32) for n in (23, 100, 57)]
+        self.source = coor.source(self.data, chunk_size=10)
+
+    def tearDown(self):
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
+    def _store(self, **kw):
+        return self.source.write_to_store(os.path.join(self.work_dir, 'store'), chunksize=10, **kw)
+
+    def test_get_output(self):
+        for compression in (None, 'zlib'):
+            reader = self._store(compression=compression, block_size=7, overwrite=True)
+            self.assertEqual(reader.trajectory_lengths().tolist(), [23, 100, 57])
+            self.assertEqual(reader.ndim, 4)
+            for stride, skip, chunk in ((1, 0, 0), (1, 0, 13), (3, 2, 5), (4, 0, 100)):
+                out = reader.get_output(stride=stride, skip=skip, chunk=chunk)
+                for actual, expected in zip(out, self.data):
+                    np.testing.assert_equal(actual, expected[skip::stride])
+
+    def test_stride_and_skip(self):
+        reader = self._store(stride=2, skip=3)
+        for actual, expected in zip(reader.get_output(), self.data):
+            np.testing.assert_equal(actual, expected[3::2])
+
+    def test_cols(self):
+        for compression in (None, 'zlib'):
+            reader = self._store(compression=compression, block_size=16, overwrite=True)
+            with reader.iterator(chunk=9, cols=[1, 3], return_trajindex=True) as it:
+                chunks = [[] for _ in self.data]
+                for itraj, X in it:
+                    self.assertEqual(X.shape[1], 2)
+                    chunks[itraj].append(X)
+            for actual, expected in zip(chunks, self.data):
+                np.testing.assert_equal(np.concatenate(actual), expected[:, [1, 3]])
+
+    def test_random_access(self):
+        for compression in (None, 'zlib'):
+            reader = self._store(compression=compression, block_size=16, overwrite=True)
+            np.testing.assert_equal(reader.ra_itraj_cuboid[:, 3:20:2, [0, 2]],
+                                    np.array([x[3:20:2][:, [0, 2]] for x in self.data]))
+            frames = np.array([50, 1, 17, 99, 1])
+            np.testing.assert_equal(reader.ra_itraj_jagged[1, frames, 3], [self.data[1][frames, 3]])
+            np.testing.assert_equal(reader.ra_linear[[0, 22, 23, 122]],
+                                    np.concatenate(self.data)[[0, 22, 23, 122]])
+            np.testing.assert_equal(reader.ra_itraj_linear[[1, 2], [0, 100, 156], 1],
+                                    np.concatenate(self.data[1:])[[0, 100, 156]][:, [1]])
+            out = reader.get_output(stride=np.array([[0, 7], [1, 99], [2, 1], [2, 5]]))
+            np.testing.assert_equal(out[0], self.data[0][[7]])
+            np.testing.assert_equal(out[2], self.data[2][[1, 5]])
+
+    def test_source(self):
+        path = os.path.join(self.work_dir, 'store')
+        self.source.write_to_store(path)
+        reader = coor.source(path)
+        self.assertIsInstance(reader, StoreReader)
+        np.testing.assert_equal(reader.get_output()[1], self.data[1])
+
+    def test_overwrite(self):
+        self._store()
+        with self.assertRaises(OSError):
+            self._store()
+        reader = self._store(stride=5, overwrite=True)
+        np.testing.assert_equal(reader.get_output()[0], self.data[0][::5])
+
+    def test_interrupted_write(self):
+        self._store()
+        with patch.object(StoreWriter, 'append', side_effect=RuntimeError('interrupted')):
+            with self.assertRaises(RuntimeError):
+                self._store(overwrite=True)
+        with self.assertRaises(ValueError):
+            StoreReader(os.path.join(self.work_dir, 'store'))
+
+    def test_pipeline(self):
+        tica = coor.tica(self.source, lag=1, dim=2)
+        with settings(show_progress_bars=False):
+            reader = tica.write_to_store(os.path.join(self.work_dir, 'store'), compression='zlib')
+        for actual, expected in zip(reader.get_output(), tica.get_output()):
+            np.testing.assert_allclose(actual, expected)
+        self.assertEqual(reader.output_type(), tica.output_type())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -162,6 +162,24 @@ class TestTICA_Basic(unittest.TestCase):
         np.testing.assert_allclose(tica_obj.mean, mean)
         np.testing.assert_allclose(tica_obj.cov, cov)
 
+    def test_auto_chunksize_adapted(self):
+        import itertools
+        import mock
+        from pyemma.util.contexts import settings
+        X = np.random.random((10000, 64)).astype(np.float32)
+        with settings(auto_chunk_size=1):
+            d = source(X, chunk_size='auto')
+            # 64 single precision floats per frame
+            self.assertEqual(d.chunksize, 4096)
+            # every chunk takes 10 seconds, so the chunksize is reduced by the (time-lagged) estimation.
+            with mock.patch('pyemma.coordinates.data._base.datasource.time') as time:
+                time.time.side_effect = itertools.count(0, 10.)
+                tica_obj = tica(d, lag=1, dim=1)
+            self.assertEqual(d.chunksize, 409)
+            self.assertEqual(tica_obj.chunksize, 409)
+            tica_ref = tica(DataInMemory(X), lag=1, dim=1)
+            np.testing.assert_allclose(tica_obj.cov_tau, tica_ref.cov_tau, rtol=1e-5)
+
     def test_in_memory(self):
         data = np.random.random((100, 10))
         tica_obj = api.tica(lag=10, dim=1)
@@ -26,6 +26,7 @@ from tempfile import NamedTemporaryFile
 
 import os
 import tempfile
+import threading
 import unittest
 
 import mock
@@ -91,6 +92,8 @@ class TestTrajectoryInfoCache(unittest.TestCase):
             with NamedTemporaryFile(delete=False) as fh:
                 np.savetxt(fh.name, x)
                 reader = api.source(fh.name)
+                # stores the info
+                reader.trajectory_lengths()
                 info = self.db[fh.name, reader]
                 self.db.close()
                 self.db.__init__(self.db._database.filename)
@@ -153,6 +156,80 @@ class TestTrajectoryInfoCache(unittest.TestCase):
                         for i, f in enumerate(files)}
             np.testing.assert_equal(results, expected)
 
+    def test_get_many(self):
+        lengths = [7, 23, 27, 3, 11]
+        with TemporaryDirectory() as td:
+            files = []
+            for i, n in enumerate(lengths):
+                fn = os.path.join(td, "%i.npy" % i)
+                np.save(fn, np.empty((n, 2)))
+                files.append(fn)
+            reader = NumPyFileReader(files)
+            self.db[files[0], reader]
+
+            progress = []
+            with mock.patch.object(reader, '_get_traj_info', wraps=reader._get_traj_info) as compute:
+                infos = self.db.get_many(files + files[1:2], reader, n_jobs=3, callback=progress.append)
+            # the cached file and the duplicate are not computed again
+            self.assertEqual(compute.call_count, len(files) - 1)
+            self.assertEqual(sum(progress), len(files) + 1)
+            self.assertEqual([info.length for info in infos], lengths + lengths[1:2])
+            self.assertEqual(self.db.num_entries, len(files))
+
+            with mock.patch.object(reader, '_get_traj_info', side_effect=AssertionError('not cached')):
+                infos = self.db.get_many(files, reader)
+            self.assertEqual([info.length for info in infos], lengths)
+            self.assertEqual([info.ndim for info in infos], [2] * len(files))
+
+            with self.assertRaises(ValueError):
+                self.db.get_many(files, NumPyFileReader(files[:1]))
+
+    def test_lazy_resolution(self):
+        lengths = [5, 6, 7, 8, 9]
+        with TemporaryDirectory() as td:
+            files = []
+            for i, n in enumerate(lengths):
+                fn = os.path.join(td, "%i.npy" % i)
+                np.save(fn, np.arange(2 * n, dtype=np.float32).reshape(n, 2))
+                files.append(fn)
+            with mock.patch.object(TrajectoryInfoCache, 'get_many', wraps=self.db.get_many) as get_many:
+                reader = NumPyFileReader(files)
+                # nothing is looked up during construction
+                self.assertEqual(get_many.call_count, 0)
+
+                self.assertEqual(reader.trajectory_length(2), 7)
+                self.assertEqual(get_many.call_args[0][0], files[2:3])
+
+                self.assertEqual(reader.ndim, 2)
+                self.assertEqual(get_many.call_args[0][0], files[0:1])
+
+                # the remaining files are resolved at once
+                np.testing.assert_equal(reader.trajectory_lengths(), lengths)
+                self.assertEqual(get_many.call_args[0][0], [files[1], files[3], files[4]])
+                self.assertEqual(get_many.call_count, 3)
+                np.testing.assert_equal(reader.get_output()[4], np.load(files[4]))
+                self.assertEqual(get_many.call_count, 3)
+
+    def test_prefetch_resolves_in_calling_thread(self):
+        with TemporaryDirectory() as td:
+            files = []
+            for i in range(3):
+                fn = os.path.join(td, "%i.npy" % i)
+                np.save(fn, np.random.random((10, 2)))
+                files.append(fn)
+            threads = []
+            wrapped = self.db.get_many
+
+            def get_many(*args, **kw):
+                threads.append(threading.current_thread())
+                return wrapped(*args, **kw)
+            with mock.patch.object(TrajectoryInfoCache, 'get_many', side_effect=get_many):
+                reader = NumPyFileReader(files)
+                with reader.iterator(chunk=3, prefetch=2) as it:
+                    out = [X for X in it]
+            self.assertEqual(len(out), 12)
+            self.assertEqual(threads, [threading.current_thread()])
+
     def test_csvreader(self):
         data = np.random.random((101, 3))
         fn = tempfile.mktemp()
@@ -242,7 +319,10 @@ class TestTrajectoryInfoCache(unittest.TestCase):
         assert config.use_trajectory_lengths_cache
         self.assertEqual(self.db.num_entries, 0)
         assert TrajectoryInfoCache._instance is self.db
-        pyemma.coordinates.source(xtcfiles, top=pdbfile)
+        reader = pyemma.coordinates.source(xtcfiles, top=pdbfile)
+        # the infos are stored, once they are resolved.
+        self.assertEqual(self.db.num_entries, 0)
+        reader.trajectory_lengths()
         self.assertEqual(self.db.num_entries, len(xtcfiles))
 
     def test_max_n_entries(self):
@@ -255,7 +335,7 @@ class TestTrajectoryInfoCache(unittest.TestCase):
                 f = os.path.join(td, "%s.npy" % i)
                 np.save(f, arr)
                 files.append(f)
-            pyemma.coordinates.source(files)
+            pyemma.coordinates.source(files).trajectory_lengths()
         self.assertLessEqual(self.db.num_entries, max_entries)
         self.assertGreater(self.db.num_entries, 0)
 
@@ -271,7 +351,7 @@ class TestTrajectoryInfoCache(unittest.TestCase):
                 # save as txt to enforce creation of offsets
                 np.savetxt(f, arr)
                 files.append(f)
-            pyemma.coordinates.source(files)
+            pyemma.coordinates.source(files).trajectory_lengths()
 
         self.assertLessEqual(os.stat(self.db.database_filename).st_size / 1024, config.traj_info_max_size)
         self.assertGreater(self.db.num_entries, 0)
@@ -33,7 +33,6 @@ from mdtraj.utils import in_units_of
 from mdtraj.utils.validation import cast_indices
 from mdtraj.core.trajectory import load, _TOPOLOGY_EXTS, _get_extension, open as md_open, load_topology
 
-from itertools import groupby
 from operator import itemgetter, attrgetter
 
 from pyemma.coordinates.data.util.reader_utils import copy_traj_attributes, preallocate_empty_trajectory
@@ -134,6 +133,9 @@ class iterload(object):
         if self._extension in ('pdb', 'pdb.gz'):
             raise Exception("Not supported as trajectory format {ext}".format(ext=self._extension))
 
+        # offset array handling
+        offsets = kwargs.pop('offsets', None)
+
         self._mode = None
         if isinstance(self._stride, np.ndarray):
             self._mode = 'random_access'
@@ -150,10 +152,8 @@ class iterload(object):
                 else md_open(self._filename)
             )(self._filename)
 
-            # offset array handling
-            offsets = kwargs.pop('offsets', None)
-            if hasattr(self._f, 'offsets') and offsets is not None:
-                self._f.offsets = offsets
+        if hasattr(self._f, 'offsets') and offsets is not None:
+            self._f.offsets = offsets
 
     @property
     def skip(self):
@@ -216,42 +216,53 @@ class iterload(object):
 
     def _random_access_generator(self, f):
         with f:
-            curr_size = 0
-            coords = []
-            leftovers = []
-            chunksize = self._chunksize
-            if chunksize == 0:
-                chunksize = np.iinfo(int).max
-            for k, g in groupby(enumerate(self._stride), lambda a: a[0] - a[1]):
-                grouped_stride = list(map(itemgetter(1), g))
-                seek_to = grouped_stride[0] - f.tell()
-                f.seek(seek_to, whence=1)
-                group_size = len(grouped_stride)
-                if curr_size + group_size > chunksize:
-                    leftovers = grouped_stride
-                else:
-                    local_traj_data = _read_traj_data(self._atom_indices, f, group_size, **self._kwargs)
-                    coords.append(local_traj_data)
-                    curr_size += len(grouped_stride)
-                if curr_size == chunksize:
-                    yield _join_traj_data(coords, self._topology)
-                    chunksize = self._chunksize
-                    curr_size = 0
-                    coords = []
-                while leftovers:
-                    local_chunk = leftovers[:min(chunksize, len(leftovers))]
-                    local_traj_data = _read_traj_data(self._atom_indices, f, len(local_chunk), **self._kwargs)
-                    coords.append(local_traj_data)
-                    leftovers = leftovers[min(chunksize, len(leftovers)):]
-                    curr_size += len(local_chunk)
-                    if curr_size == chunksize:
-                        yield _join_traj_data(coords, self._topology)
-                        curr_size = 0
-                        coords = []
-            if coords:
+            for reads in _plan_reads(self._stride, self._chunksize, MAX_READ_GAP):
+                coords = []
+                for start, n_frames, selection in reads:
+                    f.seek(start - f.tell(), whence=1)
+                    local_traj_data = _read_traj_data(self._atom_indices, f, n_frames, **self._kwargs)
+                    coords.append(_select_traj_data(local_traj_data, selection))
                 yield _join_traj_data(coords, self._topology)
 
-            raise StopIteration("delivered all RA indices")
+
+# frames at most this far apart are read sequentially and the frames in between are discarded,
+# instead of seeking to the next requested frame.
+MAX_READ_GAP = 16
+
+
+def _plan_reads(frames, chunksize, max_gap):
+    """ plans the sequential reads to obtain the given frames.
+
+    Parameters
+    ----------
+    frames : ndarray(n, dtype=int)
+        frame indices to read, sorted for best performance.
+    chunksize : int
+        number of requested frames per chunk. If 0, all frames form one chunk.
+    max_gap : int
+        maximum number of unwanted frames, which are read and discarded between two requested ones.
+
+    Returns
+    -------
+    reads : generator of lists of (start, n_frames, selection)
+        the reads of each chunk, where selection indexes the requested frames within
+        the n_frames frames read from start.
+    """
+    frames = np.asarray(frames)
+    if chunksize == 0:
+        chunksize = max(len(frames), 1)
+    for offset in range(0, len(frames), chunksize):
+        frames_chunk = frames[offset:offset + chunksize]
+        gaps = np.diff(frames_chunk)
+        breaks = np.flatnonzero((gaps < 0) | (gaps > max_gap + 1)) + 1
+        yield [(group[0], group[-1] - group[0] + 1, group - group[0])
+               for group in np.split(frames_chunk, breaks)]
+
+
+def _select_traj_data(traj_data, selection):
+    if len(selection) == len(traj_data.xyz) and np.all(np.diff(selection) == 1):
+        return traj_data
+    return TrajData(*(x[selection] if x is not None else None for x in traj_data))
 
 
 def _read_traj_data(atom_indices, f, n_frames, **kwargs):
@@ -34,7 +34,8 @@ import pkg_resources
 # for IDE stupidity, just add a new cfg var here, if you add a property to Wrapper
 cfg_dir = default_config_file = default_logging_config = logging_config = \
     show_progress_bars = used_filenames = use_trajectory_lengths_cache = \
-    check_version = None
+    use_dtraj_cache = dtraj_cache_max_size = use_feature_cache = feature_cache_max_size = \
+    auto_chunk_size = check_version = None
 
 __all__ = (
            'cfg_dir',
@@ -46,6 +47,11 @@ __all__ = (
            'use_trajectory_lengths_cache',
            'traj_info_max_entries',
            'traj_info_max_size',
+           'use_dtraj_cache',
+           'dtraj_cache_max_size',
+           'use_feature_cache',
+           'feature_cache_max_size',
+           'auto_chunk_size',
            'coordinates_check_output',
            'check_version',
            )
@@ -343,6 +349,50 @@ In order to load a pre-saved configuration file, use the :py:func:`load` method:
     def traj_info_max_size(self, val):
         val = str(int(val))
         self._conf_values.set('pyemma', 'traj_info_max_size', val)
+
+    @property
+    def use_dtraj_cache(self):
+        return self._conf_values.getboolean('pyemma', 'use_dtraj_cache')
+
+    @use_dtraj_cache.setter
+    def use_dtraj_cache(self, val):
+        self._conf_values.set('pyemma', 'use_dtraj_cache', str(val))
+
+    @property
+    def dtraj_cache_max_size(self):
+        return self._conf_values.getint('pyemma', 'dtraj_cache_max_size')
+
+    @dtraj_cache_max_size.setter
+    def dtraj_cache_max_size(self, val):
+        val = str(int(val))
+        self._conf_values.set('pyemma', 'dtraj_cache_max_size', val)
+
+    @property
+    def use_feature_cache(self):
+        return self._conf_values.getboolean('pyemma', 'use_feature_cache')
+
+    @use_feature_cache.setter
+    def use_feature_cache(self, val):
+        self._conf_values.set('pyemma', 'use_feature_cache', str(val))
+
+    @property
+    def feature_cache_max_size(self):
+        return self._conf_values.getint('pyemma', 'feature_cache_max_size')
+
+    @feature_cache_max_size.setter
+    def feature_cache_max_size(self, val):
+        val = str(int(val))
+        self._conf_values.set('pyemma', 'feature_cache_max_size', val)
+
+    @property
+    def auto_chunk_size(self):
+        return self._conf_values.getint('pyemma', 'auto_chunk_size')
+
+    @auto_chunk_size.setter
+    def auto_chunk_size(self, val):
+        val = str(int(val))
+        self._conf_values.set('pyemma', 'auto_chunk_size', val)
+
     @property
     def show_progress_bars(self):
         return self._conf_values.getboolean('pyemma', 'show_progress_bars')
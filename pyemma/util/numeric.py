@@ -52,3 +52,40 @@ def _hash_numpy_array(x):
             x.flags.writeable = writeable_old
 
     return hash_value
+
+
+class _NotHashable(Exception):
+    pass
+
+
+def _update_hash(hasher, value):
+    """ updates the given hashlib hasher with value in a way, which is stable across processes.
+
+    Supports arrays, dicts, lists, tuples, strings, numbers and None. Raises _NotHashable for other types.
+    """
+    import numbers
+    import numpy as np
+    import six
+
+    if isinstance(value, np.ndarray):
+        if value.dtype == object:
+            raise _NotHashable(value.dtype)
+        value = np.ascontiguousarray(value)
+        hasher.update(repr((value.dtype.str, value.shape)).encode('ascii'))
+        hasher.update(value.tobytes())
+    elif isinstance(value, dict):
+        hasher.update(b'dict')
+        for k in sorted(value.keys()):
+            _update_hash(hasher, k)
+            _update_hash(hasher, value[k])
+    elif isinstance(value, (list, tuple)):
+        hasher.update(('%s%i' % (type(value).__name__, len(value))).encode('ascii'))
+        for v in value:
+            _update_hash(hasher, v)
+    elif isinstance(value, six.string_types):
+        hasher.update(value.encode('utf-8'))
+    elif value is None or isinstance(value, (bool, numbers.Number)):
+        hasher.update(repr(value).encode('ascii'))
+    else:
+        # we can not tell whether two instances of this type behave the same.
+        raise _NotHashable(type(value))